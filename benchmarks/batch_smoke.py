@@ -0,0 +1,110 @@
+"""
+批量生成冒烟测试 - Headless Batch Runner Smoke Run
+
+不调用 API：在临时目录创建几个项目，把工作流换成只有 writer / memory 两个节点的最小图，
+通过 batch_runner.run_batch 走完真实的 arun_generation（CompactSqliteSaver、进度写入、
+收尾关闭数据库），然后检查：
+
+- 每个项目的批量摘要为 done，章节数等于目标章节数
+- 世界状态文件已保存，注册表记录了 batch 吞吐量
+- 项目数据库的写线程全部退出
+- 再次运行时从断点判断为已完成，不重复生成
+
+用法:
+    python3 benchmarks/batch_smoke.py [项目数] [每个项目章节数]   # 默认 3 4
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+from typing import TypedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langgraph.graph import StateGraph, END
+
+import src.main
+from src import batch_runner
+from src.project_manager import ProjectManager
+
+
+class SmokeState(TypedDict, total=False):
+    config: dict
+    project_paths: dict
+    current_chapter_index: int
+    draft: str
+    world_bible: dict
+
+
+def smoke_workflow(config, async_mode=False):
+    """writer → memory 循环到目标章节数（替代 build_workflow）"""
+    target = config['novel']['target_chapters']
+
+    def writer(state):
+        return {"draft": f"第{state['current_chapter_index']}章正文" * 50}
+
+    def memory(state):
+        chapter = state['current_chapter_index']
+        return {
+            "current_chapter_index": chapter + 1,
+            "world_bible": {"chapters_seen": chapter},
+        }
+
+    workflow = StateGraph(SmokeState)
+    workflow.add_node("writer", writer)
+    workflow.add_node("memory", memory)
+    workflow.set_entry_point("writer")
+    workflow.add_edge("writer", "memory")
+    workflow.add_conditional_edges(
+        "memory",
+        lambda state: "writer" if state['current_chapter_index'] <= target else "end",
+        {"writer": "writer", "end": END}
+    )
+    return workflow
+
+
+def smoke_initial_state(config, paths):
+    return {"config": config, "current_chapter_index": 1, "draft": "", "world_bible": {}}
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    chapters = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    src.main.build_workflow = smoke_workflow
+    batch_runner.config_to_initial_state = smoke_initial_state
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pm = ProjectManager(base_dir=tmp)
+        project_ids = [
+            pm.create_project({"novel": {"title": f"冒烟测试{i + 1}", "target_chapters": chapters}})[0]
+            for i in range(projects)
+        ]
+
+        summaries = asyncio.run(batch_runner.run_batch(project_ids, max_projects=2, pm=pm))
+        batch_runner.print_batch_report(summaries, max(s["elapsed"] for s in summaries))
+
+        for summary in summaries:
+            assert summary["status"] == "done", summary
+            assert summary["chapters"] == chapters, summary
+
+            info = pm.get_project(summary["project_id"])
+            assert info["current_chapter"] == chapters and info["status"] == "completed", info
+            assert info["throughput"].get("batch"), info
+
+            bible_dir = pm.get_project_paths(summary["project_id"])['bible_dir']
+            assert any(name.endswith("_world_state.json") for name in os.listdir(bible_dir)), bible_dir
+
+        writers = [t for t in threading.enumerate() if t.name == "checkpoint-writer"]
+        assert not writers, f"{len(writers)} 个 checkpoint 写线程未退出"
+
+        # 已完成的项目被跳过
+        assert batch_runner.select_projects(pm, project_ids) == []
+
+    print(f"\n✅ 冒烟测试通过: {projects} 个项目 × {chapters} 章")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+世界设定摘要基准 - 缩进 JSON vs bible digest
+
+模拟长篇生成中 world_bible 的演化（每章经 memory 节点的 update_bible_with_parsed_data 更新角色状态、
+伏笔和世界事件），统计每章各次调用中"世界设定"部分占用的输入 token：
+
+- json:   改造前的写法（writer 每段 json.dumps(characters, indent=2)[:400]，critic [:600]，
+          memory json.dumps(world_bible, indent=2)[:1000]）
+- digest: 现在的 prompt，设定部分的 token = 完整 prompt − 空设定时的同一 prompt
+
+同时统计覆盖率（prompt 中出现的角色数 / 角色总数）和每章序列化耗时。
+每章调用次数：writer 4 段 + critic 1 次 + memory 1 次。
+
+用法:
+    python3 benchmarks/bible_digest_tokens.py [章节数]   # 默认 100
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.nodes.writer import build_segment_prompt
+from src.nodes.critic import build_critic_prompt
+from src.nodes.memory import build_world_update_prompt, update_bible_with_parsed_data
+from src.utils.bible_digest import build_digest
+from src.utils.prompt_budget import count_tokens
+
+SEGMENTS_PER_CHAPTER = 4
+NAMES = ["林风", "苏瑶", "赵无极", "老陈", "小七", "慕容雪", "铁牛", "白先生"]
+REPORT_AT = (1, 10, 25, 50, 100, 200, 500)
+
+
+def _text(n):
+    return "".join(random.choice("天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏，。") for _ in range(n))
+
+
+def initial_bible():
+    return {
+        "characters": {
+            name: {
+                "name": name, "age": str(18 + i * 3), "occupation": _text(4), "goal": _text(14),
+                "traits": [_text(2) for _ in range(3)], "status": "Alive",
+                "location": _text(30), "relationships": {},
+            }
+            for i, name in enumerate(NAMES)
+        },
+        "worldbuilding": {"setting": _text(120), "rules": [_text(30) for _ in range(4)]},
+        "plot_threads": {"active": [{"text": _text(25), "created_at": 1, "importance": 10, "resolved": False}]},
+    }
+
+
+def evolve(bible, chapter, state):
+    """模拟 memory 节点对 world_bible 的一次更新"""
+    parsed = {
+        "character_updates": {name: _text(random.randint(30, 70)) for name in random.sample(NAMES, 3)},
+        "plot_developments": [
+            {"text": _text(random.randint(20, 40)), "importance": random.randint(3, 9)}
+            for _ in range(random.randint(0, 2))
+        ],
+        "world_changes": [_text(25)],
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        return update_bible_with_parsed_data(bible, parsed, chapter, state)
+
+
+def covered(text):
+    return sum(1 for name in NAMES if name in text)
+
+
+def json_baseline(bible):
+    """改造前每章设定部分的 token 数和覆盖率"""
+    characters = bible["characters"]
+    writer_block = json.dumps(characters, indent=2, ensure_ascii=False)[:400]
+    critic_block = json.dumps(characters, ensure_ascii=False)[:600]
+    threads = [t.get("text", "") for t in bible["plot_threads"]["active"][-5:]]
+    critic_block += "\n" + "\n".join(f"- {t}" for t in threads)
+    memory_block = json.dumps(bible, ensure_ascii=False, indent=2)[:1000]
+
+    states = []
+    for name, data in list(characters.items())[:3]:
+        notes = data.get("recent_notes", [])
+        if notes:
+            states.append(f"- {name}: {notes[-1][:100]}")
+    writer_block += "\n" + "\n".join(states)
+
+    tokens = count_tokens(writer_block) * SEGMENTS_PER_CHAPTER + count_tokens(critic_block) + count_tokens(memory_block)
+    return tokens, covered(writer_block)
+
+
+def digest_prompts(state, bible, digest, beat, prev, draft):
+    """按当前节点代码构造一章的 writer / critic / memory prompt"""
+    state = {**state, "world_bible": bible, "bible_digest": digest}
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer = build_segment_prompt(beat, 2, SEGMENTS_PER_CHAPTER, digest["characters"], prev, "serious",
+                                      ["action"], "", digest["states"])
+        critic = build_critic_prompt(state)[0]
+        memory = build_world_update_prompt(draft, bible, 10, [], state)
+    return writer, critic, memory
+
+
+def main():
+    chapters = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    random.seed(7)
+
+    bible = initial_bible()
+    state = {"hot_memory": {}, "config": {}, "current_beats": "", "draft": _text(3000)}
+    beat = f"场景2: {NAMES[1]}与{NAMES[2]}对峙"
+    prev = _text(1200)
+    empty = build_digest({})
+
+    print(f"{'章节':>6} {'json tokens/章':>16} {'digest tokens/章':>18} {'节省':>8} {'writer 覆盖角色':>16}")
+    print("-" * 72)
+
+    totals = {"json": 0, "digest": 0}
+    json_serialize = digest_build = 0.0
+    for chapter in range(1, chapters + 1):
+        bible = evolve(bible, chapter, state)
+        state["current_beats"] = "\n".join(f"场景{i}: {random.choice(NAMES)}{_text(20)}" for i in range(1, 5))
+
+        started = time.perf_counter()
+        for _ in range(SEGMENTS_PER_CHAPTER + 2):
+            json.dumps(bible, ensure_ascii=False, indent=2)
+        json_serialize += time.perf_counter() - started
+
+        started = time.perf_counter()
+        digest = build_digest(bible)  # 每章只生成一次
+        digest_build += time.perf_counter() - started
+
+        old_tokens, old_cover = json_baseline(bible)
+        full = digest_prompts(state, bible, digest, beat, prev, state["draft"])
+        bare = digest_prompts(state, {}, empty, beat, prev, state["draft"])
+        new_tokens = sum(count_tokens(f) - count_tokens(b) for f, b in zip(full, bare))
+        new_cover = covered(full[0].split("【前文】")[0])
+
+        totals["json"] += old_tokens
+        totals["digest"] += new_tokens
+        if chapter in REPORT_AT or chapter == chapters:
+            saving = (old_tokens - new_tokens) / old_tokens * 100
+            print(f"{chapter:>6} {old_tokens:>16} {new_tokens:>18} {saving:>7.0f}% "
+                  f"{old_cover:>7}/{len(NAMES)} → {new_cover}/{len(NAMES)}")
+
+    print("-" * 72)
+    print(f"合计 {chapters} 章: json {totals['json']} tokens, digest {totals['digest']} tokens "
+          f"({(totals['json'] - totals['digest']) / totals['json'] * 100:.0f}% 节省)")
+    print(f"序列化耗时: json 每章 {json_serialize / chapters * 1000:.2f}ms, "
+          f"digest 每章 {digest_build / chapters * 1000:.2f}ms（每章生成一次，各节点复用）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Checkpoint 存储基准 - SqliteSaver vs CompactSqliteSaver
+
+模拟长篇生成：每章依次经过 planner / writer / critic / memory 四个节点，
+每个节点写一次 pending writes 和一次 checkpoint。输出不同章节数下的数据库大小、
+平均写入延迟和读取最新状态的延迟。
+
+用法:
+    python3 benchmarks/checkpoint_size.py [章节数 ...]   # 默认 50 200 500
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from src.utils.checkpointer import CompactSqliteSaver
+
+NODES = ("planner", "writer", "critic", "memory_update")
+
+
+def _text(n):
+    return "".join(random.choice("天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏") for _ in range(n))
+
+
+def initial_values(target_chapters):
+    volumes = (target_chapters + 24) // 25
+    return {
+        "synopsis": _text(300),
+        "config": {
+            "novel": {"title": "基准测试", "synopsis": _text(300), "target_chapters": target_chapters},
+            "worldbuilding": {"setting": _text(800), "rules": [_text(80) for _ in range(10)]},
+            "characters": [{"name": f"角色{i}", "bio": _text(200)} for i in range(8)],
+            "generation": {"writer_temp": 0.85, "max_revision_iterations": 2},
+        },
+        "project_paths": {"db_file": "state.db", "manuscript_dir": "manuscript", "bible_dir": "bible"},
+        "novel_outline": {"main_goal": _text(60), "main_conflict": _text(60)},
+        "volume_frameworks": [
+            {"title": _text(5), "chapters": f"{v * 25 + 1}-{(v + 1) * 25}", "core_goal": _text(20),
+             "key_events": [_text(15) for _ in range(3)], "ending_state": _text(15)}
+            for v in range(volumes)
+        ],
+        "world_bible": {"characters": {f"角色{i}": {"bio": _text(200)} for i in range(8)},
+                        "plot_threads": {"active": []}},
+        "hot_memory": {"recent_chapters": [], "active_threads": []},
+        "cold_memory": {"volume_summaries": [], "character_arcs": {}},
+        "chapters": [],
+        "current_chapter_index": 1,
+        "current_volume_index": 1,
+        "iteration": 0,
+        "current_beats": "",
+        "draft": "",
+        "feedback": None,
+    }
+
+
+def node_update(node, values, chapter):
+    """各节点对状态的典型修改"""
+    if node == "planner":
+        return {"current_beats": _text(600), "iteration": 0}
+    if node == "writer":
+        return {"draft": _text(3000)}
+    if node == "critic":
+        return {"feedback": _text(100), "iteration": values["iteration"] + 1}
+
+    summary = {"chapter_index": chapter, "title": _text(6), "summary": _text(250)}
+    hot = dict(values["hot_memory"])
+    hot["recent_chapters"] = (hot["recent_chapters"] + [summary])[-5:]
+    cold = values["cold_memory"]
+    if chapter % 25 == 0:
+        cold = dict(cold)
+        cold["volume_summaries"] = cold["volume_summaries"] + [{"volume": chapter // 25, "summary": _text(400)}]
+    world_bible = dict(values["world_bible"])
+    world_bible["plot_threads"] = {"active": values["world_bible"]["plot_threads"]["active"][-20:] + [
+        {"text": _text(30), "created_at": chapter, "importance": 5, "resolved": False}
+    ]}
+    return {
+        "chapters": values["chapters"] + [summary],
+        "hot_memory": hot,
+        "cold_memory": cold,
+        "world_bible": world_bible,
+        "current_chapter_index": chapter + 1,
+        "draft": "",
+    }
+
+
+def run(saver, chapters):
+    """返回 (平均写入毫秒, 读取最新状态毫秒)"""
+    random.seed(42)
+    values = initial_values(chapters)
+    versions = {channel: 1 for channel in values}
+    checkpoint = empty_checkpoint()
+    config = {"configurable": {"thread_id": "bench", "checkpoint_ns": ""}}
+
+    def put(new_channels):
+        nonlocal config, checkpoint
+        checkpoint = {
+            **checkpoint,
+            "id": str(uuid6()),
+            "channel_values": dict(values),
+            "channel_versions": dict(versions),
+        }
+        config = saver.put(config, checkpoint, {"source": "loop"}, {c: versions[c] for c in new_channels})
+
+    put(values.keys())
+
+    write_time = 0.0
+    writes = 0
+    for chapter in range(1, chapters + 1):
+        for node in NODES:
+            update = node_update(node, values, chapter)
+            started = time.perf_counter()
+            saver.put_writes(config, list(update.items()), task_id=f"{node}-{chapter}")
+            values.update(update)
+            for channel in update:
+                versions[channel] += 1
+            put(update.keys())
+            write_time += time.perf_counter() - started
+            writes += 1
+
+    started = time.perf_counter()
+    latest = saver.get_tuple({"configurable": {"thread_id": "bench", "checkpoint_ns": ""}})
+    read_ms = (time.perf_counter() - started) * 1000
+
+    assert latest.checkpoint["channel_values"]["chapters"] == values["chapters"]
+    assert latest.checkpoint["channel_values"]["config"] == values["config"]
+    return write_time / writes * 1000, read_ms
+
+
+def db_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def main():
+    chapter_counts = [int(a) for a in sys.argv[1:]] or [50, 200, 500]
+
+    print(f"{'章节':>6} {'存储':<10} {'数据库':>10} {'写入/次':>10} {'读取':>10} {'事务数':>8}")
+    print("-" * 62)
+    with tempfile.TemporaryDirectory() as tmp:
+        for chapters in chapter_counts:
+            for name, factory in (("sqlite", SqliteSaver), ("compact", CompactSqliteSaver)):
+                path = os.path.join(tmp, f"{name}_{chapters}.db")
+                if factory is SqliteSaver:
+                    conn = sqlite3.connect(path, check_same_thread=False)
+                    write_ms, read_ms = run(SqliteSaver(conn), chapters)
+                    commits = chapters * len(NODES) * 2 + 1  # put / put_writes 各提交一次
+                else:
+                    # 写线程把排队的 put / put_writes 合并提交
+                    saver = CompactSqliteSaver(path)
+                    write_ms, read_ms = run(saver, chapters)
+                    saver.db.close()
+                    commits = saver.db.stats["commits"]
+                    conn = sqlite3.connect(path)
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.close()
+                size_mb = db_size(path) / 1024 / 1024
+                print(f"{chapters:>6} {name:<10} {size_mb:>8.1f}MB {write_ms:>8.2f}ms {read_ms:>8.2f}ms {commits:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+大纲查找基准 - 顺序扫描 vs 区间索引
+
+构造 N 卷（每卷 25 章）、N/5 个阶段、每 50 章一个里程碑的合成大纲，
+对全书每一章各查一次所在卷、所在阶段和已到达的最近里程碑：
+
+- linear: 改造前的写法（每次顺序扫描并重新 split("-") 解析章节范围）
+- index:  src/utils/outline_index.py（建一次索引，bisect 查找）
+
+同时校验两种方式的结果一致。
+
+用法:
+    python3 benchmarks/outline_lookup.py [卷数 ...]   # 默认 10 100 1000
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.outline_index import OutlineIndex
+
+CHAPTERS_PER_VOLUME = 25
+VOLUMES_PER_PHASE = 5
+MILESTONE_EVERY = 50
+
+
+def make_outline(volumes):
+    total = volumes * CHAPTERS_PER_VOLUME
+    phase_span = CHAPTERS_PER_VOLUME * VOLUMES_PER_PHASE
+    outline = {
+        "main_goal": "基准测试",
+        "phases": [
+            {"name": f"阶段{i + 1}", "chapters": f"{start}-{min(start + phase_span - 1, total)}", "goal": "目标"}
+            for i, start in enumerate(range(1, total + 1, phase_span))
+        ],
+        "key_milestones": [
+            {"chapter": chapter, "event": f"里程碑{chapter}"}
+            for chapter in range(MILESTONE_EVERY, total + 1, MILESTONE_EVERY)
+        ],
+    }
+    frameworks = [
+        {"volume": i + 1, "title": f"第{i + 1}卷",
+         "chapters": f"{i * CHAPTERS_PER_VOLUME + 1}-{(i + 1) * CHAPTERS_PER_VOLUME}"}
+        for i in range(volumes)
+    ]
+    return outline, frameworks, total
+
+
+def linear_range_find(items, chapter_index):
+    """改造前 planner.find_current_phase / find_current_volume 的实现"""
+    for item in items:
+        chapters_range = item.get('chapters', '')
+        if '-' in chapters_range:
+            try:
+                start, end = map(int, chapters_range.split('-'))
+                if start <= chapter_index <= end:
+                    return item
+            except:
+                continue
+    return None
+
+
+def linear_milestone(milestones, chapter):
+    """改造前 milestone_review.check_plot_progress 的查找"""
+    expected = None
+    for milestone in milestones:
+        if milestone["chapter"] <= chapter:
+            expected = milestone
+    return expected
+
+
+def run_linear(outline, frameworks, total):
+    results = []
+    for chapter in range(1, total + 1):
+        results.append((
+            linear_range_find(outline["phases"], chapter),
+            linear_range_find(frameworks, chapter),
+            linear_milestone(outline["key_milestones"], chapter),
+        ))
+    return results
+
+
+def run_index(index, total):
+    results = []
+    for chapter in range(1, total + 1):
+        results.append((index.find_phase(chapter), index.find_volume(chapter), index.last_milestone(chapter)))
+    return results
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 100, 1000]
+
+    print(f"{'卷数':>6} {'章节数':>8} {'linear 每章':>12} {'index 每章':>12} {'建索引':>10} {'加速':>8}")
+    print("-" * 64)
+    for volumes in sizes:
+        outline, frameworks, total = make_outline(volumes)
+
+        started = time.perf_counter()
+        expected = run_linear(outline, frameworks, total)
+        linear = (time.perf_counter() - started) / total
+
+        started = time.perf_counter()
+        index = OutlineIndex(outline, frameworks)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = run_index(index, total)
+        indexed = (time.perf_counter() - started) / total
+
+        assert all(a[0] is e[0] and a[1] is e[1] and a[2] is e[2] for a, e in zip(actual, expected)), "结果不一致"
+        print(f"{volumes:>6} {total:>8} {linear * 1e6:>10.1f}µs {indexed * 1e6:>10.2f}µs "
+              f"{build * 1000:>8.2f}ms {linear / indexed:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+章节抓取冒烟测试 - Scraper Smoke Run Against a Local HTTP Server
+
+不访问外网：在本机起一个 ThreadingHTTPServer，提供 N 个 gbk 编码（<meta charset="gbk">）
+的章节页，每页带 ETag，其中一页第一次请求返回 429 + Retry-After。
+用 short_novel/core/scraper.py 的 fetch_urls 抓取两遍，检查：
+
+- 第一遍：全部抓到、按输入顺序返回、正文正确解码；429 之后重试成功
+- 同一主机同时进行的请求数不超过 per_host，连接被复用（连接数远少于请求数）
+- 第二遍：全部以 304 返回，使用磁盘缓存，结果与第一遍一致
+
+用法:
+    python3 benchmarks/scraper_smoke.py [页数] [per_host]   # 默认 20 3
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "short_novel"))
+
+THROTTLED_PAGE = 7
+PAGE_DELAY = 0.05
+
+
+class ChapterServer(ThreadingHTTPServer):
+    """记录请求数、304 次数、429 次数、并发峰值和连接数"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ChapterHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.throttled = 0
+        self.active = 0
+        self.max_active = 0
+        self.connections = set()
+
+
+class ChapterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, headers=(), body=b""):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            chapter = int(self.path.rsplit("_", 1)[-1])
+            etag = f'"ch{chapter}-v1"'
+
+            with server.lock:
+                throttle = chapter == THROTTLED_PAGE and server.throttled == 0
+                if throttle:
+                    server.throttled += 1
+            if throttle:
+                self._send(429, [("Retry-After", "1")])
+                return
+
+            if self.headers.get("If-None-Match") == etag:
+                with server.lock:
+                    server.not_modified += 1
+                self._send(304, [("ETag", etag)])
+                return
+
+            time.sleep(PAGE_DELAY)
+            body = (
+                f'<html><head><meta charset="gbk"><title>第{chapter}章</title>'
+                f'<script>var x = 1;</script></head><body><h1>第{chapter}章 试炼</h1>'
+                + f"<p>第{chapter}章正文，天地玄黄，宇宙洪荒。</p>" * 400
+                + "</body></html>"
+            ).encode("gbk")
+            self._send(200, [("Content-Type", "text/html"), ("ETag", etag)], body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    per_host = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 缓存目录在导入时读取
+        os.environ["SCRAPER_CACHE_DIR"] = tmp
+        from core.scraper import fetch_urls
+
+        server = ChapterServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [f"http://127.0.0.1:{server.server_address[1]}/chapter_{i}" for i in range(1, pages + 1)]
+        options = {"max_workers": 8, "per_host": per_host, "min_interval": 0.01}
+
+        try:
+            started = time.perf_counter()
+            first = fetch_urls(urls, **options)
+            first_elapsed = time.perf_counter() - started
+            first_requests, connections = server.requests, len(server.connections)
+
+            assert all(first), f"{sum(1 for t in first if not t)} 页抓取失败"
+            for chapter, text in enumerate(first, 1):
+                assert text.startswith(f"第{chapter}章 试炼"), f"第 {chapter} 页顺序或解码错误: {text[:20]!r}"
+                assert "var x" not in text, "script 内容未被过滤"
+            assert server.throttled == 1 and first_requests == pages + 1, f"429 重试异常: {first_requests} 次请求"
+            assert server.max_active <= per_host, f"并发峰值 {server.max_active} 超过 per_host={per_host}"
+            assert connections < first_requests, f"连接未复用: {connections} 个连接 / {first_requests} 次请求"
+
+            started = time.perf_counter()
+            second = fetch_urls(urls, **options)
+            second_elapsed = time.perf_counter() - started
+
+            assert server.not_modified == pages, f"第二遍 304 次数 {server.not_modified}/{pages}"
+            assert second == first, "第二遍结果与第一遍不一致"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    print(f"第一遍: {pages} 页  {first_requests} 次请求（含 1 次 429 重试）  "
+          f"{connections} 个连接  并发峰值 {server.max_active}/{per_host}  {first_elapsed:.2f}s")
+    print(f"第二遍: {server.not_modified} 次 304，使用缓存  {second_elapsed:.2f}s")
+    print(f"\n✅ 冒烟测试通过: {pages} 页")
+
+
+if __name__ == "__main__":
+    main()
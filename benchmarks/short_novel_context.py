@@ -0,0 +1,128 @@
+"""
+短篇前文上下文基准 - 全部前文原文 vs 滚动摘要
+
+short_novel 的 generate_chapter 在 full 模式下把之前所有章节原文放进 prompt，
+输入 token 随章节数线性增长（全书总成本平方增长）；summary 模式只放滚动前情提要 + 上一章原文，
+另外每章多一次提要更新调用。
+
+默认离线运行：把 generator.generate 换成记录器，按真实代码构造每次调用的 prompt 并统计输入 token，
+模型输出用固定长度的模拟正文/提要代替。加 --live 时真实调用 API，额外统计每章生成耗时
+（需要 ANTHROPIC_API_KEY，会产生费用，建议配合较小的章节数）。
+
+用法:
+    python3 benchmarks/short_novel_context.py [章节数] [--live]   # 默认 20
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from short_novel.core import generator
+from src.utils.prompt_budget import count_tokens
+
+REPORT_AT = (1, 5, 10, 20, 50)
+CHAPTER_CHARS = 1000
+NAMES = ["陈默", "苏晴", "钱少", "周公子", "赵董"]
+
+
+def _text(n):
+    return "".join(random.choice("天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏，。") for _ in range(n))
+
+
+def make_story(chapters):
+    template = {"writing_style": {
+        "sentence": "短句为主，一句一行", "dialogue_ratio": "60%以上",
+        "taboos": ["大段心理描写", "说教", "拖沓的环境描写"],
+    }}
+    setting = {
+        "title": "基准测试",
+        "protagonist": {"name": NAMES[0], "hidden_identity": _text(20), "public_identity": _text(10)},
+        "female_lead": {"name": NAMES[1], "identity": _text(10), "relationship": _text(10)},
+        "antagonists": [{"name": n, "identity": _text(10), "level": i + 1} for i, n in enumerate(NAMES[2:])],
+        "setting": {"time_period": "现代", "location": _text(8)},
+    }
+    outline = {"chapters": [
+        {"chapter_num": i, "title": _text(6), "story_goal": _text(40), "word_target": 1000}
+        for i in range(1, chapters + 1)
+    ]}
+    return template, setting, outline
+
+
+class Recorder:
+    """代替 generator.generate：记录每次调用的输入 token，返回模拟输出"""
+
+    def __init__(self, live_generate=None):
+        self.live_generate = live_generate
+        self.calls = []
+
+    def __call__(self, system_prompt, user_prompt, max_tokens=4096, prefix=None, **kwargs):
+        if isinstance(prefix, str):
+            prefix = [prefix]
+        tokens = count_tokens(system_prompt) + count_tokens("".join(prefix or [])) + count_tokens(user_prompt)
+        kind = "summary" if max_tokens == generator.MAX_TOKENS_SUMMARY else "chapter"
+
+        started = time.perf_counter()
+        if self.live_generate:
+            text = self.live_generate(system_prompt, user_prompt, max_tokens=max_tokens, prefix=prefix, **kwargs)
+        elif kind == "summary":
+            text = _text(generator.MAX_SUMMARY_CHARS)
+        else:
+            text = random.choice(NAMES) + _text(CHAPTER_CHARS)
+        self.calls.append((kind, tokens, time.perf_counter() - started))
+        return text
+
+
+def run(mode, template, setting, outline, chapters, recorder):
+    """按 generate.py 的流程逐章生成，返回每章 (输入 tokens, 耗时)"""
+    per_chapter = []
+    written = []
+    with tempfile.TemporaryDirectory() as story_dir:
+        for chapter_num in range(1, chapters + 1):
+            start = len(recorder.calls)
+            written.append(generator.generate_chapter(
+                template, setting, outline, chapter_num, written,
+                context_mode=mode, story_dir=story_dir,
+            ))
+            calls = recorder.calls[start:]
+            per_chapter.append((sum(c[1] for c in calls), sum(c[2] for c in calls)))
+    return per_chapter
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    live = "--live" in sys.argv
+    chapters = int(args[0]) if args else 20
+    random.seed(7)
+
+    template, setting, outline = make_story(chapters)
+    recorder = Recorder(generator.generate if live else None)
+    generator.generate = recorder
+
+    results = {mode: run(mode, template, setting, outline, chapters, recorder) for mode in ("full", "summary")}
+
+    print(f"{'章节':>6} {'full tokens':>12} {'summary tokens':>15} {'节省':>7}", end="")
+    print(f" {'full 耗时':>10} {'summary 耗时':>12}" if live else "")
+    print("-" * (70 if live else 46))
+    for chapter in range(1, chapters + 1):
+        if chapter not in REPORT_AT and chapter != chapters:
+            continue
+        (full_tokens, full_time), (summary_tokens, summary_time) = results["full"][chapter - 1], results["summary"][chapter - 1]
+        saving = (full_tokens - summary_tokens) / full_tokens * 100
+        print(f"{chapter:>6} {full_tokens:>12} {summary_tokens:>15} {saving:>6.0f}%", end="")
+        print(f" {full_time:>9.1f}s {summary_time:>11.1f}s" if live else "")
+
+    totals = {mode: sum(t for t, _ in rows) for mode, rows in results.items()}
+    print("-" * (70 if live else 46))
+    print(f"合计 {chapters} 章输入: full {totals['full']} tokens, summary {totals['summary']} tokens "
+          f"({(totals['full'] - totals['summary']) / totals['full'] * 100:.0f}% 节省，summary 含每章一次提要更新)")
+    if live:
+        print(f"总耗时: full {sum(t for _, t in results['full']):.0f}s, "
+              f"summary {sum(t for _, t in results['summary']):.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -322,7 +322,7 @@ class AdvancedNovelConfigurator:
     def _ai_generate_phases(self, novel_outline, target_chapters, num_phases):
         """让 AI 生成阶段划分"""
         from langchain_core.messages import HumanMessage
-        from langchain_anthropic import ChatAnthropic
+        from src.utils.llm_client import get_llm
         import os
 
         prompt = f"""你是资深小说策划，负责为小说划分阶段。
@@ -347,11 +347,8 @@ class AdvancedNovelConfigurator:
 只输出 JSON，不要其他内容。"""
 
         try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
+            llm = get_llm(
                 temperature=0.7,
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
                 timeout=60.0
             )
 
@@ -644,7 +641,13 @@ class AdvancedNovelConfigurator:
             'foreshadow_strategy': 'moderate',
             'character_autonomy': 'medium',
             'max_revision_iterations': 2,
-            'enable_plot_twists': True
+            'enable_plot_twists': True,
+            'parallel_segments': False,  # True: 场景段落并行起草 + 衔接润色
+            'segment_workers': 4,
+            'async_mode': False,  # True: 等同于 ./novel.sh generate --async
+            'pipeline_memory': None,  # True: 记忆提取与下一章规划并发（等同于 --pipeline）；None: 异步模式默认开启
+            'parallel_volume_frameworks': True,  # 卷纲先生成骨架，再并发展开各批次
+            'volume_workers': 4
         }
 
     def step_9_review_and_save(self):
@@ -14,7 +14,7 @@ import sys
 import os
 import yaml
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -22,6 +22,35 @@ env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(dotenv_path=env_path)
 
 
+def _extract_yaml(content):
+    """提取 YAML（可能被代码块包裹）"""
+    if "```yaml" in content:
+        start = content.find("```yaml") + 7
+        end = content.find("```", start)
+        return content[start:end].strip()
+    elif "```" in content:
+        start = content.find("```") + 3
+        end = content.find("```", start)
+        return content[start:end].strip()
+    return content
+
+
+def _is_yaml_mapping(content):
+    """缓存校验：响应能解析为 YAML 字典（总纲）"""
+    try:
+        return isinstance(yaml.safe_load(_extract_yaml(content.strip())), dict)
+    except yaml.YAMLError:
+        return False
+
+
+def _is_yaml_list(content):
+    """缓存校验：响应能解析为 YAML 列表（卷纲）"""
+    try:
+        return isinstance(yaml.safe_load(_extract_yaml(content.strip())), list)
+    except yaml.YAMLError:
+        return False
+
+
 def generate_novel_outline(config):
     """使用 AI 生成总纲"""
 
@@ -63,31 +92,17 @@ key_milestones:
 只输出 YAML，不要其他内容。"""
 
     try:
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.7,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=60.0,
-            max_retries=2
+            max_retries=2,
+            cache=_is_yaml_mapping  # 只缓存可解析的总纲
         )
 
         response = llm.invoke([HumanMessage(content=prompt)])
         content = response.content.strip()
 
-        # 提取 YAML
-        if "```yaml" in content:
-            start = content.find("```yaml") + 7
-            end = content.find("```", start)
-            yaml_content = content[start:end].strip()
-        elif "```" in content:
-            start = content.find("```") + 3
-            end = content.find("```", start)
-            yaml_content = content[start:end].strip()
-        else:
-            yaml_content = content
-
-        outline = yaml.safe_load(yaml_content)
+        outline = yaml.safe_load(_extract_yaml(content))
         return outline
 
     except Exception as e:
@@ -163,31 +178,17 @@ protagonist_arc: {novel_outline.get('protagonist_arc', '未设置')}
 只输出 YAML，不要其他内容。"""
 
     try:
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.7,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=90.0,
-            max_retries=2
+            max_retries=2,
+            cache=_is_yaml_list  # 只缓存可解析的卷纲
         )
 
         response = llm.invoke([HumanMessage(content=prompt)])
         content = response.content.strip()
 
-        # 提取 YAML
-        if "```yaml" in content:
-            start = content.find("```yaml") + 7
-            end = content.find("```", start)
-            yaml_content = content[start:end].strip()
-        elif "```" in content:
-            start = content.find("```") + 3
-            end = content.find("```", start)
-            yaml_content = content[start:end].strip()
-        else:
-            yaml_content = content
-
-        frameworks = yaml.safe_load(yaml_content)
+        frameworks = yaml.safe_load(_extract_yaml(content))
         return frameworks
 
     except Exception as e:
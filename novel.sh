@@ -26,17 +26,24 @@ show_help() {
 
 📖 主要命令:
   generate      生成小说（使用当前项目）
+                --async  异步模式（asyncio + 流式输出，记忆提取默认与下一章规划并发，报告章节/小时吞吐）
+                --pipeline  流水线模式（记忆提取与下一章规划并发）
   new           创建新的小说项目（支持AI自动生成大纲）
   projects      管理所有项目（切换/删除/查看）
+  batch         无人值守批量生成多个项目（项目ID列表或 --all）
+  export        导出整书（--format txt/epub/files/all，默认当前项目）
 
 🛠️  维护命令:
   status        查看系统和项目状态
+                --status in_progress  按状态过滤   --page 2  翻页（按最近更新排序）
   help          显示此帮助信息
 
 📚 使用示例:
   ./novel.sh new          # 创建新项目（可选AI生成大纲）
   ./novel.sh generate     # 生成章节
+  ./novel.sh generate --async  # 异步模式生成
   ./novel.sh projects     # 管理项目
+  ./novel.sh batch --all --max-calls 8 --rpm 120 --tpm 400000  # 并发生成所有未完成项目
 
 EOF
 }
@@ -65,8 +72,20 @@ print('yes' if projects else 'no')
         exit 1
     fi
 
-    # 激活虚拟环境并运行
-    PYTHONPATH=/project/novel python3 src/main.py
+    # 激活虚拟环境并运行（透传额外参数，如 --async）
+    PYTHONPATH=/project/novel python3 src/main.py "$@"
+}
+
+# 批量生成多个项目
+batch_generate() {
+    source venv/bin/activate
+    PYTHONPATH=/project/novel python3 src/batch_runner.py "$@"
+}
+
+# 导出整书
+export_novel() {
+    source venv/bin/activate
+    PYTHONPATH=/project/novel python3 src/export_novel.py "$@"
 }
 
 # 创建新项目
@@ -126,11 +145,11 @@ show_status() {
     source venv/bin/activate 2>/dev/null
     PROJECT_COUNT=$(python3 -c "
 from src.project_manager import ProjectManager
-pm = ProjectManager()
-print(len(pm.list_projects()))
+counts = ProjectManager().count_projects()
+print(sum(counts.values()))
 " 2>/dev/null)
 
-    if [ "$PROJECT_COUNT" -gt 0 ]; then
+    if [ "${PROJECT_COUNT:-0}" -gt 0 ]; then
         echo -e "${GREEN}✅ 已有 $PROJECT_COUNT 个项目${NC}"
     else
         echo -e "${YELLOW}⚠️  暂无项目（运行 ./novel.sh new 创建）${NC}"
@@ -153,12 +172,16 @@ if current:
 
     echo
 
-    # 显示项目列表
+    # 显示项目列表（可选: --status in_progress --page 2）
     python3 -c "
+import argparse
 from src.project_manager import ProjectManager
-pm = ProjectManager()
-pm.print_projects_table()
-"
+parser = argparse.ArgumentParser(prog='./novel.sh status')
+parser.add_argument('--status', choices=['created', 'in_progress', 'completed'])
+parser.add_argument('--page', type=int, default=1)
+args = parser.parse_args()
+ProjectManager().print_projects_table(status=args.status, page=args.page)
+" "$@"
 
     echo
 }
@@ -166,7 +189,13 @@ pm.print_projects_table()
 # 主逻辑
 case "${1:-help}" in
     generate|gen|g)
-        generate_novel
+        generate_novel "${@:2}"
+        ;;
+    batch|b)
+        batch_generate "${@:2}"
+        ;;
+    export|e)
+        export_novel "${@:2}"
         ;;
     new|create|n)
         new_project
@@ -193,7 +222,7 @@ case "${1:-help}" in
         new_project
         ;;
     status|st|s)
-        show_status
+        show_status "${@:2}"
         ;;
     help|h|--help|-h)
         show_help
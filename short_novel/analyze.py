@@ -9,7 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 import yaml
-from core.scraper import fetch_url
+from core.scraper import fetch_url, fetch_urls
 from core.analyzer import analyze_novel
 from core.template_manager import save_template
 
@@ -28,9 +28,40 @@ def get_novel_text() -> str:
     print("请选择输入方式：")
     print("  1. 粘贴小说文本")
     print("  2. 输入URL（实验性功能）")
+    print("  3. 输入多个章节URL（并发抓取后按顺序合并）")
     print()
 
-    choice = input("选择 [1/2]: ").strip()
+    choice = input("选择 [1/2/3]: ").strip()
+
+    if choice == "3":
+        print("\n请逐行输入章节URL（输入 END 结束）：")
+        urls = []
+        while True:
+            try:
+                line = input().strip()
+            except EOFError:
+                break
+            if line == "END":
+                break
+            if line:
+                urls.append(line)
+
+        if urls:
+            print(f"\n正在抓取 {len(urls)} 个页面...")
+            texts = fetch_urls(urls, progress_callback=lambda done, total: print(f"\r  {done}/{total}", end="", flush=True))
+            print()
+            failed = [url for url, text in zip(urls, texts) if not text]
+            if failed:
+                print(f"{len(failed)} 个页面抓取失败：")
+                for url in failed[:10]:
+                    print(f"  {url}")
+            text = "\n\n".join(t for t in texts if t)
+            if text:
+                print(f"成功获取 {len(urls) - len(failed)}/{len(urls)} 页，共 {len(text)} 字符")
+                confirm = input("是否使用此内容？[Y/n]: ").strip().lower()
+                if confirm != "n":
+                    return text
+        print("\nURL获取失败，请改用粘贴方式")
 
     if choice == "2":
         url = input("\n请输入URL: ").strip()
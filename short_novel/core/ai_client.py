@@ -2,11 +2,20 @@
 Claude API wrapper with retry logic
 """
 import os
-import time
+import sys
 from pathlib import Path
 import httpx
 from anthropic import Anthropic
 
+# Shared rate limiter lives in the main package (src/utils/rate_limiter.py)
+_REPO_ROOT = Path(__file__).parent.parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from src.utils.rate_limiter import get_limiter, is_overload_error, estimate_tokens, retry_wait
+from src.utils.llm_cache import get_cache, make_key
+from src.utils import prompt_cache
+
 # Load .env file if exists (check multiple locations)
 def _load_dotenv():
     """Load environment variables from .env file."""
@@ -43,6 +52,9 @@ def generate(
     max_tokens: int = 4096,
     retries: int = 5,
     retry_delay: float = 30.0,
+    cache: bool = False,
+    prefix=None,
+    validate=None,
 ) -> str:
     """
     Generate text using Claude API.
@@ -52,7 +64,17 @@ def generate(
         user_prompt: User message/query
         max_tokens: Maximum tokens in response
         retries: Number of retry attempts on failure
-        retry_delay: Seconds to wait between retries
+        retry_delay: Pause after a proxy/overload error (grows 1.5x per retry);
+            enforced by the shared rate limiter for every caller in the process
+        cache: Serve/store the response from the on-disk response cache
+            (keyed by model + system + user prompt + max_tokens)
+        prefix: Stable context sent before user_prompt (str, or list of str
+            blocks for append-only context such as previous chapters). With
+            LLM_PROMPT_CACHING=1 it carries prompt-caching markers; hit/miss
+            counts are collected in src/utils/prompt_cache.py
+        validate: Optional check validate(text) -> bool; with cache=True only
+            responses that pass it are stored. Responses cut off at max_tokens
+            are never stored, so a bad response is regenerated on the next run
 
     Returns:
         Generated text response
@@ -65,7 +87,20 @@ def generate(
         ANTHROPIC_BASE_URL: Custom API base URL for proxy (optional)
         ANTHROPIC_MODEL: Model to use (default: claude-opus-4-6)
         ANTHROPIC_TIMEOUT: Request timeout in seconds (default: 300)
+        LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE / LLM_MAX_CONCURRENCY:
+            Shared rate limiter budgets (optional, see src/utils/rate_limiter.py)
+        LLM_PROMPT_CACHING: Set to 1 to mark the prefix for prompt caching (optional)
     """
+    content = prompt_cache.message_content(prefix or [], user_prompt)
+    full_prompt = prompt_cache.content_text(content)
+
+    cache_key = None
+    if cache:
+        cache_key = make_key(MODEL, None, full_prompt, system=system_prompt, max_tokens=max_tokens)
+        cached = get_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
     if not API_KEY:
         raise ValueError("ANTHROPIC_API_KEY environment variable not set")
 
@@ -77,29 +112,40 @@ def generate(
     else:
         client = Anthropic(api_key=API_KEY, timeout=timeout)
 
+    limiter = get_limiter()
+    estimated = estimate_tokens(system_prompt, full_prompt, max_tokens=max_tokens)
+
     last_error = None
+    is_proxy_error = False
     current_delay = retry_delay
 
     for attempt in range(retries):
         try:
-            response = client.messages.create(
-                model=MODEL,
-                max_tokens=max_tokens,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            return response.content[0].text
+            # Overload responses shrink the shared concurrency window and pause
+            # all callers for current_delay (or the server's Retry-After)
+            with limiter.slot(estimated, overload_pause=current_delay) as call:
+                response = client.messages.create(
+                    model=MODEL,
+                    max_tokens=max_tokens,
+                    system=system_prompt,
+                    messages=[{"role": "user", "content": content}],
+                )
+                call.record_usage(response.usage.input_tokens + response.usage.output_tokens)
+                prompt_cache.record_usage(response.usage)
+
+            text = response.content[0].text
+            if cache_key and response.stop_reason != "max_tokens" and (validate is None or validate(text)):
+                get_cache().put(cache_key, text)
+            return text
         except Exception as e:
             last_error = e
             error_str = str(e)
 
-            # Check for proxy timeout errors
-            is_proxy_error = ("524" in error_str or "timeout" in error_str.lower() or
-                              "<!DOCTYPE" in error_str or "<html" in error_str or
-                              "502" in error_str or "503" in error_str or "504" in error_str)
+            # Check for server-side overload (429/5xx status, overloaded_error, HTML error pages)
+            is_proxy_error = is_overload_error(e)
 
             if is_proxy_error:
-                error_msg = "代理服务器超时/过载 - 等待后重试"
+                error_msg = "服务端限流/过载 - 等待后重试"
             else:
                 error_msg = error_str[:150] if len(error_str) > 150 else error_str
 
@@ -107,21 +153,12 @@ def generate(
                 print(f"\n⚠ API调用失败 (尝试 {attempt + 1}/{retries}): {error_msg}")
 
                 if is_proxy_error:
-                    # For proxy errors, wait longer and show countdown
-                    wait_time = current_delay
-                    print(f"代理服务器可能过载，等待 {int(wait_time)} 秒后重试...")
+                    # The limiter holds the next call until the pause is over
+                    print(f"代理服务器可能过载，限流器暂停约 {int(current_delay)} 秒后重试...")
                     print("(按 Ctrl+C 可取消)")
-
-                    # Show countdown
-                    for remaining in range(int(wait_time), 0, -10):
-                        print(f"  剩余 {remaining} 秒...", end="\r")
-                        time.sleep(min(10, remaining))
-                    print(" " * 30, end="\r")  # Clear line
+                    current_delay = min(current_delay * 1.5, 120)  # Cap at 2 minutes
                 else:
-                    print(f"{current_delay}秒后重试...")
-                    time.sleep(current_delay)
-
-                current_delay = min(current_delay * 1.5, 120)  # Cap at 2 minutes
+                    retry_wait(attempt)
 
     # Final failure - offer to retry manually
     print(f"\n✗ API调用失败，已重试 {retries} 次")
@@ -133,7 +170,7 @@ def generate(
                 raise last_error
             elif choice in ('', 'y'):
                 print("继续重试...")
-                return generate(system_prompt, user_prompt, max_tokens, retries, retry_delay)
+                return generate(system_prompt, user_prompt, max_tokens, retries, retry_delay, cache, prefix, validate)
             else:
                 print("请输入 Y 或 N")
 
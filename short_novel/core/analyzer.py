@@ -1,18 +1,82 @@
 """
 Template Analyzer - Four-round novel analysis
+
+Short sources are sent whole to each of the four rounds. Sources longer than
+one chunk are analyzed map-reduce style: the text is split on chapter
+headings into chunks, every chunk is analyzed once (concurrently) for
+structure, emotion and technique notes, and the four rounds then reduce those
+notes instead of re-reading the full text. Per-chapter lists are merged
+directly from the chunk notes.
+
+Every finished step (each chunk, each round) is saved under a key derived
+from the normalized source text and the analysis prompt files, so an
+interrupted run resumes from the last finished step and re-analyzing the
+same novel makes no calls. Editing any core/prompts/analyze_*.txt changes the
+key.
+
+Environment (optional):
+    ANALYSIS_CHUNK_CHARS: Max characters per chunk (default 12000)
+    ANALYSIS_WORKERS: Concurrent chunk analyses (default 4; the shared rate
+        limiter still applies)
+    ANALYSIS_CACHE_DIR: Where analysis artifacts are kept
+        (default <repo>/cache/analysis)
 """
+import hashlib
 import json
+import os
 import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable, Optional
 
+import yaml
+
 from .ai_client import generate
 from .template_manager import save_template
+from src.utils.prompt_budget import count_tokens
 
 # Direct paths to avoid import issues
 PROMPTS_DIR = Path(__file__).parent / "prompts"
 MAX_TOKENS_ANALYSIS = 8192
 
+ARTIFACTS_DIR = Path(os.environ.get(
+    "ANALYSIS_CACHE_DIR",
+    Path(__file__).resolve().parents[2] / "cache" / "analysis",
+))
+CHUNK_CHARS = int(os.environ.get("ANALYSIS_CHUNK_CHARS", "12000"))
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "4"))
+
+# Per-chapter list fields merged from chunk notes rather than re-generated
+STRUCTURE_LISTS = ("chapter_boundaries", "plot_nodes", "turning_points", "character_archetypes")
+EMOTION_LISTS = ("chapter_emotions", "hook_analysis")
+# Lists with one entry per chapter, and the key holding the chapter number
+PER_CHAPTER_LISTS = {"chapter_boundaries": "chapter_num", "chapter_emotions": "chapter", "hook_analysis": "chapter"}
+
+# Chunk-note fields each round reads in chunked mode
+ROUND_FIELDS = {
+    "structure": ("summary", "turning_points", "character_archetypes"),
+    "emotion": ("summary", "chapter_emotions", "hook_analysis"),
+    "technique": ("technique_samples", "style_notes"),
+    "abstract": ("summary",),
+}
+
+# Earlier-round results embedded in later prompts keep at most this many
+# items per list (evenly sampled), so long books stay within context
+MAX_EMBEDDED_ITEMS = 40
+
+CHUNKED_SOURCE_NOTE = (
+    "（原文较长，已按章节分段预先分析。以下为各段的分析结果，代替原文；"
+    "逐章列表由程序直接合并，可以省略不输出。）"
+)
+
+_CHAPTER_HEADING = re.compile(
+    r"^[ \t\u3000]*(?:第[0-9０-９零〇一二三四五六七八九十百千两]+[章节回]|chapter\s+\d+|#{1,3}\s)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
 
 def _load_prompt(name: str) -> str:
     """Load a prompt template from file."""
@@ -45,9 +109,329 @@ def _extract_yaml(text: str) -> str:
     return text.strip()
 
 
+def _is_json_response(text: str) -> bool:
+    """Cache check: the response parses as a JSON object."""
+    try:
+        return isinstance(_extract_json(text), dict)
+    except ValueError:
+        return False
+
+
+def _is_yaml_response(text: str) -> bool:
+    """Cache check: the response parses as a YAML mapping (the template)."""
+    try:
+        return isinstance(yaml.safe_load(_extract_yaml(text)), dict)
+    except yaml.YAMLError:
+        return False
+
+
+class AnalysisStats:
+    """Calls, approximate tokens and wall time of one analysis run (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.started = time.perf_counter()
+
+    def record(self, prompt: str, response: str):
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += count_tokens(prompt)
+            self.output_tokens += count_tokens(response)
+
+    def summary(self) -> str:
+        return (f"{self.calls} 次调用，输入约 {self.input_tokens} tokens，"
+                f"输出约 {self.output_tokens} tokens，耗时 {time.perf_counter() - self.started:.1f}s")
+
+
+def _generate(
+    system_prompt: str,
+    user_prompt: str,
+    stats: Optional[AnalysisStats] = None,
+    validate: Callable[[str], bool] = _is_json_response,
+) -> str:
+    # Only parseable responses are cached; a truncated or malformed one is regenerated on rerun
+    response = generate(
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        max_tokens=MAX_TOKENS_ANALYSIS,
+        cache=True,
+        validate=validate,
+    )
+    if stats:
+        stats.record(system_prompt + user_prompt, response)
+    return response
+
+
+def normalize_source(novel_text: str) -> str:
+    """Normalized source for hashing: NFC, unified newlines, no blank lines or edge whitespace."""
+    text = unicodedata.normalize("NFC", novel_text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+def prompts_version() -> str:
+    """Hash of the analysis prompt templates (a prompt edit invalidates saved artifacts)."""
+    digest = hashlib.sha256()
+    for path in sorted(PROMPTS_DIR.glob("analyze_*.txt")):
+        digest.update(path.name.encode("utf-8") + b"\0" + path.read_bytes() + b"\0")
+    return digest.hexdigest()[:12]
+
+
+class AnalysisArtifacts:
+    """
+    Saved outputs of one analysis (one directory per source + prompt version).
+
+    Steps are stored as <name>.json (dicts) or <name>.yaml (the template)
+    and written atomically, so a step is either complete or absent.
+    """
+
+    def __init__(self, novel_text: str, chunk_chars: int, root: Path = ARTIFACTS_DIR):
+        key_source = "\x1f".join([normalize_source(novel_text), prompts_version(), str(chunk_chars)])
+        self.key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:16]
+        self.directory = Path(root) / self.key
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def load(self, name: str):
+        """Saved step output, or None if the step has not finished."""
+        path = self._path(name)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        if name.endswith(".json"):
+            try:
+                return json.loads(text)
+            except ValueError:
+                return None  # damaged file: redo the step
+        return text
+
+    def save(self, name: str, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(value, ensure_ascii=False, indent=2) if name.endswith(".json") else value
+        tmp_path = self._path(name + ".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, self._path(name))
+
+    def step(self, name: str, compute: Callable[[], object], progress_callback=None, label: str = ""):
+        """Return the saved output of a step, or compute and save it."""
+        value = self.load(name)
+        if value is not None:
+            if progress_callback and label:
+                progress_callback(f"{label}（已缓存）")
+            return value
+        value = compute()
+        self.save(name, value)
+        return value
+
+
+def split_chunks(novel_text: str, max_chars: int = CHUNK_CHARS) -> list[dict]:
+    """
+    Split the source into chapter-aware chunks.
+
+    Consecutive chapters are packed into chunks of at most max_chars; a single
+    chapter longer than that is split on paragraph breaks. Without chapter
+    headings the text is split on paragraphs only.
+
+    Returns:
+        List of {"text", "first_chapter", "last_chapter"}. Chapters are
+        numbered by heading; text before the first heading (synopsis,
+        author's note) is chapter 0. Chapter numbers are None when no
+        headings were found.
+    """
+    starts = [m.start() for m in _CHAPTER_HEADING.finditer(novel_text)]
+    if not starts:
+        units = [(None, novel_text)]
+    else:
+        units = []
+        if novel_text[:starts[0]].strip():
+            units.append((0, novel_text[:starts[0]]))  # preface, not a chapter
+        bounds = starts + [len(novel_text)]
+        units.extend((i + 1, novel_text[bounds[i]:bounds[i + 1]]) for i in range(len(starts)))
+
+    # Oversized chapters become several units with the same chapter number
+    pieces = []
+    for chapter, text in units:
+        while len(text) > max_chars:
+            cut = text.rfind("\n", max_chars // 2, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append((chapter, text[:cut]))
+            text = text[cut:]
+        if text.strip():
+            pieces.append((chapter, text))
+
+    chunks = []
+    for chapter, text in pieces:
+        if chunks and len(chunks[-1]["text"]) + len(text) <= max_chars:
+            chunks[-1]["text"] += text
+            chunks[-1]["last_chapter"] = chapter
+        else:
+            chunks.append({"text": text, "first_chapter": chapter, "last_chapter": chapter})
+    return chunks
+
+
+def count_chapters(chunks: list[dict]) -> int:
+    """Number of chapter headings covered by the chunks (0 without headings)."""
+    return max((chunk["last_chapter"] or 0 for chunk in chunks), default=0)
+
+
+def analyze_chunk(chunk: dict, index: int, total: int, stats: Optional[AnalysisStats] = None) -> dict:
+    """Map step: one call extracts the structure, emotion and technique notes of a chunk."""
+    first, last = chunk["first_chapter"], chunk["last_chapter"]
+    if first is None:
+        chapter_range = f"全书第 {index}/{total} 段（未识别到章节标题，按段落编号）"
+    elif last == 0:
+        chapter_range = "正文前的内容（简介、作者的话等，不属于任何章节）"
+    elif first == 0:
+        chapter_range = f"正文前的内容及第1-{last}章"
+    else:
+        chapter_range = f"第{first}-{last}章"
+
+    prompt = _load_prompt("analyze_chunk")
+    prompt = prompt.replace("{chunk_label}", f"第 {index}/{total} 段").replace("{chapter_range}", chapter_range)
+
+    response = _generate(
+        "你是一个专业的网文分析师。请用中文回答，输出规范的JSON格式。",
+        prompt + "\n\n" + chunk["text"],
+        stats,
+    )
+    return _extract_json(response)
+
+
+def analyze_chunks(
+    chunks: list[dict],
+    progress_callback: Optional[Callable[[str], None]] = None,
+    stats: Optional[AnalysisStats] = None,
+    max_workers: int = ANALYSIS_WORKERS,
+    artifacts: Optional[AnalysisArtifacts] = None,
+) -> list[dict]:
+    """
+    Run the map step over all chunks concurrently (results in chunk order).
+
+    With artifacts, chunks analyzed by an earlier (interrupted) run are reused.
+    """
+    if progress_callback:
+        progress_callback(f"分段分析：共 {len(chunks)} 段，并发 {max_workers}...")
+
+    done = 0
+    lock = threading.Lock()
+
+    def run(index):
+        nonlocal done
+        compute = lambda: analyze_chunk(chunks[index], index + 1, len(chunks), stats)
+        notes = artifacts.step(f"chunk_{index + 1:03d}.json", compute) if artifacts else compute()
+        with lock:
+            done += 1
+            if progress_callback:
+                progress_callback(f"  分段 {done}/{len(chunks)} 完成")
+        return notes
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(run, range(len(chunks))))
+
+
+def _notes_source(notes: list[dict], round_name: str) -> str:
+    """The chunk notes a round reads in place of the full text."""
+    fields = ROUND_FIELDS[round_name]
+    parts = [CHUNKED_SOURCE_NOTE]
+    for i, note in enumerate(notes, 1):
+        picked = {key: note[key] for key in fields if note.get(key)}
+        parts.append(f"【第{i}段】" + json.dumps(picked, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(parts)
+
+
+def _chapter_number(item: dict, key: str) -> Optional[int]:
+    try:
+        return int(item.get(key))
+    except (TypeError, ValueError):
+        return None
+
+
+def _dedupe_chapters(items: list[dict], field: str) -> list[dict]:
+    """
+    One entry per chapter for a per-chapter list.
+
+    A chapter longer than a chunk is split across chunks and reported by
+    each of them: boundaries keep the first entry (summing word counts),
+    emotions keep the entry state of the first and the exit state of the
+    last, hooks keep the last (the hook sits at the chapter end). Entries
+    for the preface (chapter 0) are dropped.
+    """
+    key = PER_CHAPTER_LISTS[field]
+    merged = {}
+    result = []
+    for item in items:
+        chapter = _chapter_number(item, key)
+        if chapter is None:
+            result.append(item)
+            continue
+        if chapter < 1:
+            continue
+        kept = merged.get(chapter)
+        if kept is None:
+            merged[chapter] = dict(item)
+            result.append(merged[chapter])
+        elif field == "chapter_boundaries":
+            counts = (kept.get("word_count_estimate"), item.get("word_count_estimate"))
+            if all(isinstance(count, (int, float)) for count in counts):
+                kept["word_count_estimate"] = sum(counts)
+        elif field == "chapter_emotions":
+            for level in ("tension_level", "release_level"):
+                if isinstance(item.get(level), (int, float)):
+                    kept[level] = max(kept.get(level) or 0, item[level])
+            if item.get("exit_emotion"):
+                kept["exit_emotion"] = item["exit_emotion"]
+        else:
+            kept.clear()
+            kept.update(item)
+    return result
+
+
+def _merge_lists(notes: list[dict], fields: tuple) -> dict:
+    """Concatenate per-chapter lists from the chunk notes in chunk order."""
+    merged = {}
+    for field in fields:
+        items = []
+        for note in notes:
+            items.extend(item for item in note.get(field) or [] if isinstance(item, dict))
+        merged[field] = _dedupe_chapters(items, field) if field in PER_CHAPTER_LISTS else items
+
+    if "plot_nodes" in merged:
+        for node_id, node in enumerate(merged["plot_nodes"], 1):
+            node["node_id"] = node_id
+    if "character_archetypes" in merged:
+        # The same character appears in many chunks; keep the first description
+        seen = {}
+        for character in merged["character_archetypes"]:
+            seen.setdefault(character.get("name"), character)
+        merged["character_archetypes"] = list(seen.values())
+    return merged
+
+
+def _sampled(items: list, limit: int) -> list:
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+def _embed_json(data: dict, condensed: bool = False) -> str:
+    """JSON of an earlier round's result for a later prompt (long lists sampled when condensed)."""
+    if condensed:
+        data = {key: _sampled(value, MAX_EMBEDDED_ITEMS) if isinstance(value, list) else value
+                for key, value in data.items()}
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
 def analyze_structure(
     novel_text: str,
     progress_callback: Optional[Callable[[str], None]] = None,
+    notes: Optional[list[dict]] = None,
+    stats: Optional[AnalysisStats] = None,
+    total_chapters: Optional[int] = None,
 ) -> dict:
     """
     Round 1: Analyze novel structure.
@@ -55,6 +439,9 @@ def analyze_structure(
     Args:
         novel_text: Full text of the novel
         progress_callback: Optional callback for progress updates
+        notes: Chunk notes from analyze_chunks (chunked mode; replaces the text)
+        stats: Optional usage accumulator
+        total_chapters: Chapter headings found in the source (chunked mode)
 
     Returns:
         Structure analysis as dict
@@ -63,21 +450,30 @@ def analyze_structure(
         progress_callback("第一轮分析：结构分解...")
 
     prompt = _load_prompt("analyze_structure")
-    full_prompt = prompt + "\n\n" + novel_text
+    source = _notes_source(notes, "structure") if notes else novel_text
+    full_prompt = prompt + "\n\n" + source
 
-    response = generate(
-        system_prompt="你是一个专业的网文结构分析师。请用中文回答，输出规范的JSON格式。",
-        user_prompt=full_prompt,
-        max_tokens=MAX_TOKENS_ANALYSIS,
+    response = _generate(
+        "你是一个专业的网文结构分析师。请用中文回答，输出规范的JSON格式。",
+        full_prompt,
+        stats,
     )
 
-    return _extract_json(response)
+    structure = _extract_json(response)
+    if notes:
+        structure.update(_merge_lists(notes, STRUCTURE_LISTS))
+        total_chapters = total_chapters or len(structure["chapter_boundaries"])
+        if total_chapters:
+            structure.setdefault("overall_structure", {})["total_chapters"] = total_chapters
+    return structure
 
 
 def analyze_emotion(
     novel_text: str,
     structure: dict,
     progress_callback: Optional[Callable[[str], None]] = None,
+    notes: Optional[list[dict]] = None,
+    stats: Optional[AnalysisStats] = None,
 ) -> dict:
     """
     Round 2: Analyze emotion curves.
@@ -86,6 +482,8 @@ def analyze_emotion(
         novel_text: Full text of the novel
         structure: Result from round 1
         progress_callback: Optional callback for progress updates
+        notes: Chunk notes (chunked mode)
+        stats: Optional usage accumulator
 
     Returns:
         Emotion analysis as dict
@@ -94,16 +492,20 @@ def analyze_emotion(
         progress_callback("第二轮分析：情绪曲线...")
 
     prompt_template = _load_prompt("analyze_emotion")
-    prompt = prompt_template.replace("{structure_json}", json.dumps(structure, ensure_ascii=False, indent=2))
-    full_prompt = prompt + "\n\n" + novel_text
-
-    response = generate(
-        system_prompt="你是一个专业的读者情绪分析师。请用中文回答，输出规范的JSON格式。",
-        user_prompt=full_prompt,
-        max_tokens=MAX_TOKENS_ANALYSIS,
+    prompt = prompt_template.replace("{structure_json}", _embed_json(structure, bool(notes)))
+    source = _notes_source(notes, "emotion") if notes else novel_text
+    full_prompt = prompt + "\n\n" + source
+
+    response = _generate(
+        "你是一个专业的读者情绪分析师。请用中文回答，输出规范的JSON格式。",
+        full_prompt,
+        stats,
     )
 
-    return _extract_json(response)
+    emotion = _extract_json(response)
+    if notes:
+        emotion.update(_merge_lists(notes, EMOTION_LISTS))
+    return emotion
 
 
 def analyze_technique(
@@ -111,6 +513,8 @@ def analyze_technique(
     structure: dict,
     emotion: dict,
     progress_callback: Optional[Callable[[str], None]] = None,
+    notes: Optional[list[dict]] = None,
+    stats: Optional[AnalysisStats] = None,
 ) -> dict:
     """
     Round 3: Extract writing techniques.
@@ -120,6 +524,8 @@ def analyze_technique(
         structure: Result from round 1
         emotion: Result from round 2
         progress_callback: Optional callback for progress updates
+        notes: Chunk notes (chunked mode)
+        stats: Optional usage accumulator
 
     Returns:
         Technique analysis as dict
@@ -127,15 +533,17 @@ def analyze_technique(
     if progress_callback:
         progress_callback("第三轮分析：写作技巧...")
 
+    condensed = bool(notes)
     prompt_template = _load_prompt("analyze_technique")
-    prompt = prompt_template.replace("{structure_json}", json.dumps(structure, ensure_ascii=False, indent=2))
-    prompt = prompt.replace("{emotion_json}", json.dumps(emotion, ensure_ascii=False, indent=2))
-    full_prompt = prompt + "\n\n" + novel_text
-
-    response = generate(
-        system_prompt="你是一个专业的网文写作技巧分析师。请用中文回答，输出规范的JSON格式。",
-        user_prompt=full_prompt,
-        max_tokens=MAX_TOKENS_ANALYSIS,
+    prompt = prompt_template.replace("{structure_json}", _embed_json(structure, condensed))
+    prompt = prompt.replace("{emotion_json}", _embed_json(emotion, condensed))
+    source = _notes_source(notes, "technique") if notes else novel_text
+    full_prompt = prompt + "\n\n" + source
+
+    response = _generate(
+        "你是一个专业的网文写作技巧分析师。请用中文回答，输出规范的JSON格式。",
+        full_prompt,
+        stats,
     )
 
     return _extract_json(response)
@@ -147,6 +555,8 @@ def abstract_to_template(
     emotion: dict,
     technique: dict,
     progress_callback: Optional[Callable[[str], None]] = None,
+    notes: Optional[list[dict]] = None,
+    stats: Optional[AnalysisStats] = None,
 ) -> str:
     """
     Round 4: Abstract to reusable template.
@@ -157,6 +567,8 @@ def abstract_to_template(
         emotion: Result from round 2
         technique: Result from round 3
         progress_callback: Optional callback for progress updates
+        notes: Chunk notes (chunked mode; the chunk summaries replace the text)
+        stats: Optional usage accumulator
 
     Returns:
         Template as YAML string
@@ -164,16 +576,19 @@ def abstract_to_template(
     if progress_callback:
         progress_callback("第四轮分析：抽象为模板...")
 
+    condensed = bool(notes)
     prompt_template = _load_prompt("analyze_abstract")
-    prompt = prompt_template.replace("{structure_json}", json.dumps(structure, ensure_ascii=False, indent=2))
-    prompt = prompt.replace("{emotion_json}", json.dumps(emotion, ensure_ascii=False, indent=2))
-    prompt = prompt.replace("{technique_json}", json.dumps(technique, ensure_ascii=False, indent=2))
-    full_prompt = prompt + "\n\n" + novel_text
-
-    response = generate(
-        system_prompt="你是一个专业的网文模板设计师。请用中文回答，输出规范的YAML格式。",
-        user_prompt=full_prompt,
-        max_tokens=MAX_TOKENS_ANALYSIS,
+    prompt = prompt_template.replace("{structure_json}", _embed_json(structure, condensed))
+    prompt = prompt.replace("{emotion_json}", _embed_json(emotion, condensed))
+    prompt = prompt.replace("{technique_json}", _embed_json(technique, condensed))
+    source = _notes_source(notes, "abstract") if notes else novel_text
+    full_prompt = prompt + "\n\n" + source
+
+    response = _generate(
+        "你是一个专业的网文模板设计师。请用中文回答，输出规范的YAML格式。",
+        full_prompt,
+        stats,
+        validate=_is_yaml_response,
     )
 
     return _extract_yaml(response)
@@ -182,20 +597,55 @@ def abstract_to_template(
 def analyze_novel(
     novel_text: str,
     progress_callback: Optional[Callable[[str], None]] = None,
+    chunk_chars: Optional[int] = None,
+    use_cache: bool = True,
 ) -> tuple[dict, dict, dict, str]:
     """
     Run full four-round analysis on a novel.
 
+    Texts longer than one chunk go through the map-reduce path: one
+    concurrent pass over the chunks, then the four rounds read the chunk
+    notes. Calls, approximate tokens and wall time are reported through
+    progress_callback at the end.
+
     Args:
         novel_text: Full text of the novel
         progress_callback: Optional callback for progress updates
+        chunk_chars: Max characters per chunk (default ANALYSIS_CHUNK_CHARS)
+        use_cache: Reuse / save per-step artifacts (see AnalysisArtifacts)
 
     Returns:
         Tuple of (structure, emotion, technique, template_yaml)
     """
-    structure = analyze_structure(novel_text, progress_callback)
-    emotion = analyze_emotion(novel_text, structure, progress_callback)
-    technique = analyze_technique(novel_text, structure, emotion, progress_callback)
-    template_yaml = abstract_to_template(novel_text, structure, emotion, technique, progress_callback)
+    stats = AnalysisStats()
+    chunk_chars = chunk_chars or CHUNK_CHARS
+    # Chunks are cut from the normalized text so they line up with the artifact key
+    chunks = split_chunks(normalize_source(novel_text), chunk_chars)
+
+    artifacts = AnalysisArtifacts(novel_text, chunk_chars) if use_cache else None
+    if artifacts and progress_callback:
+        progress_callback(f"分析缓存：{artifacts.directory}")
+
+    def step(name, label, compute):
+        if artifacts is None:
+            return compute()
+        return artifacts.step(name, compute, progress_callback, label)
+
+    notes = None
+    if len(chunks) > 1:
+        notes = analyze_chunks(chunks, progress_callback, stats, artifacts=artifacts)
+
+    structure = step("structure.json", "第一轮分析：结构分解", lambda: analyze_structure(
+        novel_text, progress_callback, notes, stats, count_chapters(chunks)))
+    emotion = step("emotion.json", "第二轮分析：情绪曲线", lambda: analyze_emotion(
+        novel_text, structure, progress_callback, notes, stats))
+    technique = step("technique.json", "第三轮分析：写作技巧", lambda: analyze_technique(
+        novel_text, structure, emotion, progress_callback, notes, stats))
+    template_yaml = step("template.yaml", "第四轮分析：抽象为模板", lambda: abstract_to_template(
+        novel_text, structure, emotion, technique, progress_callback, notes, stats))
+
+    if progress_callback:
+        mode = f"分段模式（{len(chunks)} 段）" if notes else "整篇模式"
+        progress_callback(f"分析用量：{mode}，{stats.summary()}")
 
     return structure, emotion, technique, template_yaml
@@ -2,10 +2,12 @@
 Novel Generator - Setting, outline, and chapter generation
 """
 import json
+import os
 import re
 import random
+import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 import yaml
 
 from .ai_client import generate
@@ -15,6 +17,12 @@ PROMPTS_DIR = Path(__file__).parent / "prompts"
 MAX_TOKENS_PER_CHAPTER = 1800  # 约1000字输出
 MAX_TOKENS_ANALYSIS = 4000
 
+# 前文上下文模式：full = 全部前文原文（质量优先），summary = 滚动摘要 + 上一章原文
+CONTEXT_MODE = os.environ.get("CHAPTER_CONTEXT_MODE", "full")
+SUMMARY_FILE = "rolling_summary.json"
+MAX_SUMMARY_CHARS = 600
+MAX_TOKENS_SUMMARY = 1000
+
 # 随机人名库
 MALE_NAMES = ["陈默", "林风", "张远", "王浩", "李明", "赵阳", "周毅", "吴凡", "郑宇", "孙强", "刘峰", "杨磊"]
 FEMALE_NAMES = ["苏晴", "林婉", "陈雨", "王璇", "李婷", "赵雪", "周琳", "吴梦", "郑薇", "孙萌", "刘诗", "杨柳"]
@@ -152,9 +160,18 @@ def generate_chapter(
     outline: dict,
     chapter_num: int,
     previous_chapters: list[str],
+    context_mode: Optional[str] = None,
+    story_dir: Optional[Path] = None,
 ) -> str:
     """
     Generate a single chapter (~1000 words).
+
+    Args:
+        context_mode: "full" sends every previous chapter verbatim; "summary"
+            sends a rolling summary of earlier chapters plus the last chapter
+            verbatim, so the prompt stays roughly constant in size.
+            Defaults to CHAPTER_CONTEXT_MODE (env, default "full").
+        story_dir: Where the rolling summary is cached (summary mode only)
     """
     # Get this chapter's outline
     chapter_outline = None
@@ -166,20 +183,61 @@ def generate_chapter(
     if not chapter_outline:
         raise ValueError(f"Chapter {chapter_num} not found in outline")
 
-    # Extract writing style from template
+    # Stable prefix: identical for every chapter of the book (style, setting,
+    # full outline). In full mode the previous chapters follow one block each;
+    # both only ever grow at the end, so with LLM_PROMPT_CACHING=1 each call
+    # reuses the prefix cached by the previous chapter.
+    prefix = [_chapter_context(template, setting, outline)]
+    mode = context_mode or CONTEXT_MODE
+
+    if not previous_chapters:
+        context = "=== 前文内容 ===\n（这是第一章开头）\n\n"
+    elif mode == "summary":
+        summary = rolling_summary(previous_chapters, story_dir)
+        context = (
+            f"=== 前情提要 ===\n{summary or '（无）'}\n\n"
+            f"=== 上一章原文 ===\n{previous_chapters[-1]}\n\n"
+        )
+    else:
+        prefix.append("=== 前文内容 ===\n")
+        prefix.extend(f"{text}\n\n---\n\n" for text in previous_chapters)
+        context = ""
+
+    prompt = f"""{context}=== 本章大纲 ===
+{json.dumps(chapter_outline, ensure_ascii=False, indent=2)}
+
+=== 任务 ===
+写完整的第{chapter_num}章，约1000字。
+
+要求：
+1. 直接输出正文，不要标题或解释
+2. 对话占比60%以上
+3. 每段不超过3行
+4. 结尾留钩子
+5. 与前文保持人名、情节一致
+6. 严格控制在1000字左右
+
+现在开始写："""
+
+    response = generate(
+        system_prompt="你是番茄小说签约作者。直接输出小说正文，不要任何解释或标题。字数严格控制在1000字左右。",
+        user_prompt=prompt,
+        max_tokens=MAX_TOKENS_PER_CHAPTER,
+        prefix=prefix,
+    )
+
+    return response.strip()
+
+
+def _chapter_context(template: dict, setting: dict, outline: dict) -> str:
+    """Book-level context shared by every chapter call (the cacheable prefix)."""
     writing_style = yaml.dump(
         template.get("writing_style", {}),
         allow_unicode=True,
         default_flow_style=False,
     )
 
-    # Full previous chapters for context (quality first)
-    if previous_chapters:
-        prev_context = "\n\n---\n\n".join(previous_chapters)
-    else:
-        prev_context = "（这是第一章开头）"
-
-    prompt = f"""你是顶级网文写手，正在写一部番茄小说。
+    return f"""你是顶级网文写手，正在写一部番茄小说。
 
 === 写作风格要求 ===
 {writing_style}
@@ -190,34 +248,91 @@ def generate_chapter(
 === 完整大纲 ===
 {json.dumps(outline, ensure_ascii=False, indent=2)}
 
-=== 本章大纲 ===
-{json.dumps(chapter_outline, ensure_ascii=False, indent=2)}
+"""
 
-=== 前文内容 ===
-{prev_context}
 
-=== 任务 ===
-写完整的第{chapter_num}章，约1000字。
+def update_summary(summary: str, chapter_text: str, chapter_num: int) -> str:
+    """Fold one chapter into the rolling summary (one call per chapter)."""
+    prompt = f"""更新小说的前情提要。
 
-要求：
-1. 直接输出正文，不要标题或解释
-2. 对话占比60%以上
-3. 每段不超过3行
-4. 结尾留钩子
-5. 与前文保持人名、情节一致
-6. 严格控制在1000字左右
+=== 已有前情提要（第1-{chapter_num - 1}章）===
+{summary or "（无，这是第一章）"}
 
-现在开始写："""
+=== 第{chapter_num}章原文 ===
+{chapter_text}
+
+把第{chapter_num}章的新进展合并进前情提要：
+1. 保留人名、身份、关系变化、已埋下的伏笔和未解决的冲突
+2. 早期细节可以压缩，但不要丢失关键事实
+3. 总长度不超过{MAX_SUMMARY_CHARS}字
+
+只输出更新后的前情提要："""
 
     response = generate(
-        system_prompt="你是番茄小说签约作者。直接输出小说正文，不要任何解释或标题。字数严格控制在1000字左右。",
+        system_prompt="网文编辑。简洁准确地维护前情提要，只输出提要正文。",
         user_prompt=prompt,
-        max_tokens=MAX_TOKENS_PER_CHAPTER,
+        max_tokens=MAX_TOKENS_SUMMARY,
     )
 
     return response.strip()
 
 
+def _chapter_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def rolling_summary(previous_chapters: list[str], story_dir: Optional[Path] = None) -> str:
+    """
+    Summary of every previous chapter except the last (which is sent verbatim).
+
+    Cached in story_dir/rolling_summary.json, see fold_summaries().
+    """
+    cache_path = Path(story_dir) / SUMMARY_FILE if story_dir else None
+    return fold_summaries(previous_chapters[:-1], cache_path)
+
+
+def fold_summaries(
+    texts: list[str],
+    cache_path: Optional[Path] = None,
+    update: Callable[[str, str, int], str] = update_summary,
+) -> str:
+    """
+    Rolling summary covering all texts, extended one text at a time.
+
+    Each step is cached in cache_path together with a hash of the text it
+    folded in, so resuming or regenerating costs no extra calls. If an
+    already-summarized text was edited, the summary is rebuilt from there.
+
+    Args:
+        update: update(summary, text, number) -> new summary
+    """
+    hashes = [_chapter_hash(text) for text in texts]
+
+    steps = []  # [{"hash": ..., "summary": summary through this text}]
+    if cache_path and cache_path.exists():
+        try:
+            steps = json.loads(cache_path.read_text(encoding="utf-8")).get("steps", [])
+        except (OSError, ValueError):
+            steps = []
+
+    # Keep cached steps only while they still match the texts
+    valid = 0
+    while valid < min(len(steps), len(hashes)) and steps[valid].get("hash") == hashes[valid]:
+        valid += 1
+    steps = steps[:valid]
+
+    summary = steps[-1]["summary"] if steps else ""
+    for index in range(valid, len(texts)):
+        summary = update(summary, texts[index], index + 1)
+        steps.append({"hash": hashes[index], "summary": summary})
+        if cache_path:
+            tmp_path = cache_path.with_suffix(".json.tmp")
+            tmp_path.write_text(json.dumps({"steps": steps}, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+
+    return summary
+
+
 def revise_chapter(
     chapter_text: str,
     feedback: str,
@@ -1,20 +1,64 @@
 """
 URL scraper - best-effort HTML text extraction
+
+fetch_url() fetches a single page. fetch_urls() fetches a list of chapter
+pages concurrently through one pooled HTTP client:
+- keep-alive connections are reused per host
+- politeness: at most SCRAPER_PER_HOST requests in flight per host and at
+  least SCRAPER_MIN_INTERVAL seconds between request starts to the same host;
+  429/503 responses are retried after Retry-After (or exponential backoff)
+- extracted text is cached on disk and revalidated with ETag /
+  Last-Modified, so unchanged pages come back as 304 without a body
+- HTML is decoded and parsed incrementally while streaming, the full page is
+  never held in memory
+
+Environment (optional):
+    SCRAPER_CACHE_DIR: Response cache directory (default <repo>/cache/scraper)
+    SCRAPER_WORKERS: Concurrent fetches across all hosts (default 8)
+    SCRAPER_PER_HOST: Concurrent fetches per host (default 2)
+    SCRAPER_MIN_INTERVAL: Seconds between request starts per host (default 0.5)
 """
+import codecs
+import hashlib
+import json
+import os
 import re
-from typing import Optional
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+CACHE_DIR = Path(os.environ.get(
+    "SCRAPER_CACHE_DIR",
+    Path(__file__).resolve().parents[2] / "cache" / "scraper",
+))
+MAX_WORKERS = int(os.environ.get("SCRAPER_WORKERS", "8"))
+PER_HOST = int(os.environ.get("SCRAPER_PER_HOST", "2"))
+MIN_INTERVAL = float(os.environ.get("SCRAPER_MIN_INTERVAL", "0.5"))
+MAX_RETRIES = 3
+MIN_TEXT_CHARS = 100
+
+# Bytes buffered before choosing a decoder (enough for <meta charset> in <head>)
+SNIFF_BYTES = 4096
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w-]+)""", re.IGNORECASE)
+_HEADER_CHARSET = re.compile(r"charset=([^\s;]+)")
 
 
 class TextExtractor(HTMLParser):
-    """Simple HTML parser to extract text content."""
+    """Simple HTML parser to extract text content (accepts the page in pieces via feed)."""
 
     def __init__(self):
         super().__init__()
         self.text_parts = []
-        self.skip_tags = {"script", "style", "head", "meta", "link"}
+        # meta/link are void elements (no end tag) and carry no text; counting
+        # them here would leave every page after <meta charset> skipped
+        self.skip_tags = {"script", "style", "head"}
         self.current_skip = 0
 
     def handle_starttag(self, tag, attrs):
@@ -35,6 +79,249 @@ class TextExtractor(HTMLParser):
         return "\n".join(self.text_parts)
 
 
+def _clean_text(text: str) -> str:
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def _pick_encoding(content_type: str, head: bytes) -> str:
+    """Charset from the Content-Type header, else from <meta charset>, else utf-8."""
+    for match in (_HEADER_CHARSET.search(content_type or ""), _META_CHARSET.search(head)):
+        if match:
+            name = match.group(1)
+            name = name.decode("ascii", "ignore") if isinstance(name, bytes) else name
+            try:
+                return codecs.lookup(name.strip("\"'")).name
+            except LookupError:
+                continue
+    return "utf-8"
+
+
+def extract_stream(chunks, content_type: str = "") -> str:
+    """
+    Extract text from an iterable of HTML byte chunks.
+
+    The first few KB are buffered to pick the charset; after that each chunk
+    is decoded and fed to the parser as it arrives.
+    """
+    parser = TextExtractor()
+    decoder = None
+    head = b""
+    for chunk in chunks:
+        if decoder is None:
+            head += chunk
+            if len(head) < SNIFF_BYTES:
+                continue
+            decoder = codecs.getincrementaldecoder(_pick_encoding(content_type, head))(errors="replace")
+            chunk, head = head, b""
+        parser.feed(decoder.decode(chunk))
+
+    if decoder is None:  # short page: never reached SNIFF_BYTES
+        decoder = codecs.getincrementaldecoder(_pick_encoding(content_type, head))(errors="replace")
+        parser.feed(decoder.decode(head))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return _clean_text(parser.get_text())
+
+
+class ResponseCache:
+    """Extracted page text with its validators, one JSON file per URL."""
+
+    def __init__(self, directory: Path = CACHE_DIR):
+        self.directory = Path(directory)
+
+    def _path(self, url: str) -> Path:
+        return self.directory / (hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def get(self, url: str) -> Optional[dict]:
+        try:
+            entry = json.loads(self._path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def put(self, url: str, text: str, etag: Optional[str], last_modified: Optional[str]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(url)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        entry = {"url": url, "etag": etag, "last_modified": last_modified, "text": text, "fetched_at": time.time()}
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+class _HostGate:
+    """Per-host concurrency cap plus a minimum interval between request starts."""
+
+    def __init__(self, per_host: int, min_interval: float):
+        self.semaphore = threading.BoundedSemaphore(max(1, per_host))
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self.semaphore.release()
+
+    def back_off(self, seconds: float):
+        """Push every later request to this host back (429/503)."""
+        with self.lock:
+            self.next_start = max(self.next_start, time.monotonic() + seconds)
+
+
+def _retry_after(response: httpx.Response, attempt: int) -> float:
+    value = response.headers.get("Retry-After", "")
+    if value.isdigit():
+        return min(float(value), 120.0)
+    return min(2.0 ** attempt, 60.0)
+
+
+class Scraper:
+    """
+    Pooled, polite fetcher shared by all threads of a batch.
+
+    Args:
+        max_workers: Concurrent fetches across all hosts
+        per_host: Concurrent fetches per host (also the per-host keep-alive pool size)
+        min_interval: Seconds between request starts to the same host
+        timeout: Per-request timeout in seconds
+        cache: Use the on-disk response cache (revalidated with ETag / Last-Modified)
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MAX_WORKERS,
+        per_host: int = PER_HOST,
+        min_interval: float = MIN_INTERVAL,
+        timeout: float = 30,
+        cache: bool = True,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.cache = ResponseCache() if cache else None
+        self.client = httpx.Client(
+            headers={"User-Agent": USER_AGENT},
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_workers, max_keepalive_connections=self.max_workers),
+        )
+        self._gates = {}
+        self._gates_lock = threading.Lock()
+        self.stats = {"fetched": 0, "not_modified": 0, "failed": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.client.close()
+
+    def _gate(self, url: str) -> _HostGate:
+        host = urlsplit(url).netloc.lower()
+        with self._gates_lock:
+            gate = self._gates.get(host)
+            if gate is None:
+                gate = self._gates[host] = _HostGate(self.per_host, self.min_interval)
+            return gate
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def fetch(self, url: str) -> Optional[str]:
+        """Fetch one page and return its extracted text (None on failure)."""
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        gate = self._gate(url)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                with gate, self.client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304 and cached:
+                        self._count("not_modified")
+                        return cached["text"]
+                    if response.status_code in (429, 503) and attempt < MAX_RETRIES:
+                        gate.back_off(_retry_after(response, attempt))
+                        self._count("retries")
+                        continue
+                    response.raise_for_status()
+                    text = extract_stream(response.iter_bytes(), response.headers.get("Content-Type", ""))
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+            except httpx.HTTPError as e:
+                print(f"URL fetch failed: {url}: {e}")
+                self._count("failed")
+                return None
+
+            self._count("fetched")
+            if self.cache and (etag or last_modified):
+                self.cache.put(url, text, etag, last_modified)
+            return text
+
+        self._count("failed")
+        return None
+
+    def fetch_many(
+        self,
+        urls: list[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> list[Optional[str]]:
+        """Fetch all URLs concurrently; results are in input order (None for failures)."""
+        done = 0
+        lock = threading.Lock()
+
+        def run(url):
+            nonlocal done
+            text = self.fetch(url)
+            with lock:
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(urls))
+            return text
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(run, urls))
+
+
+def fetch_urls(
+    urls: list[str],
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    **scraper_options,
+) -> list[Optional[str]]:
+    """
+    Fetch a list of chapter URLs concurrently.
+
+    Args:
+        urls: Pages to fetch (duplicates are fetched once)
+        progress_callback: Called with (done, total) after each page
+        **scraper_options: See Scraper (max_workers, per_host, min_interval, timeout, cache)
+
+    Returns:
+        Extracted text per URL in input order (None where the fetch failed)
+    """
+    unique = list(dict.fromkeys(urls))
+    with Scraper(**scraper_options) as scraper:
+        texts = dict(zip(unique, scraper.fetch_many(unique, progress_callback)))
+    return [texts[url] for url in urls]
+
+
 def fetch_url(url: str, timeout: int = 30) -> Optional[str]:
     """
     Fetch and extract text content from a URL.
@@ -47,39 +334,11 @@ def fetch_url(url: str, timeout: int = 30) -> Optional[str]:
         Extracted text content, or None on failure
     """
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        request = Request(url, headers=headers)
-
-        with urlopen(request, timeout=timeout) as response:
-            # Try to detect encoding
-            content_type = response.headers.get("Content-Type", "")
-            encoding = "utf-8"
-            if "charset=" in content_type:
-                match = re.search(r"charset=([^\s;]+)", content_type)
-                if match:
-                    encoding = match.group(1)
-
-            html = response.read().decode(encoding, errors="replace")
-
-        # Extract text
-        parser = TextExtractor()
-        parser.feed(html)
-        text = parser.get_text()
-
-        # Clean up
-        text = re.sub(r"\n{3,}", "\n\n", text)
-        text = text.strip()
-
-        if len(text) < 100:
-            return None
-
-        return text
-
-    except (URLError, HTTPError, TimeoutError, UnicodeDecodeError) as e:
-        print(f"URL fetch failed: {e}")
-        return None
+        text = fetch_urls([url], timeout=timeout)[0]
     except Exception as e:
         print(f"Unexpected error: {e}")
         return None
+
+    if not text or len(text) < MIN_TEXT_CHARS:
+        return None
+    return text
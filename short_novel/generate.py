@@ -13,6 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 import yaml
 from core.template_manager import list_templates, load_template, get_template_summary
 from core.generator import generate_setting, generate_outline, generate_chapter, revise_chapter
+from core.ai_client import prompt_cache
 
 # Direct path to avoid import issues
 STORIES_DIR = Path(__file__).parent / "stories"
@@ -150,13 +151,16 @@ def generate_chapters(
 
         # Generate
         print("正在生成...")
+        cache_before = prompt_cache.snapshot()
         chapter_text = generate_chapter(
             template,
             setting,
             outline,
             chapter_num,
             chapters,
+            story_dir=story_dir,
         )
+        cache_line = prompt_cache.format_stats(prompt_cache.stats_since(cache_before))
 
         # Save draft
         chapter_path = story_dir / "chapters" / f"chapter_{chapter_num:02d}.md"
@@ -168,6 +172,8 @@ def generate_chapters(
         print("-" * 40)
         print(f"\n字数：{len(chapter_text)} 字")
         print(f"已保存至：{chapter_path}")
+        if cache_line:
+            print(cache_line)
 
         # User review
         while True:
@@ -188,7 +194,7 @@ def generate_chapters(
             elif action == "2":
                 print("\n重新生成...")
                 chapter_text = generate_chapter(
-                    template, setting, outline, chapter_num, chapters
+                    template, setting, outline, chapter_num, chapters, story_dir=story_dir
                 )
                 chapter_path.write_text(chapter_text, encoding="utf-8")
                 print("\n" + "-" * 40)
@@ -2,15 +2,26 @@
 """
 高质量短篇小说生成器 - 分段生成防超时
 每段输出约1000字，输入包含完整上下文保证质量
+
+用法:
+    python3 generate_lite.py            # 新建故事
+    python3 generate_lite.py <故事目录>  # 从已保存的段落继续
 """
 import sys
+import json
 import random
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from core.ai_client import generate
+from core.ai_client import generate, prompt_cache
+from core.generator import fold_summaries
+
+STORY_FILE = "story.json"
+SUMMARY_FILE = "summary.json"
+MAX_SUMMARY_CHARS = 300
 
 # 人名库
 MALE_NAMES = ["陈默", "林风", "张远", "王浩", "李明", "赵阳", "周毅", "吴凡", "郑宇", "孙强"]
@@ -102,9 +113,8 @@ def generate_segment(
 ) -> str:
     """生成一个高质量段落"""
 
-    prompt = f"""{template.format(**names)}
-
-===== 当前任务 =====
+    # 模板部分整篇不变，作为可缓存前缀（LLM_PROMPT_CACHING=1 时生效）
+    prompt = f"""===== 当前任务 =====
 写第 {segment_num}/10 段，约1000-1200字。
 
 本段节拍：{beat['name']}
@@ -129,65 +139,128 @@ def generate_segment(
         system_prompt="你是番茄小说的顶级签约作者，擅长写节奏紧凑、爽点密集的短篇爽文。直接输出小说正文，不要任何解释。",
         user_prompt=prompt,
         max_tokens=2000,
+        prefix=template.format(**names) + "\n\n",
     )
 
 
-def summarize_previous(all_text: str) -> str:
-    """总结前文要点"""
-    if len(all_text) < 500:
-        return all_text
+def update_summary(summary: str, segment: str, segment_num: int) -> str:
+    """把新写完的一段并入已有前文摘要（只发送新段落，不重读前文）"""
+    prompt = f"""更新小说的前文摘要。
 
-    prompt = f"""请用150字以内总结以下小说片段的关键情节、人物状态、重要事件：
+===== 已有摘要（第1-{segment_num - 1}段）=====
+{summary or "无，这是开头。"}
 
-{all_text[-3000:]}
+===== 第{segment_num}段原文 =====
+{segment}
 
-只输出总结，不要其他内容："""
+把第{segment_num}段的关键情节、人物状态、重要事件并入摘要，总长度不超过{MAX_SUMMARY_CHARS}字。
+只输出更新后的摘要，不要其他内容："""
 
     return generate(
         system_prompt="简洁总结小说情节。",
         user_prompt=prompt,
-        max_tokens=300,
-    )
+        max_tokens=600,
+    ).strip()
 
 
-def main():
-    print("=" * 50)
-    print("  高质量短篇小说生成器")
-    print("  (分10段生成，每段~1000字)")
-    print("=" * 50)
+class RollingSummary:
+    """
+    增量前文摘要
 
-    # 选择类型
-    print("\n选择类型:")
-    print("  1. 赘婿逆袭 (男频爽文)")
-    print("  2. 闪婚总裁 (女频甜宠)")
+    每段写完后在后台线程把这一段并入摘要，与下一段的生成并行（下一段以上一段结尾原文衔接，
+    只需要更早段落的摘要）；每一步按段落哈希缓存在故事目录的 summary.json 中，
+    中断后继续或重写某段时只补算变化的部分。
+    """
 
-    choice = input("\n选择 [1/2]: ").strip()
+    def __init__(self, story_dir: Path):
+        self.cache_path = story_dir / SUMMARY_FILE
+        # 单线程：各次并入按提交顺序执行，后一次直接读取前一次的缓存
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self._pending = []  # [(段数, future)]
+
+    def _fold(self, segments):
+        return fold_summaries(segments, self.cache_path, update=update_summary)
+
+    def submit(self, segments: list):
+        """后台把 segments 中尚未摘要的段落并入摘要"""
+        self._pending.append((len(segments), self._executor.submit(self._fold, list(segments))))
+
+    def get(self, segments: list) -> str:
+        """覆盖 segments 的摘要：只等待所需范围内的后台任务，更靠后的并入继续在后台运行"""
+        for count, future in self._pending:
+            if count <= len(segments):
+                future.result()
+        self._pending = [(count, future) for count, future in self._pending if not future.done()]
+        # 所需步骤已在缓存中时不调用模型
+        return self._fold(segments)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
 
-    if choice == "2":
-        template = TEMPLATE_FEMALE
-        beats = BEATS_FEMALE
-        genre = "闪婚总裁"
-    else:
-        template = TEMPLATE_MALE
-        beats = BEATS_MALE
-        genre = "赘婿逆袭"
 
-    # 随机人名
-    names = random_names()
-    print(f"\n角色: 主角={names['male']}, 女主={names['female']}, 反派={names['villain']}")
+def load_story(story_dir: Path):
+    """读取已保存的故事（继续生成用）"""
+    meta = json.loads((story_dir / STORY_FILE).read_text(encoding="utf-8"))
+    segments = []
+    for i in range(1, 11):
+        found = sorted(story_dir.glob(f"part_{i:02d}_*.txt"))
+        if not found:
+            break
+        segments.append(found[0].read_text(encoding="utf-8"))
+    return meta, segments
 
-    change = input("更换名字? [y/N]: ").strip().lower()
-    if change == 'y':
-        names['male'] = input(f"主角名[{names['male']}]: ").strip() or names['male']
-        names['female'] = input(f"女主名[{names['female']}]: ").strip() or names['female']
-        names['villain'] = input(f"反派名[{names['villain']}]: ").strip() or names['villain']
 
-    # 创建输出目录
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = Path(__file__).parent / "stories" / f"{genre}_{names['male']}_{timestamp}"
-    output_dir.mkdir(parents=True, exist_ok=True)
+def main():
+    print("=" * 50)
+    print("  高质量短篇小说生成器")
+    print("  (分10段生成，每段~1000字)")
+    print("=" * 50)
 
-    print(f"\n保存目录: {output_dir}")
+    resume_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    if resume_dir and (resume_dir / STORY_FILE).exists():
+        output_dir = resume_dir
+        meta, segments = load_story(output_dir)
+        genre, names = meta["genre"], meta["names"]
+        template, beats = (TEMPLATE_FEMALE, BEATS_FEMALE) if genre == "闪婚总裁" else (TEMPLATE_MALE, BEATS_MALE)
+        print(f"\n继续生成: {output_dir}（已有 {len(segments)}/10 段）")
+    else:
+        segments = []
+        # 选择类型
+        print("\n选择类型:")
+        print("  1. 赘婿逆袭 (男频爽文)")
+        print("  2. 闪婚总裁 (女频甜宠)")
+
+        choice = input("\n选择 [1/2]: ").strip()
+
+        if choice == "2":
+            template = TEMPLATE_FEMALE
+            beats = BEATS_FEMALE
+            genre = "闪婚总裁"
+        else:
+            template = TEMPLATE_MALE
+            beats = BEATS_MALE
+            genre = "赘婿逆袭"
+
+        # 随机人名
+        names = random_names()
+        print(f"\n角色: 主角={names['male']}, 女主={names['female']}, 反派={names['villain']}")
+
+        change = input("更换名字? [y/N]: ").strip().lower()
+        if change == 'y':
+            names['male'] = input(f"主角名[{names['male']}]: ").strip() or names['male']
+            names['female'] = input(f"女主名[{names['female']}]: ").strip() or names['female']
+            names['villain'] = input(f"反派名[{names['villain']}]: ").strip() or names['villain']
+
+        # 创建输出目录
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = Path(__file__).parent / "stories" / f"{genre}_{names['male']}_{timestamp}"
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        print(f"\n保存目录: {output_dir}")
+
+        (output_dir / STORY_FILE).write_text(
+            json.dumps({"genre": genre, "names": names}, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
 
     # 显示剧情大纲
     print("\n" + "=" * 50)
@@ -199,11 +272,14 @@ def main():
     input("\n按回车开始生成...")
 
     # 逐段生成
-    segments = []
-    previous_text = ""
-    all_previous_summary = ""
+    summarizer = RollingSummary(output_dir)
+    # 已有段落（继续生成时）先在后台补齐摘要
+    if segments:
+        summarizer.submit(segments[:-1])
+        summarizer.submit(segments)
 
-    for i in range(1, 11):
+    i = len(segments) + 1
+    while i <= 10:
         beat = beats[i-1]
 
         print(f"\n{'='*50}")
@@ -213,6 +289,11 @@ def main():
         print("\n生成中...")
 
         try:
+            # 上一段以结尾原文衔接，更早的段落用摘要
+            previous_text = segments[-1][-300:] if segments else ""
+            all_previous_summary = summarizer.get(segments[:-1])
+
+            cache_before = prompt_cache.snapshot()
             segment = generate_segment(
                 segment_num=i,
                 beat=beat,
@@ -223,6 +304,8 @@ def main():
             )
 
             # 保存
+            for old_file in output_dir.glob(f"part_{i:02d}_*.txt"):
+                old_file.unlink()
             seg_file = output_dir / f"part_{i:02d}_{beat['name']}.txt"
             seg_file.write_text(segment, encoding="utf-8")
             segments.append(segment)
@@ -232,15 +315,13 @@ def main():
             print(segment[:500] + "..." if len(segment) > 500 else segment)
             print(f"{'-'*40}")
             print(f"字数: {len(segment)}")
+            cache_line = prompt_cache.format_stats(prompt_cache.stats_since(cache_before))
+            if cache_line:
+                print(cache_line)
 
-            # 更新上下文
-            previous_text = segment[-300:] if len(segment) > 300 else segment
-
-            # 每3段总结一次前文
-            if i % 3 == 0 and i < 10:
-                print("\n更新前文摘要...")
-                full_so_far = "\n\n".join(segments)
-                all_previous_summary = summarize_previous(full_so_far)
+            # 本段在后台并入摘要，与审阅和下一段的生成并行（下下段开始用到）
+            if i + 2 <= 10:
+                summarizer.submit(segments)
 
             # 确认继续
             if i < 10:
@@ -251,6 +332,7 @@ def main():
                     segments.pop()
                     print("重新生成本段...")
                     continue
+            i += 1
 
         except Exception as e:
             print(f"\n生成失败: {e}")
@@ -259,9 +341,11 @@ def main():
                 break
             elif retry == 's':
                 segments.append(f"[第{i}段生成失败，待补充]")
-                previous_text = ""
+                i += 1
             # 否则重试当前段
 
+    summarizer.close()
+
     # 合并输出
     if segments:
         # 分段版本
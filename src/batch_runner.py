@@ -0,0 +1,185 @@
+"""
+多项目批量生成 - Multi-Project Batch Runner
+
+无人值守地并发生成多个项目（适合夜间跑满 API 配额）：
+- 每个项目使用自己的 SQLite 数据库和 checkpoint 线程，有断点自动续写
+- 所有项目共享全局限流器（每分钟请求/token 配额 + 自适应并发窗口）
+- 结束时输出每个项目和整体的吞吐量（章/小时）
+
+用法:
+    python3 src/batch_runner.py <project_id> [<project_id> ...]
+    python3 src/batch_runner.py --all --max-calls 8 --rpm 120 --tpm 400000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from src.main import (
+    load_project_config,
+    config_to_initial_state,
+    arun_generation,
+    new_run_result,
+    save_world_bible,
+)
+from src.project_manager import ProjectManager
+from src.utils import pipeline
+from src.utils.rate_limiter import configure_limiter, get_limiter
+
+
+def select_projects(pm, project_ids, run_all=False):
+    """
+    确定本次要运行的项目（跳过不存在和已完成的项目）
+
+    Returns:
+        list: 项目ID列表
+    """
+    projects = pm.list_projects()
+
+    if run_all:
+        project_ids = list(projects.keys())
+
+    selected = []
+    for project_id in project_ids:
+        info = projects.get(project_id)
+        if info is None:
+            print(f"⚠️  项目不存在，跳过: {project_id}")
+            continue
+        if info.get("status") == "completed" or info.get("current_chapter", 0) >= info.get("target_chapters", 1):
+            print(f"✅ 已完成，跳过: {info['title']} ({project_id})")
+            continue
+        selected.append(project_id)
+
+    return selected
+
+
+async def run_project(pm, project_id, project_slots):
+    """运行单个项目直到完成，返回运行摘要"""
+    paths = pm.get_project_paths(project_id)
+    config = load_project_config(paths['config_file'])
+    title = config['novel']['title']
+    label = f"[{title}] "
+
+    summary = {
+        "project_id": project_id,
+        "title": title,
+        "chapters": 0,
+        "elapsed": 0.0,
+        "status": "failed",
+    }
+
+    async with project_slots:
+        started_at = time.time()
+        result = new_run_result()
+        try:
+            # 新项目的初始状态可能需要 AI 生成总纲/卷纲（同步调用），放到线程中
+            initial_state = await asyncio.to_thread(config_to_initial_state, config, paths)
+            initial_state['project_paths'] = paths
+
+            config_obj = {"configurable": {"thread_id": f"novel_{project_id}"}}
+            await arun_generation(
+                config, paths, initial_state, config_obj, pm, project_id,
+                interactive=False, label=label, result=result
+            )
+            summary["status"] = "done"
+        except Exception as e:
+            print(f"\n{label}❌ 生成失败: {str(e)[:100]}")
+            summary["error"] = str(e)
+
+        summary["elapsed"] = time.time() - started_at
+
+    # 已完成的章节已写入 checkpoint，无论后续是否出错都计入报告并保存世界状态
+    summary["chapters"] = result["chapters_completed"]
+    final_state = result["final_state"]
+    if final_state and 'world_bible' in final_state:
+        try:
+            save_world_bible(final_state['world_bible'], config, paths['bible_dir'])
+        except OSError as e:
+            print(f"\n{label}⚠️  世界状态保存失败: {e}")
+
+    if summary["chapters"] > 0 and summary["elapsed"] > 0:
+        pm.record_throughput(project_id, "batch", summary["chapters"] * 3600 / summary["elapsed"])
+
+    return summary
+
+
+async def run_batch(project_ids, max_projects, pm=None):
+    pm = pm or ProjectManager()
+    project_slots = asyncio.Semaphore(max_projects)
+
+    tasks = [run_project(pm, project_id, project_slots) for project_id in project_ids]
+    return await asyncio.gather(*tasks)
+
+
+def print_batch_report(summaries, wall_time):
+    """输出批量运行的吞吐量报告"""
+    print("\n" + "=" * 60)
+    print("📊 批量生成报告")
+    print("=" * 60)
+
+    for s in summaries:
+        rate = s["chapters"] * 3600 / s["elapsed"] if s["elapsed"] > 0 else 0
+        status = "✅" if s["status"] == "done" else "❌"
+        print(f"{status} {s['title'][:20]:<20} {s['chapters']:>4} 章  "
+              f"{s['elapsed'] / 60:>6.1f} 分钟  {rate:>6.1f} 章/小时")
+
+    total_chapters = sum(s["chapters"] for s in summaries)
+    print("-" * 60)
+    print(f"   项目数: {len(summaries)}  总章节: {total_chapters}  总耗时: {wall_time / 60:.1f} 分钟")
+    if wall_time > 0:
+        print(f"   整体吞吐量: {total_chapters * 3600 / wall_time:.1f} 章/小时")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多项目批量生成（无人值守）")
+    parser.add_argument("project_ids", nargs="*", help="项目ID（见 ./novel.sh projects）")
+    parser.add_argument("--all", action="store_true", help="运行所有未完成的项目")
+    parser.add_argument("--max-projects", type=int, default=4, help="同时运行的项目数")
+    parser.add_argument("--max-calls", type=int, default=8, help="全局同时进行的 API 调用上限（过载时自动收缩）")
+    parser.add_argument("--rpm", type=int, default=None, help="全局每分钟请求数上限")
+    parser.add_argument("--tpm", type=int, default=None, help="全局每分钟 token 上限")
+    args = parser.parse_args()
+
+    if not os.getenv("ANTHROPIC_API_KEY"):
+        print("❌ Error: ANTHROPIC_API_KEY environment variable not set!")
+        sys.exit(1)
+
+    pm = ProjectManager()
+    project_ids = select_projects(pm, args.project_ids, run_all=args.all)
+    if not project_ids:
+        print("⚠️  没有需要生成的项目")
+        return
+
+    configure_limiter(
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        max_concurrency=args.max_calls
+    )
+
+    print(f"\n🚀 批量生成 {len(project_ids)} 个项目")
+    print(f"   同时运行项目: {args.max_projects}")
+    print(f"   API 并发上限: {args.max_calls}")
+    print(f"   每分钟请求上限: {args.rpm or '不限'}")
+    print(f"   每分钟 token 上限: {args.tpm or '不限'}")
+
+    started_at = time.time()
+    summaries = []
+    try:
+        summaries = asyncio.run(run_batch(project_ids, args.max_projects))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  批量生成已中断")
+        print("   进度已保存，下次运行将从断点继续")
+    finally:
+        pipeline.drain()
+
+    if summaries:
+        print_batch_report(summaries, time.time() - started_at)
+
+        stats = get_limiter().stats
+        print(f"   API 调用: {stats['calls']} 次  过载: {stats['overloads']} 次  限流等待: {stats['wait_seconds']:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
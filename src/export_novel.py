@@ -0,0 +1,191 @@
+"""
+整书导出 - Streaming TXT / EPUB Exporter
+
+从章节存储逐章流式读取，写出合并 TXT 或 EPUB（zip 流式写入），
+内存占用只与单章大小有关，200 万字的长篇也不会一次性载入。
+
+用法:
+    python3 src/export_novel.py                       # 导出当前项目（TXT + EPUB）
+    python3 src/export_novel.py <project_id> --format epub
+    python3 src/export_novel.py --format files        # 兼容导出为逐章 txt
+"""
+
+import argparse
+import html
+import os
+import sys
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.project_manager import ProjectManager
+from src.utils.manuscript_store import get_store
+from src.utils.yaml_cache import load_yaml
+
+
+def export_txt(store, out_path, title):
+    """合并导出 TXT（书名 + 各章，章节之间空两行）"""
+    header = f"{title}\n\n\n"
+    return store.export_text(out_path, separator="\n\n\n", header=header)
+
+
+def _chapter_xhtml_lines(chapter_index, text):
+    """把一章纯文本转成 XHTML（首行作为标题，其余每个非空行一个段落）"""
+    title, _, body = text.partition("\n")
+    title = title.strip() or f"第 {chapter_index} 章"
+
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<!DOCTYPE html>\n'
+           '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="zh">\n'
+           f'<head><meta charset="utf-8"/><title>{html.escape(title)}</title></head>\n'
+           f'<body>\n<h2>{html.escape(title)}</h2>\n')
+    for line in body.split("\n"):
+        line = line.strip()
+        if line:
+            yield f"<p>{html.escape(line)}</p>\n"
+    yield "</body>\n</html>\n"
+
+
+def export_epub(store, out_path, title, author="AI", language="zh"):
+    """
+    流式导出 EPUB 3
+
+    章节逐个写入 zip；目录（nav / ncx / opf）在章节写完后根据收集到的标题生成。
+    """
+    book_id = f"urn:uuid:{uuid.uuid4()}"
+    modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    toc = []  # (chapter_index, file_name, title)
+
+    tmp_path = f"{out_path}.tmp"
+    with zipfile.ZipFile(tmp_path, "w") as zf:
+        # mimetype 必须是第一个文件且不压缩
+        zf.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>\n'
+            '</container>\n',
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+        for chapter_index, chunk in store.iter_chapter_bytes():
+            text = str(chunk, "utf-8")
+            file_name = f"chapter_{chapter_index:05d}.xhtml"
+            info = zipfile.ZipInfo(f"OEBPS/{file_name}", date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, "w") as f:
+                for line in _chapter_xhtml_lines(chapter_index, text):
+                    f.write(line.encode("utf-8"))
+            toc.append((chapter_index, file_name, text.partition("\n")[0].strip() or f"第 {chapter_index} 章"))
+
+        nav_items = "".join(
+            f'<li><a href="{name}">{html.escape(chapter_title)}</a></li>\n' for _, name, chapter_title in toc
+        )
+        zf.writestr(
+            "OEBPS/nav.xhtml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="zh">\n'
+            f'<head><meta charset="utf-8"/><title>{html.escape(title)}</title></head>\n'
+            f'<body>\n<nav epub:type="toc" id="toc"><h1>目录</h1>\n<ol>\n{nav_items}</ol>\n</nav>\n</body>\n</html>\n',
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+        nav_points = "".join(
+            f'<navPoint id="p{index}" playOrder="{order}"><navLabel><text>{html.escape(chapter_title)}</text></navLabel>'
+            f'<content src="{name}"/></navPoint>\n'
+            for order, (index, name, chapter_title) in enumerate(toc, 1)
+        )
+        zf.writestr(
+            "OEBPS/toc.ncx",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+            f'<head><meta name="dtb:uid" content="{book_id}"/></head>\n'
+            f'<docTitle><text>{html.escape(title)}</text></docTitle>\n'
+            f'<navMap>\n{nav_points}</navMap>\n</ncx>\n',
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+        manifest = "".join(
+            f'<item id="c{index}" href="{name}" media-type="application/xhtml+xml"/>\n' for index, name, _ in toc
+        )
+        spine = "".join(f'<itemref idref="c{index}"/>\n' for index, _, _ in toc)
+        zf.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="bookid">{book_id}</dc:identifier>\n'
+            f'<dc:title>{html.escape(title)}</dc:title>\n'
+            f'<dc:creator>{html.escape(author)}</dc:creator>\n'
+            f'<dc:language>{language}</dc:language>\n'
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            '</metadata>\n'
+            '<manifest>\n'
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+            '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>\n'
+            f'{manifest}</manifest>\n'
+            f'<spine toc="ncx">\n{spine}</spine>\n'
+            '</package>\n',
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+    os.replace(tmp_path, out_path)
+    return len(toc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出整本小说（TXT / EPUB / 逐章文件）")
+    parser.add_argument("project_id", nargs="?", help="项目ID（默认当前项目）")
+    parser.add_argument("--format", choices=["txt", "epub", "files", "all"], default="all",
+                        help="导出格式（all = txt + epub）")
+    parser.add_argument("--output", help="输出目录（默认项目目录下的 export/）")
+    args = parser.parse_args()
+
+    pm = ProjectManager()
+    project_id = args.project_id or pm.get_current_project_id()
+    project = pm.get_project(project_id) if project_id else None
+    if project is None:
+        print("❌ 未找到项目，请指定项目ID（见 ./novel.sh projects）")
+        sys.exit(1)
+
+    title = project["title"]
+    author = "AI"
+    try:
+        novel = (load_yaml(project["config_file"]) or {}).get("novel", {})
+        title = novel.get("title", title)
+        author = novel.get("author", author)
+    except OSError:
+        pass
+
+    store = get_store(project["manuscript_dir"])
+    output_dir = Path(args.output) if args.output else Path(project["manuscript_dir"]).parent / "export"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    safe_title = "".join(c for c in title if c.isalnum() or c in "-_ ").strip() or project_id
+
+    print(f"\n📤 导出: {title}（{len(store.chapter_indices())} 章）")
+    started_at = time.time()
+
+    if args.format in ("txt", "all"):
+        out_path = output_dir / f"{safe_title}.txt"
+        count = export_txt(store, out_path, title)
+        print(f"   ✅ TXT: {out_path}（{count} 章, {out_path.stat().st_size / 1024 / 1024:.1f} MB）")
+
+    if args.format in ("epub", "all"):
+        out_path = output_dir / f"{safe_title}.epub"
+        count = export_epub(store, out_path, title, author)
+        print(f"   ✅ EPUB: {out_path}（{count} 章, {out_path.stat().st_size / 1024 / 1024:.1f} MB）")
+
+    if args.format == "files":
+        files_dir = output_dir / "chapters"
+        count = store.export_chapter_files(files_dir)
+        print(f"   ✅ 逐章文件: {files_dir}（{count} 个）")
+
+    print(f"   ⏱️  耗时 {time.time() - started_at:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
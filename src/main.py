@@ -1,13 +1,18 @@
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.sqlite import SqliteSaver
 from src.state import NovelState
-from src.nodes.planner import planner_node
-from src.nodes.writer import writer_node
-from src.nodes.critic import critic_node
-from src.nodes.memory import memory_update_node
+from src.nodes.planner import planner_node, aplanner_node
+from src.nodes.writer import writer_node, awriter_node
+from src.nodes.critic import critic_node, acritic_node
+from src.nodes.memory import memory_update_node, amemory_update_node, pipelined_memory_node
+from src.utils import pipeline, prompt_cache
+from src.utils.checkpointer import CompactSqliteSaver
+from src.utils.bible_digest import build_digest
+from src.utils.yaml_cache import load_yaml, load_outline
 from src.project_manager import ProjectManager
-import sqlite3
+import asyncio
+import time
 import json
+import copy
 import yaml
 import sys
 import os
@@ -38,15 +43,18 @@ def load_config():
         print("请先运行: ./novel.sh new")
         sys.exit(1)
 
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    return load_project_config(config_path)
 
-    return config
+
+def load_project_config(config_path):
+    """读取指定项目的配置文件"""
+    # 返回副本：调用方会修改配置，缓存中的解析结果保持原样
+    return load_yaml(config_path, copy=True)
 
 
 def _ai_generate_outline(novel_config):
     """使用 AI 生成故事总纲"""
-    from langchain_anthropic import ChatAnthropic
+    from src.utils.llm_client import get_llm, is_json_object
     from langchain_core.messages import HumanMessage
 
     synopsis = novel_config.get('synopsis', '')
@@ -71,13 +79,11 @@ def _ai_generate_outline(novel_config):
 {{"main_goal": "...", "main_conflict": "...", "protagonist_arc": "..."}}"""
 
     try:
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.7,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=30.0,
-            max_retries=2
+            max_retries=2,
+            cache=is_json_object  # 崩溃重跑时复用已生成的总纲（只缓存可解析的响应）
         )
 
         response = llm.invoke([HumanMessage(content=prompt)])
@@ -123,49 +129,160 @@ def _ai_generate_outline(novel_config):
         }
 
 
-def _ai_generate_volumes(novel_config, novel_outline, target_chapters, total_volumes):
-    """使用 AI 生成卷纲框架（分批生成避免超时）"""
-    from langchain_anthropic import ChatAnthropic
-    from langchain_core.messages import HumanMessage
-    import time
+VOLUME_BATCH_SIZE = 7  # 每批最多生成的卷数
 
-    synopsis = novel_config.get('synopsis', '')
-    novel_type = novel_config.get('type', '未知')
-    main_goal = novel_outline.get('main_goal', '')
 
-    # 🔧 策略：每批最多生成 6-8 个卷，分批调用 AI
-    batch_size = 7  # 每批7个卷
-    total_batches = (total_volumes + batch_size - 1) // batch_size
+def _volume_chapter_range(vol_idx, target_chapters):
+    start_ch = (vol_idx - 1) * 25 + 1
+    end_ch = min(vol_idx * 25, target_chapters)
+    return f'{start_ch}-{end_ch}'
 
-    if total_volumes > batch_size:
-        print(f"   📊 卷数较多({total_volumes}卷)，分 {total_batches} 批生成")
 
-    all_volumes = []
+def _parse_json_array(result_text):
+    """从模型响应中提取 JSON 数组（去掉代码块、尝试修复尾逗号）"""
+    import re
 
-    for batch_idx in range(total_batches):
-        batch_start = batch_idx * batch_size + 1
-        batch_end = min((batch_idx + 1) * batch_size, total_volumes)
-        batch_count = batch_end - batch_start + 1
+    if "```json" in result_text:
+        result_text = result_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in result_text:
+        result_text = result_text.split("```")[1].split("```")[0].strip()
 
-        print(f"   🤖 批次 {batch_idx+1}/{total_batches}: 生成第 {batch_start}-{batch_end} 卷...")
+    # 🔧 清理可能的问题字符
+    result_text = result_text.replace('\ufeff', '').replace('\u200b', '')
 
-        # 构建该批次的上下文
-        if batch_idx > 0:
-            # 如果不是第一批，提供前面卷的信息作为上下文
-            prev_volumes_context = "\n".join([
-                f"第{i+1}卷《{v['title']}》: {v['core_goal']}"
-                for i, v in enumerate(all_volumes[-3:])  # 只取最近3卷
-            ])
-            context_info = f"\n【前面卷概况】\n{prev_volumes_context}\n"
+    try:
+        return json.loads(result_text)
+    except json.JSONDecodeError as je:
+        # JSON 解析失败，尝试修复
+        print(f"      ⚠️  JSON 格式问题，尝试修复...")
+        result_text = re.sub(r',(\s*[}\]])', r'\1', result_text)
+
+        try:
+            return json.loads(result_text)
+        except:
+            # 修复失败，打印调试信息
+            print(f"      原始响应: {result_text[:150]}...")
+            raise je
+
+
+def _fallback_volumes(novel_type, batch_start, batch_count, target_chapters, total_volumes):
+    """批次生成失败时的降级卷框架"""
+    volumes = []
+    for i in range(batch_count):
+        vol_idx = batch_start + i
+
+        # 根据卷的位置确定阶段
+        progress = vol_idx / total_volumes
+        if progress <= 0.3:
+            stage_name = ["萌芽", "起步", "初探", "试炼", "成长"][i % 5]
+            stage = "前期"
+            goal = f"建立基础，初步了解{novel_type}世界"
+            events = ['初次冲突', '结识盟友', '获得机遇']
+        elif progress <= 0.7:
+            stage_name = ["风云", "激荡", "对抗", "突破", "崛起"][i % 5]
+            stage = "中期"
+            goal = f"提升实力，应对{novel_type}挑战"
+            events = ['强敌现身', '激烈较量', '重大转折']
         else:
-            context_info = ""
+            stage_name = ["巅峰", "决战", "终局", "归来", "超越"][i % 5]
+            stage = "后期"
+            goal = f"接近目标，解决{novel_type}核心矛盾"
+            events = ['最终对决', '真相大白', '完成使命']
+
+        volumes.append({
+            'title': f'{stage_name}之章',
+            'chapters': _volume_chapter_range(vol_idx, target_chapters),
+            'core_goal': goal,
+            'key_events': events,
+            'ending_state': f'{stage}完成',
+            'foreshadowing': []
+        })
+    return volumes
 
-        prompt = f"""你是资深网文编辑，根据以下信息生成卷纲框架：
+
+def _ai_generate_volume_waypoints(novel_config, novel_outline, target_chapters, total_volumes):
+    """
+    两阶段卷纲 - 阶段一：一次调用生成全书骨架
+
+    每卷只输出卷名 + 一句话弧线目标，输出量小，单次调用即可覆盖全部卷。
+
+    Returns:
+        list: [{'title': ..., 'arc': ...}, ...]，长度等于 total_volumes
+    """
+    from src.utils.llm_client import get_llm, json_array_of
+    from langchain_core.messages import HumanMessage
+
+    prompt = f"""你是资深网文编辑，先为整部小说规划卷级骨架：
+
+【小说信息】
+类型: {novel_config.get('type', '未知')}
+梗概: {novel_config.get('synopsis', '')}
+主线目标: {novel_outline.get('main_goal', '')}
+主要冲突: {novel_outline.get('main_conflict', '')}
+总章节数: {target_chapters}
+总卷数: {total_volumes}（每卷约25章）
+
+【要求】按顺序为全部 {total_volumes} 卷各给出：
+1. title: 卷名（4-6字，要有创意，不要用"第X卷"）
+2. arc: 该卷在主线中的弧线节点（15字以内）
+
+整体要有递进感（前期→中期→后期），相邻卷之间要能衔接。
+
+【重要】输出纯 JSON 数组，恰好 {total_volumes} 项，不要使用 markdown 代码块。
+
+【输出格式】
+[{{"title": "卷名", "arc": "弧线节点"}}, ...]"""
+
+    llm = get_llm(
+        temperature=0.7,
+        timeout=min(30.0 + total_volumes * 1.5, 120.0),
+        max_retries=1,
+        max_tokens=min(256 + total_volumes * 40, 8192),
+        cache=json_array_of(total_volumes)  # 卷数不足的响应不缓存，重跑时重新生成
+    )
+
+    response = llm.invoke([HumanMessage(content=prompt)])
+    waypoints = _parse_json_array(response.content.strip())
+
+    if not isinstance(waypoints, list) or len(waypoints) < total_volumes:
+        raise ValueError(f"骨架卷数不足: {len(waypoints) if isinstance(waypoints, list) else 0}/{total_volumes}")
+
+    return [
+        {'title': str(w.get('title', '')), 'arc': str(w.get('arc', ''))}
+        for w in waypoints[:total_volumes]
+    ]
+
+
+def _format_waypoints(waypoints, first_idx, last_idx):
+    """格式化第 first_idx..last_idx 卷的骨架（1-based，自动截断到有效范围）"""
+    first_idx = max(1, first_idx)
+    last_idx = min(len(waypoints), last_idx)
+    return "\n".join(
+        f"第{i}卷《{waypoints[i - 1]['title']}》: {waypoints[i - 1]['arc']}"
+        for i in range(first_idx, last_idx + 1)
+    )
+
+
+def _ai_generate_volume_batch(novel_config, novel_outline, target_chapters, total_volumes,
+                              batch_start, batch_end, context_info):
+    """
+    生成第 batch_start..batch_end 卷的详细框架（失败时使用降级方案）
+
+    Args:
+        context_info: 附加到 prompt 的上下文（前面卷概况或骨架锚点）
+    """
+    from src.utils.llm_client import get_llm, json_array_of
+    from langchain_core.messages import HumanMessage
+
+    novel_type = novel_config.get('type', '未知')
+    batch_count = batch_end - batch_start + 1
+
+    prompt = f"""你是资深网文编辑，根据以下信息生成卷纲框架：
 
 【小说信息】
 类型: {novel_type}
-梗概: {synopsis}
-主线目标: {main_goal}
+梗概: {novel_config.get('synopsis', '')}
+主线目标: {novel_outline.get('main_goal', '')}
 总章节数: {target_chapters}
 总卷数: {total_volumes}
 {context_info}
@@ -187,108 +304,144 @@ def _ai_generate_volumes(novel_config, novel_outline, target_chapters, total_vol
 【输出格式】
 [{{"title": "卷名", "core_goal": "核心目标", "key_events": ["事件1", "事件2"], "ending_state": "卷末状态"}}, ...]"""
 
-        try:
-            # 动态调整超时时间
-            timeout = min(30.0 + batch_count * 6, 60.0)
-
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.7,
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=timeout,
-                max_retries=1
-            )
+    try:
+        # 动态调整超时时间
+        timeout = min(30.0 + batch_count * 6, 60.0)
 
-            response = llm.invoke([HumanMessage(content=prompt)])
-            result_text = response.content.strip()
+        llm = get_llm(
+            temperature=0.7,
+            timeout=timeout,
+            max_retries=1,
+            cache=json_array_of(batch_count)  # 同一批次的卷纲 prompt 重放时直接复用（不足一批的不缓存）
+        )
 
-            # 提取 JSON
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
+        response = llm.invoke([HumanMessage(content=prompt)])
+        batch_volumes = _parse_json_array(response.content.strip())
+
+        # 转换为标准格式（多出的项丢弃，缺少的项降级补齐）
+        volumes = []
+        for i, vol_data in enumerate(batch_volumes[:batch_count]):
+            vol_idx = batch_start + i
+            volumes.append({
+                'title': vol_data.get('title', f'第{vol_idx}卷'),
+                'chapters': _volume_chapter_range(vol_idx, target_chapters),
+                'core_goal': vol_data.get('core_goal', '推进主线'),
+                'key_events': vol_data.get('key_events', []),
+                'ending_state': vol_data.get('ending_state', '待续'),
+                'foreshadowing': []
+            })
+
+        if len(volumes) < batch_count:
+            volumes.extend(_fallback_volumes(
+                novel_type, batch_start + len(volumes), batch_count - len(volumes),
+                target_chapters, total_volumes
+            ))
+
+        print(f"      ✅ 第 {batch_start}-{batch_end} 卷: 成功生成 {len(batch_volumes)} 个卷")
+        return volumes
 
-            # 🔧 清理可能的问题字符
-            result_text = result_text.replace('\ufeff', '').replace('\u200b', '')
+    except Exception as e:
+        error_msg = str(e)
+        print(f"      ⚠️  第 {batch_start}-{batch_end} 卷生成失败: {error_msg[:40]}")
+        print(f"      📝 使用降级方案生成 {batch_count} 个卷")
+        return _fallback_volumes(novel_type, batch_start, batch_count, target_chapters, total_volumes)
 
-            # 尝试解析 JSON
-            try:
-                batch_volumes = json.loads(result_text)
-            except json.JSONDecodeError as je:
-                # JSON 解析失败，尝试修复
-                print(f"      ⚠️  JSON 格式问题，尝试修复...")
-                import re
-                result_text = re.sub(r',(\s*[}\]])', r'\1', result_text)
-
-                try:
-                    batch_volumes = json.loads(result_text)
-                except:
-                    # 修复失败，打印调试信息
-                    print(f"      原始响应: {result_text[:150]}...")
-                    raise je
-
-            # 转换为标准格式
-            for i, vol_data in enumerate(batch_volumes):
-                vol_idx = batch_start + i
-                start_ch = (vol_idx - 1) * 25 + 1
-                end_ch = min(vol_idx * 25, target_chapters)
-
-                all_volumes.append({
-                    'title': vol_data.get('title', f'第{vol_idx}卷'),
-                    'chapters': f'{start_ch}-{end_ch}',
-                    'core_goal': vol_data.get('core_goal', '推进主线'),
-                    'key_events': vol_data.get('key_events', []),
-                    'ending_state': vol_data.get('ending_state', '待续'),
-                    'foreshadowing': []
-                })
 
-            print(f"      ✅ 成功生成 {len(batch_volumes)} 个卷")
+def _ai_generate_volumes_sequential(novel_config, novel_outline, target_chapters, total_volumes):
+    """逐批生成卷纲，每批以前 3 卷的结果作为上下文"""
+    total_batches = (total_volumes + VOLUME_BATCH_SIZE - 1) // VOLUME_BATCH_SIZE
+    all_volumes = []
 
-            # 批次间稍微延迟，避免 API 限流
-            if batch_idx < total_batches - 1:
-                time.sleep(1.5)
+    for batch_idx in range(total_batches):
+        batch_start = batch_idx * VOLUME_BATCH_SIZE + 1
+        batch_end = min((batch_idx + 1) * VOLUME_BATCH_SIZE, total_volumes)
+
+        print(f"   🤖 批次 {batch_idx+1}/{total_batches}: 生成第 {batch_start}-{batch_end} 卷...")
+
+        # 如果不是第一批，提供前面卷的信息作为上下文
+        if batch_idx > 0:
+            prev_volumes_context = "\n".join([
+                f"第{i+1}卷《{v['title']}》: {v['core_goal']}"
+                for i, v in enumerate(all_volumes[-3:])  # 只取最近3卷
+            ])
+            context_info = f"\n【前面卷概况】\n{prev_volumes_context}\n"
+        else:
+            context_info = ""
+
+        all_volumes.extend(_ai_generate_volume_batch(
+            novel_config, novel_outline, target_chapters, total_volumes,
+            batch_start, batch_end, context_info
+        ))
+
+    return all_volumes
 
+
+def _ai_generate_volumes(novel_config, novel_outline, target_chapters, total_volumes,
+                         parallel=True, max_workers=4):
+    """
+    使用 AI 生成卷纲框架（分批生成避免超时）
+
+    卷数超过一批时默认两阶段生成：
+    1. 一次调用生成全书骨架（每卷卷名 + 弧线节点）
+    2. 各批次以骨架为锚点并发展开，不再依赖前一批的输出
+
+    骨架生成失败或 parallel=False 时退回逐批顺序生成。
+    实际并发度同时受全局限流器约束。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    total_batches = (total_volumes + VOLUME_BATCH_SIZE - 1) // VOLUME_BATCH_SIZE
+    started_at = time.time()
+
+    if total_batches <= 1:
+        volumes = _ai_generate_volume_batch(
+            novel_config, novel_outline, target_chapters, total_volumes, 1, total_volumes, ""
+        )
+        print(f"   ✅ 共生成 {len(volumes)} 个卷框架 ({time.time() - started_at:.1f}s)")
+        return volumes
+
+    print(f"   📊 卷数较多({total_volumes}卷)，分 {total_batches} 批生成")
+
+    waypoints = None
+    if parallel:
+        print(f"   🦴 阶段一: 生成 {total_volumes} 卷骨架...")
+        try:
+            waypoints = _ai_generate_volume_waypoints(novel_config, novel_outline, target_chapters, total_volumes)
+            print(f"      ✅ 骨架完成 ({time.time() - started_at:.1f}s)")
         except Exception as e:
-            error_msg = str(e)
-            print(f"      ⚠️  批次生成失败: {error_msg[:40]}")
-
-            # 该批次降级方案
-            for i in range(batch_count):
-                vol_idx = batch_start + i
-                start_ch = (vol_idx - 1) * 25 + 1
-                end_ch = min(vol_idx * 25, target_chapters)
-
-                # 根据卷的位置确定阶段
-                progress = vol_idx / total_volumes
-                if progress <= 0.3:
-                    stage_name = ["萌芽", "起步", "初探", "试炼", "成长"][i % 5]
-                    stage = "前期"
-                    goal = f"建立基础，初步了解{novel_type}世界"
-                    events = ['初次冲突', '结识盟友', '获得机遇']
-                elif progress <= 0.7:
-                    stage_name = ["风云", "激荡", "对抗", "突破", "崛起"][i % 5]
-                    stage = "中期"
-                    goal = f"提升实力，应对{novel_type}挑战"
-                    events = ['强敌现身', '激烈较量', '重大转折']
-                else:
-                    stage_name = ["巅峰", "决战", "终局", "归来", "超越"][i % 5]
-                    stage = "后期"
-                    goal = f"接近目标，解决{novel_type}核心矛盾"
-                    events = ['最终对决', '真相大白', '完成使命']
-
-                all_volumes.append({
-                    'title': f'{stage_name}之章',
-                    'chapters': f'{start_ch}-{end_ch}',
-                    'core_goal': goal,
-                    'key_events': events,
-                    'ending_state': f'{stage}完成',
-                    'foreshadowing': []
-                })
+            print(f"      ⚠️  骨架生成失败: {str(e)[:40]}，改为逐批顺序生成")
+
+    if waypoints is None:
+        all_volumes = _ai_generate_volumes_sequential(novel_config, novel_outline, target_chapters, total_volumes)
+        print(f"   ✅ 共生成 {len(all_volumes)} 个卷框架 ({time.time() - started_at:.1f}s)")
+        return all_volumes
+
+    skeleton_done = time.time()
+    print(f"   🤖 阶段二: {total_batches} 批并发展开（最多 {max_workers} 批同时进行）...")
 
-            print(f"      📝 使用降级方案生成 {batch_count} 个卷")
+    def expand(batch_idx):
+        batch_start = batch_idx * VOLUME_BATCH_SIZE + 1
+        batch_end = min((batch_idx + 1) * VOLUME_BATCH_SIZE, total_volumes)
 
-    print(f"   ✅ 共生成 {len(all_volumes)} 个卷框架")
+        # 锚点：本批骨架 + 前后各 2 卷，保证批次边界衔接
+        context_info = (
+            f"\n【全书骨架（本批及相邻卷）】\n"
+            f"{_format_waypoints(waypoints, batch_start - 2, batch_end + 2)}\n"
+            f"\n本批卷名与弧线请遵循骨架，可在细节上丰富。\n"
+        )
+        return _ai_generate_volume_batch(
+            novel_config, novel_outline, target_chapters, total_volumes,
+            batch_start, batch_end, context_info
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        batches = list(executor.map(expand, range(total_batches)))
+
+    all_volumes = [v for batch in batches for v in batch]
+    finished_at = time.time()
+    print(f"   ✅ 共生成 {len(all_volumes)} 个卷框架 "
+          f"(骨架 {skeleton_done - started_at:.1f}s + 展开 {finished_at - skeleton_done:.1f}s "
+          f"= {finished_at - started_at:.1f}s)")
     return all_volumes
 
 
@@ -365,21 +518,20 @@ def config_to_initial_state(config, paths=None):
         # 尝试从 bible/outline.yaml 读取（新格式）
         bible_dir = paths.get('bible_dir')
         if bible_dir:
-            outline_file = os.path.join(bible_dir, 'outline.yaml')
-            if os.path.exists(outline_file):
-                try:
-                    with open(outline_file, 'r', encoding='utf-8') as f:
-                        outline_data = yaml.safe_load(f)
-
-                    # 检查 outline_data 是否为 None 或空
-                    if outline_data and isinstance(outline_data, dict):
-                        novel_outline = outline_data.get('outline', {})
-                        volume_frameworks = outline_data.get('volumes', [])
-                        print(f"  📖 加载独立大纲文件: outline.yaml")
-                    else:
-                        print(f"  ⚠️  outline.yaml 为空或格式错误")
-                except Exception as e:
-                    print(f"  ⚠️  读取 outline.yaml 失败: {e}")
+            try:
+                # 与 planner 共用同一份解析结果；写入 state 的是副本
+                outline_data = load_outline(bible_dir)
+
+                # 检查 outline_data 是否为 None 或空
+                if outline_data:
+                    outline_data = copy.deepcopy(outline_data)
+                    novel_outline = outline_data.get('outline', {})
+                    volume_frameworks = outline_data.get('volumes', [])
+                    print(f"  📖 加载独立大纲文件: outline.yaml")
+                elif outline_data is not None:
+                    print(f"  ⚠️  outline.yaml 为空或格式错误")
+            except Exception as e:
+                print(f"  ⚠️  读取 outline.yaml 失败: {e}")
 
         # 回退到配置文件中的字段（旧格式）
         if novel_outline is None:
@@ -404,7 +556,11 @@ def config_to_initial_state(config, paths=None):
 
             if total_volumes > 0:
                 print(f"🤖 配置中缺少卷纲，使用 AI 生成 {total_volumes} 个卷框架...")
-                volume_frameworks = _ai_generate_volumes(novel_config, novel_outline, target_chapters, total_volumes)
+                volume_frameworks = _ai_generate_volumes(
+                    novel_config, novel_outline, target_chapters, total_volumes,
+                    parallel=generation.get('parallel_volume_frameworks', True),
+                    max_workers=generation.get('volume_workers', 4)
+                )
                 auto_generated = True
 
         # 🔧 新增：如果是自动生成的，保存到 outline.yaml
@@ -461,10 +617,21 @@ def config_to_initial_state(config, paths=None):
         print(f"   • 每25章自动压缩记忆")
         print(f"   • 内存占用可控")
 
+    initial_state['bible_digest'] = build_digest(initial_state['world_bible'])
+
     return initial_state
 
-def build_graph(config, db_path):
-    """构建工作流图"""
+def build_workflow(config, async_mode=False):
+    """
+    构建工作流图（未编译）
+
+    async_mode=True 时 planner/writer/critic/memory 使用异步节点，
+    卷管理节点保持同步（LangGraph 会放到线程池中执行）
+
+    generation.pipeline_memory=True 时 memory 使用流水线节点：
+    第 N 章记忆提取在后台进行，与第 N+1 章的规划/写作重叠；
+    未配置时异步模式默认开启（见 pipeline.memory_pipelining）
+    """
     from src.utils.memory_strategy import should_use_layered_memory
 
     workflow = StateGraph(NovelState)
@@ -473,10 +640,23 @@ def build_graph(config, db_path):
     use_layered = should_use_layered_memory(config['novel'].get('target_chapters', 1))
 
     # 添加基础节点
-    workflow.add_node("planner", planner_node)
-    workflow.add_node("writer", writer_node)
-    workflow.add_node("critic", critic_node)
-    workflow.add_node("memory", memory_update_node)
+    if async_mode:
+        workflow.add_node("planner", aplanner_node)
+        workflow.add_node("writer", awriter_node)
+        workflow.add_node("critic", acritic_node)
+        memory_node = amemory_update_node
+    else:
+        workflow.add_node("planner", planner_node)
+        workflow.add_node("writer", writer_node)
+        workflow.add_node("critic", critic_node)
+        memory_node = memory_update_node
+
+    if pipeline.memory_pipelining(config, async_mode):
+        # 流水线节点为同步实现，异步模式下同样由 LangGraph 放到线程池执行
+        memory_node = pipelined_memory_node
+        print(f"  ⚡ 流水线模式：记忆提取与下一章规划并发")
+
+    workflow.add_node("memory", memory_node)
 
     if use_layered:
         # 长篇模式：添加卷管理节点
@@ -561,14 +741,29 @@ def build_graph(config, db_path):
     else:
         workflow.add_edge("memory", END)
 
-    # 持久化（使用项目专属数据库）
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    memory = SqliteSaver(conn)
+    return workflow
+
+def build_graph(config, db_path):
+    """构建工作流图"""
+    workflow = build_workflow(config)
+
+    # 持久化（使用项目专属数据库，增量 + 压缩存储，写入由后台线程批量提交）
+    memory = CompactSqliteSaver(db_path)
 
     # 编译
     app = workflow.compile(checkpointer=memory)
     return app
 
+async def abuild_graph(config, db_path):
+    """构建异步工作流图（checkpoint 读写在线程中执行，不阻塞事件循环）"""
+    workflow = build_workflow(config, async_mode=True)
+
+    # 持久化（与同步模式共用同一个项目数据库和存储格式，可互相续写）
+    memory = CompactSqliteSaver(db_path)
+
+    app = workflow.compile(checkpointer=memory)
+    return app
+
 def save_world_bible(world_bible, config, bible_dir):
     """保存世界状态"""
     os.makedirs(bible_dir, exist_ok=True)
@@ -582,6 +777,208 @@ def save_world_bible(world_bible, config, bible_dir):
 
     return filename
 
+def get_resume_chapter(snapshot, config):
+    """返回可续写的章节号（没有未完成的断点时返回 None）"""
+    if not (snapshot and snapshot.values):
+        return None
+
+    saved_chapter = snapshot.values.get('current_chapter_index', 1)
+    target_chapters = config['novel'].get('target_chapters', 1)
+
+    if saved_chapter > 1 and saved_chapter <= target_chapters:
+        return saved_chapter
+    return None
+
+def confirm_resume(snapshot, config):
+    """检查是否有保存的状态（支持断点续传），返回是否从断点恢复"""
+    saved_chapter = get_resume_chapter(snapshot, config)
+    if saved_chapter is None:
+        return False
+
+    target_chapters = config['novel'].get('target_chapters', 1)
+
+    # 如果已经生成了部分章节，提示用户是否继续
+    print(f"\n🔄 检测到未完成的生成任务")
+    print(f"   进度: 已完成 {saved_chapter - 1}/{target_chapters} 章")
+    print(f"   将从第 {saved_chapter} 章继续生成")
+    print(f"\n   按 Enter 继续，或 Ctrl+C 退出")
+
+    try:
+        input()
+        return True
+    except KeyboardInterrupt:
+        print("\n\n❌ 用户取消")
+        sys.exit(0)
+
+def report_step(node_name, node_output, result, label=""):
+    """
+    显示单个节点的进度，并累计到 result
+
+    Returns:
+        int | None: memory 节点完成的章节号（用于更新项目进度）
+    """
+    print(f"\n{label}✓ 完成节点: {node_name.upper()}")
+
+    result["final_state"] = node_output
+
+    # 显示进度
+    if node_name == "planner" and "current_beats" in node_output:
+        beats_preview = node_output['current_beats'][:200]
+        print(f"  生成大纲: {len(node_output['current_beats'])} 字符")
+        print(f"  预览: {beats_preview}...")
+
+    elif node_name == "writer" and "draft" in node_output:
+        draft = node_output['draft']
+        word_count = len(draft)
+        result["drafts_generated"] += 1
+        result["last_draft_chars"] = word_count
+        print(f"  生成正文: {word_count} 字符")
+        print(f"  预计字数: ~{word_count // 2} 字")
+
+    elif node_name == "critic" and "feedback" in node_output:
+        feedback = node_output['feedback']
+        print(f"  评审反馈: {feedback[:150]}...")
+
+    elif node_name == "memory":
+        chapter_idx = node_output.get('current_chapter_index', 1) - 1
+        result["chapters_completed"] += 1
+        result["chapter_chars"] += result["last_draft_chars"] or 0
+        print(f"  已完成第 {chapter_idx} 章")
+        print(f"  世界状态已更新")
+        cache_line = prompt_cache.format_stats(prompt_cache.stats_since(result["prompt_cache_chapter"]))
+        if cache_line:
+            print(f"  🗄️  {cache_line}")
+        result["prompt_cache_chapter"] = prompt_cache.snapshot()
+        return chapter_idx
+
+    return None
+
+def new_run_result():
+    return {
+        "drafts_generated": 0,      # writer 输出次数（含修订）
+        "last_draft_chars": None,   # 最近一稿的字符数（memory 节点完成时即为定稿）
+        "chapter_chars": 0,         # 已完成章节的总字符数
+        "chapters_completed": 0,
+        "final_state": None,
+        "started_at": time.time(),
+        "prompt_cache_start": prompt_cache.snapshot(),     # 本次运行开始时的前缀缓存统计
+        "prompt_cache_chapter": prompt_cache.snapshot(),   # 当前章开始时的前缀缓存统计
+    }
+
+def run_generation(app, config, initial_state, config_obj, pm, project_id):
+    """同步模式：app.stream 逐节点运行"""
+    resume_from_checkpoint = confirm_resume(app.get_state(config_obj), config)
+    result = new_run_result()
+
+    if resume_from_checkpoint:
+        # 从断点恢复（不传 initial_state）
+        print("\n🔄 从断点恢复生成...")
+        stream_input = None
+    else:
+        # 从头开始新的生成
+        print("\n🎬 开始新的生成任务...")
+        stream_input = initial_state
+
+    try:
+        for step_output in app.stream(stream_input, config=config_obj):
+            for node_name, node_output in step_output.items():
+                chapter_idx = report_step(node_name, node_output, result)
+                if chapter_idx is not None:
+                    # 更新项目进度和汇总数据
+                    pm.update_project_progress(project_id, chapter_idx, result["last_draft_chars"])
+    finally:
+        # 提交剩余 checkpoint 写入，停止项目数据库的写线程
+        app.checkpointer.close()
+
+    return result
+
+async def arun_generation(config, paths, initial_state, config_obj, pm, project_id, interactive=True, label="",
+                          result=None):
+    """
+    异步模式：app.astream 逐节点运行，项目进度写入不阻塞事件循环
+
+    interactive=False 时（批量运行）有断点直接续写，不等待确认
+    result: 由调用方传入 new_run_result() 时，中途出错也能从中读到已完成的章节
+    """
+    print(f"\n{label}🔧 构建工作流...")
+    app = await abuild_graph(config, paths['db_file'])
+    print(f"{label}✅ 工作流构建成功")
+
+    snapshot = await app.aget_state(config_obj)
+    if interactive:
+        resume_from_checkpoint = confirm_resume(snapshot, config)
+    else:
+        resume_from_checkpoint = get_resume_chapter(snapshot, config) is not None
+    if result is None:
+        result = new_run_result()
+
+    if resume_from_checkpoint:
+        print(f"\n{label}🔄 从断点恢复生成...")
+        stream_input = None
+    else:
+        print(f"\n{label}🎬 开始新的生成任务...")
+        stream_input = initial_state
+
+    progress_tasks = []
+    try:
+        async for step_output in app.astream(stream_input, config=config_obj):
+            for node_name, node_output in step_output.items():
+                chapter_idx = report_step(node_name, node_output, result, label)
+                if chapter_idx is not None:
+                    # 更新项目进度（后台线程写注册表）
+                    progress_tasks.append(asyncio.create_task(
+                        asyncio.to_thread(pm.update_project_progress, project_id, chapter_idx, result["last_draft_chars"])
+                    ))
+    finally:
+        if progress_tasks:
+            await asyncio.gather(*progress_tasks, return_exceptions=True)
+        # 提交剩余 checkpoint 写入，停止项目数据库的写线程（同步接口，在线程中执行）
+        await asyncio.to_thread(app.checkpointer.close)
+
+    return result
+
+def print_generation_summary(result, config, paths, pm, project_id, mode):
+    """生成摘要（章节已在writer节点中实时保存）+ 吞吐量报告"""
+    final_state = result["final_state"]
+
+    print("\n" + "="*60)
+    print("📊 生成完成！")
+    print("="*60)
+    print(f"\n✅ 成功生成 {result['chapters_completed']} 章（共 {result['drafts_generated']} 稿，含修订）")
+    print(f"✅ 总字数约: {result['chapter_chars'] // 2} 字")
+    cache_line = prompt_cache.format_stats(prompt_cache.stats_since(result["prompt_cache_start"]))
+    if cache_line:
+        print(f"✅ {cache_line}")
+
+    # 吞吐量：本次运行完成的章节 / 小时
+    elapsed = time.time() - result["started_at"]
+    chapters_completed = result["chapters_completed"]
+    if chapters_completed > 0 and elapsed > 0:
+        chapters_per_hour = chapters_completed * 3600 / elapsed
+        print(f"\n⏱️  吞吐量 ({mode}): {chapters_per_hour:.1f} 章/小时 "
+              f"({chapters_completed} 章, 耗时 {elapsed / 60:.1f} 分钟)")
+
+        throughput = pm.record_throughput(project_id, mode, chapters_per_hour)
+        other_mode = "sync" if mode == "async" else "async"
+        other = throughput.get(other_mode)
+        if other:
+            ratio = chapters_per_hour / other if other > 0 else 0
+            print(f"   对比 {other_mode} 模式: {other:.1f} 章/小时 (x{ratio:.2f})")
+
+    print(f"\n📁 文件位置:")
+    print(f"   章节目录: {paths['manuscript_dir']}（chapters.seg + chapters.idx）")
+    print(f"   导出整书: ./novel.sh export（TXT + EPUB）")
+
+    # 保存世界状态
+    if final_state and 'world_bible' in final_state:
+        bible_file = save_world_bible(final_state['world_bible'], config, paths['bible_dir'])
+        print(f"   世界状态: {bible_file}")
+
+    print(f"\n💡 下次运行:")
+    print(f"   • 使用相同配置会自动继续此项目")
+    print(f"   • 运行 python3 configure_novel.py 创建新项目")
+    print(f"   • 运行 python3 manage_projects.py 管理所有项目")
+
 if __name__ == "__main__":
     print("=" * 60)
     print("📚 AI 小说生成器 - Powered by Claude 4.5")
@@ -633,14 +1030,23 @@ if __name__ == "__main__":
     print(f"   角色自主性: {gen_config['character_autonomy']}")
     print(f"   每次运行都会产生不同的故事发展！")
 
+    # 流水线模式: --pipeline 参数或 generation.pipeline_memory 配置
+    if "--pipeline" in sys.argv[1:]:
+        gen_config['pipeline_memory'] = True
+
     # 构建初始状态（注入项目路径）
     initial_state = config_to_initial_state(config, paths)
     initial_state['project_paths'] = paths  # 传递给writer节点使用
 
-    # 构建工作流（使用项目专属数据库）
-    print("\n🔧 构建工作流...")
-    app = build_graph(config, paths['db_file'])
-    print("✅ 工作流构建成功")
+    # 运行模式: --async 参数或 generation.async_mode 配置
+    async_mode = "--async" in sys.argv[1:] or gen_config.get('async_mode', False)
+
+    # 构建工作流（使用项目专属数据库；异步模式在事件循环内构建）
+    app = None
+    if not async_mode:
+        print("\n🔧 构建工作流...")
+        app = build_graph(config, paths['db_file'])
+        print("✅ 工作流构建成功")
 
     # 显示故事设定
     print("\n" + "="*60)
@@ -669,118 +1075,14 @@ if __name__ == "__main__":
     thread_id = f"novel_{project_id}"
     config_obj = {"configurable": {"thread_id": thread_id}}
 
-    # 检查是否有保存的状态（支持断点续传）
-    snapshot = app.get_state(config_obj)
-    resume_from_checkpoint = False
-
-    if snapshot and snapshot.values:
-        saved_chapter = snapshot.values.get('current_chapter_index', 1)
-        target_chapters = config['novel'].get('target_chapters', 1)
-
-        # 如果已经生成了部分章节，提示用户是否继续
-        if saved_chapter > 1 and saved_chapter <= target_chapters:
-            print(f"\n🔄 检测到未完成的生成任务")
-            print(f"   进度: 已完成 {saved_chapter - 1}/{target_chapters} 章")
-            print(f"   将从第 {saved_chapter} 章继续生成")
-            print(f"\n   按 Enter 继续，或 Ctrl+C 退出")
-
-            try:
-                input()
-                resume_from_checkpoint = True
-            except KeyboardInterrupt:
-                print("\n\n❌ 用户取消")
-                sys.exit(0)
-
-    chapter_drafts = []
-    final_state = None
-
     try:
-        if resume_from_checkpoint:
-            # 从断点恢复（不传 initial_state）
-            print("\n🔄 从断点恢复生成...")
-            for step_output in app.stream(None, config=config_obj):
-                for node_name, node_output in step_output.items():
-                    print(f"\n✓ 完成节点: {node_name.upper()}")
-
-                    # 显示进度
-                    if node_name == "planner" and "current_beats" in node_output:
-                        beats_preview = node_output['current_beats'][:200]
-                        print(f"  生成大纲: {len(node_output['current_beats'])} 字符")
-                        print(f"  预览: {beats_preview}...")
-
-                    elif node_name == "writer" and "draft" in node_output:
-                        draft = node_output['draft']
-                        word_count = len(draft)
-                        chapter_drafts.append(draft)
-                        print(f"  生成正文: {word_count} 字符")
-                        print(f"  预计字数: ~{word_count // 2} 字")
-
-                    elif node_name == "critic" and "feedback" in node_output:
-                        feedback = node_output['feedback']
-                        print(f"  评审反馈: {feedback[:150]}...")
-
-                    elif node_name == "memory":
-                        chapter_idx = node_output.get('current_chapter_index', 1) - 1
-                        print(f"  已完成第 {chapter_idx} 章")
-                        print(f"  世界状态已更新")
-
-                        # 更新项目进度
-                        pm.update_project_progress(project_id, chapter_idx)
-
-                    final_state = node_output
+        if async_mode:
+            print("\n⚡ 异步模式: asyncio + astream")
+            result = asyncio.run(arun_generation(config, paths, initial_state, config_obj, pm, project_id))
         else:
-            # 从头开始新的生成
-            print("\n🎬 开始新的生成任务...")
-            for step_output in app.stream(initial_state, config=config_obj):
-                for node_name, node_output in step_output.items():
-                    print(f"\n✓ 完成节点: {node_name.upper()}")
-
-                    # 显示进度
-                    if node_name == "planner" and "current_beats" in node_output:
-                        beats_preview = node_output['current_beats'][:200]
-                        print(f"  生成大纲: {len(node_output['current_beats'])} 字符")
-                        print(f"  预览: {beats_preview}...")
-
-                    elif node_name == "writer" and "draft" in node_output:
-                        draft = node_output['draft']
-                        word_count = len(draft)
-                        chapter_drafts.append(draft)
-                        print(f"  生成正文: {word_count} 字符")
-                        print(f"  预计字数: ~{word_count // 2} 字")
-
-                    elif node_name == "critic" and "feedback" in node_output:
-                        feedback = node_output['feedback']
-                        print(f"  评审反馈: {feedback[:150]}...")
-
-                    elif node_name == "memory":
-                        chapter_idx = node_output.get('current_chapter_index', 1) - 1
-                        print(f"  已完成第 {chapter_idx} 章")
-                        print(f"  世界状态已更新")
-
-                        # 更新项目进度
-                        pm.update_project_progress(project_id, chapter_idx)
-
-                    final_state = node_output
-
-        # 生成摘要（章节已在writer节点中实时保存）
-        print("\n" + "="*60)
-        print("📊 生成完成！")
-        print("="*60)
-        print(f"\n✅ 成功生成 {len(chapter_drafts)} 章")
-        print(f"✅ 总字数约: {sum(len(d) for d in chapter_drafts) // 2} 字")
-
-        print(f"\n📁 文件位置:")
-        print(f"   章节目录: {paths['manuscript_dir']}")
-
-        # 保存世界状态
-        if final_state and 'world_bible' in final_state:
-            bible_file = save_world_bible(final_state['world_bible'], config, paths['bible_dir'])
-            print(f"   世界状态: {bible_file}")
-
-        print(f"\n💡 下次运行:")
-        print(f"   • 使用相同配置会自动继续此项目")
-        print(f"   • 运行 python3 configure_novel.py 创建新项目")
-        print(f"   • 运行 python3 manage_projects.py 管理所有项目")
+            result = run_generation(app, config, initial_state, config_obj, pm, project_id)
+
+        print_generation_summary(result, config, paths, pm, project_id, "async" if async_mode else "sync")
 
     except KeyboardInterrupt:
         print("\n\n⚠️  生成已中断")
@@ -789,3 +1091,6 @@ if __name__ == "__main__":
         print(f"\n❌ 生成过程中发生错误: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # 等待后台标题生成等任务写完（未对账的记忆会在续传时重新提取）
+        pipeline.drain()
@@ -7,10 +7,10 @@
 """
 
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
-import os
+from src.utils.llm_client import get_llm
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 def initialize_layered_memory(config):
@@ -74,26 +74,34 @@ def compress_volume_memory(state, volume_index):
 
     print(f"  📚 压缩 {len(volume_chapters)} 章内容...")
 
-    # 1. 生成卷摘要
-    volume_summary = ai_generate_volume_summary(
-        volume_chapters=volume_chapters,
-        volume_index=volume_index,
-        max_length=500
-    )
-
-    # 2. 压缩角色发展
-    character_arcs = ai_compress_character_arcs(
-        characters=hot_memory.get("characters", {}),
-        volume_index=volume_index,
-        max_length_per_char=100
-    )
-
-    # 3. 检查并标记已解决伏笔
-    resolved_threads = check_resolved_threads(
-        plot_threads=hot_memory.get("plot_threads", {}).get("active", []),
-        volume_chapters=volume_chapters,
-        volume_index=volume_index
-    )
+    # 1-3. 卷摘要、角色发展压缩、伏笔检查互不依赖，并发执行
+    #      （各角色的压缩调用也并发，实际并发数由全局限流器控制）
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        summary_future = pool.submit(
+            ai_generate_volume_summary,
+            volume_chapters=volume_chapters,
+            volume_index=volume_index,
+            max_length=500
+        )
+        arcs_future = pool.submit(
+            ai_compress_character_arcs,
+            characters=hot_memory.get("characters", {}),
+            volume_index=volume_index,
+            max_length_per_char=100
+        )
+        threads_future = pool.submit(
+            check_resolved_threads,
+            plot_threads=hot_memory.get("plot_threads", {}).get("active", []),
+            volume_chapters=volume_chapters,
+            volume_index=volume_index
+        )
+
+        volume_summary = summary_future.result()
+        character_arcs = arcs_future.result()
+        resolved_threads = threads_future.result()
+
+    print(f"  ⏱️  卷压缩耗时 {time.time() - start_time:.1f}s")
 
     # 4. 保存到冷记忆
     volume_summary_entry = {
@@ -169,13 +177,11 @@ def ai_generate_volume_summary(volume_chapters, volume_index, max_length=500):
 """
 
     try:
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.3,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=60.0,
-            max_retries=2
+            max_retries=2,
+            cache=True  # 低温度摘要，重放时直接复用
         )
 
         response = llm.invoke([HumanMessage(content=prompt)])
@@ -195,22 +201,40 @@ def ai_generate_volume_summary(volume_chapters, volume_index, max_length=500):
         ]) + "..."
 
 
-def ai_compress_character_arcs(characters, volume_index, max_length_per_char=100):
-    """使用 AI 压缩角色发展"""
+def ai_compress_character_arcs(characters, volume_index, max_length_per_char=100, max_workers=8):
+    """使用 AI 压缩角色发展（各角色并发调用）"""
 
     character_arcs = {}
+    pending = []
 
     for char_name, char_data in characters.items():
         notes = char_data.get("recent_notes", [])
 
         if not notes:
             character_arcs[char_name] = "本卷无显著发展"
-            continue
+        else:
+            pending.append((char_name, notes))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            futures = {
+                char_name: pool.submit(compress_character_arc, char_name, notes, max_length_per_char)
+                for char_name, notes in pending
+            }
+            for char_name, future in futures.items():
+                character_arcs[char_name] = future.result()
+
+    # 保持原角色顺序
+    return {name: character_arcs[name] for name in characters if name in character_arcs}
+
+
+def compress_character_arc(char_name, notes, max_length_per_char=100):
+    """压缩单个角色的本卷发展"""
 
-        # 构建 prompt
-        notes_text = "\n".join([f"- {note}" for note in notes[-20:]])  # 最多20条笔记
+    # 构建 prompt
+    notes_text = "\n".join([f"- {note}" for note in notes[-20:]])  # 最多20条笔记
 
-        prompt = f"""
+    prompt = f"""
 你是资深小说编辑，负责压缩角色在本卷的发展。
 
 【角色】{char_name}
@@ -231,33 +255,26 @@ def ai_compress_character_arcs(characters, volume_index, max_length_per_char=100
 直接输出总结文本，不要标题。
 """
 
-        try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.3,
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=45.0,
-                max_retries=1
-            )
-
-            response = llm.invoke([HumanMessage(content=prompt)])
-            arc = response.content.strip()
-
-            if len(arc) > max_length_per_char:
-                arc = arc[:max_length_per_char-3] + "..."
+    try:
+        llm = get_llm(
+            temperature=0.3,
+            timeout=45.0,
+            max_retries=1,
+            cache=True
+        )
 
-            character_arcs[char_name] = arc
+        response = llm.invoke([HumanMessage(content=prompt)])
+        arc = response.content.strip()
 
-        except Exception as e:
-            print(f"  ⚠️  {char_name} 压缩失败: {str(e)[:30]}")
-            # 降级：取最后一条笔记
-            character_arcs[char_name] = notes[-1][:max_length_per_char] if notes else "本卷无显著发展"
+        if len(arc) > max_length_per_char:
+            arc = arc[:max_length_per_char-3] + "..."
 
-        # 避免频繁调用
-        time.sleep(1)
+        return arc
 
-    return character_arcs
+    except Exception as e:
+        print(f"  ⚠️  {char_name} 压缩失败: {str(e)[:30]}")
+        # 降级：取最后一条笔记
+        return notes[-1][:max_length_per_char] if notes else "本卷无显著发展"
 
 
 def check_resolved_threads(plot_threads, volume_chapters, volume_index):
@@ -1,20 +1,23 @@
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
+from src.utils.rate_limiter import retry_wait, aretry_wait
 from src.state import NovelState
-import os
+from src.utils.bible_digest import get_bible_digest
+from src.utils.prompt_budget import (
+    PromptSection, pack_sections, budget_for, format_characters,
+    PRIORITY_BEATS, PRIORITY_CHARACTER_STATES, PRIORITY_THREADS, PRIORITY_BACKGROUND,
+)
 import json
 import time
 
-def critic_node(state: NovelState) -> NovelState:
-    """
-    The Critic Node - comprehensive quality check.
-    Evaluates complete content with intelligent truncation.
-    支持番茄小说风格评审标准
+def build_critic_prompt(state):
     """
-    print("--- CRITIC NODE ---")
+    构建评审 prompt（同步/异步节点共用）
 
+    Returns:
+        tuple: (prompt, is_fanqie)
+    """
     draft = state.get("draft", "")
-    world_bible = state.get("world_bible", {})
     current_beats = state.get("current_beats", "")
 
     # 智能截取:保留完整段落,避免在句子中间截断
@@ -43,64 +46,51 @@ def critic_node(state: NovelState) -> NovelState:
     else:
         print(f"  📏 检查完整内容 ({len(draft)} 字符)")
 
-    # 提取角色状态和伏笔（完整版功能）
-    character_states = extract_character_context(world_bible.get('characters', {}))
-    plot_threads = world_bible.get('plot_threads', [])
+    # 角色状态和伏笔取自 bible digest（修订轮次之间复用，不重复序列化 world_bible）
+    digest = get_bible_digest(state)
+    character_states = [f"- {name}: {text}" for name, text in digest["states"].items()]
 
     # 检查是否为番茄小说风格
     config = state.get('config', {})
     style = config.get('style', {})
     is_fanqie = style.get('is_fanqie_style', False)
 
+    # 上下文区块按 token 预算装入（正文本身不计入预算）
+    context, _ = pack_sections([
+        PromptSection("beats", current_beats, PRIORITY_BEATS, max_tokens=350),
+        PromptSection("states", character_states, PRIORITY_CHARACTER_STATES, max_tokens=200, item_max=60),
+        PromptSection("threads", digest["threads"], PRIORITY_THREADS, max_tokens=180, item_max=50),
+        PromptSection("characters", format_characters(digest["characters"], current_beats), PRIORITY_BACKGROUND, max_tokens=250),
+    ], budget_for("critic", config))
+
     # 构建评审 prompt（完整版：多维度评审）
     prompt_parts = [
         "你是资深小说编辑，进行全面深度评审。",
         "",
         "【角色设定】",
-        json.dumps(world_bible.get('characters', {}), ensure_ascii=False)[:600],
+        context["characters"],
         "",
     ]
 
     # 添加角色状态（如果有）
-    if character_states:
+    if context["states"]:
         prompt_parts.extend([
             "【角色当前状态】",
-            character_states,
+            context["states"],
             ""
         ])
 
     # 添加伏笔线索（如果有）
-    if plot_threads:
-        # 处理不同的数据结构（短篇: list, 长篇: dict with "active"）
-        if isinstance(plot_threads, dict):
-            # 长篇模式：从 dict 中提取 active threads
-            active_threads = plot_threads.get("active", [])[-5:]
-        else:
-            # 短篇模式：直接使用 list
-            active_threads = plot_threads[-5:]
-
-        # 🔧 Bug #9修复: 处理dict格式的thread对象
-        formatted_threads = []
-        for thread in active_threads:
-            if isinstance(thread, dict):
-                # 长篇模式: thread是 {"text": "...", ...}
-                formatted_threads.append(thread.get("text", str(thread)))
-            else:
-                # 短篇模式: thread是字符串
-                formatted_threads.append(str(thread))
-
-        threads_text = "\n".join([f"- {t}" for t in formatted_threads])
-
-        if threads_text:  # 只有在有内容时才添加
-            prompt_parts.extend([
-                "【现有伏笔/谜团】",
-                threads_text,
-                ""
-            ])
+    if context["threads"]:
+        prompt_parts.extend([
+            "【现有伏笔/谜团】",
+            context["threads"],
+            ""
+        ])
 
     prompt_parts.extend([
         "【场景大纲】",
-        current_beats[:400] if current_beats else "(无)",
+        context["beats"] or "(无)",
         "",
         "【生成内容】",
         content_to_check,
@@ -146,44 +136,77 @@ def critic_node(state: NovelState) -> NovelState:
             "请给出专业评审。"
         ])
 
-    prompt = '\n'.join(prompt_parts)
+    return '\n'.join(prompt_parts), is_fanqie
+
+
+def get_critic_llm():
+    return get_llm(
+        temperature=0.3,  # 稍高温度,更灵活的评审
+        timeout=90.0,  # 增加到90秒,避免评审超时
+        max_retries=0
+    )
+
+
+def report_feedback(feedback):
+    """显示评审结果摘要 (优先检查"需修改"，因为这是更重要的状态)"""
+    print(f"  ✅ 评审完成")
+
+    if "需修改" in feedback or "不合格" in feedback:
+        print(f"     状态: ⚠️  需改进")
+    elif "通过" in feedback or "合格" in feedback:
+        print(f"     状态: ✅ 通过")
+    else:
+        print(f"     状态: ❓ 未知")
+
+    return {"feedback": feedback}
+
+
+def critic_node(state: NovelState) -> NovelState:
+    """
+    The Critic Node - comprehensive quality check.
+    Evaluates complete content with intelligent truncation.
+    支持番茄小说风格评审标准
+    """
+    print("--- CRITIC NODE ---")
+
+    prompt, is_fanqie = build_critic_prompt(state)
 
     max_attempts = 2
     for attempt in range(max_attempts):
         try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.3,  # 稍高温度,更灵活的评审
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=90.0,  # 增加到90秒,避免评审超时
-                max_retries=0
-            )
-
-            response = llm.invoke([HumanMessage(content=prompt)])
-            feedback = response.content.strip()
-
-            print(f"  ✅ 评审完成")
-
-            # 显示评审结果摘要 (优先检查"需修改"，因为这是更重要的状态)
-            if "需修改" in feedback or "不合格" in feedback:
-                print(f"     状态: ⚠️  需改进")
-            elif "通过" in feedback or "合格" in feedback:
-                print(f"     状态: ✅ 通过")
+            response = get_critic_llm().invoke([HumanMessage(content=prompt)])
+            return report_feedback(response.content.strip())
+
+        except Exception as e:
+            if attempt < max_attempts - 1:
+                print(f"  ⏳ 评审超时,重试 ({attempt+2}/{max_attempts})...")
+                retry_wait(attempt)
             else:
-                print(f"     状态: ❓ 未知")
+                print(f"  ⚠️  评审超时,使用快速检查")
+                # 快速本地检查
+                local_feedback = quick_local_check(state.get("draft", ""), state.get("world_bible", {}), is_fanqie)
+                return {"feedback": local_feedback}
+
+
+async def acritic_node(state: NovelState) -> NovelState:
+    """Critic Node 的异步版本（--async 模式）"""
+    print("--- CRITIC NODE (async) ---")
+
+    prompt, is_fanqie = build_critic_prompt(state)
 
-            return {"feedback": feedback}
+    max_attempts = 2
+    for attempt in range(max_attempts):
+        try:
+            response = await get_critic_llm().ainvoke([HumanMessage(content=prompt)])
+            return report_feedback(response.content.strip())
 
         except Exception as e:
             if attempt < max_attempts - 1:
-                wait = (attempt + 1) * 4
                 print(f"  ⏳ 评审超时,重试 ({attempt+2}/{max_attempts})...")
-                time.sleep(wait)
+                await aretry_wait(attempt)
             else:
                 print(f"  ⚠️  评审超时,使用快速检查")
-                # 快速本地检查
-                local_feedback = quick_local_check(draft, world_bible, is_fanqie)
+                local_feedback = quick_local_check(state.get("draft", ""), state.get("world_bible", {}), is_fanqie)
                 return {"feedback": local_feedback}
 
 
@@ -245,14 +268,3 @@ def quick_local_check(draft, world_bible, is_fanqie=False):
     else:
         style_type = "番茄小说标准" if is_fanqie else "传统标准"
         return f"通过(本地检查/{style_type}): 内容长度适中,格式合理,包含必要元素"
-
-
-def extract_character_context(characters):
-    """提取角色上下文（完整版功能）"""
-    lines = []
-    for name, char_data in list(characters.items())[:3]:
-        notes = char_data.get("notes", [])
-        if notes:
-            latest = notes[-1] if isinstance(notes[-1], str) else str(notes[-1])
-            lines.append(f"- {name}: {latest[:80]}")
-    return "\n".join(lines) if lines else ""
@@ -1,9 +1,17 @@
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
+from src.utils.rate_limiter import retry_wait, aretry_wait
 from src.state import NovelState
-import os
+from src.utils import pipeline
+from src.utils.bible_digest import get_bible_digest, with_bible_digest
+from src.utils.prompt_budget import (
+    PromptSection, pack_sections, budget_for,
+    PRIORITY_CHARACTER_STATES, PRIORITY_THREADS, PRIORITY_RECENT, PRIORITY_BACKGROUND,
+)
+import re
 import json
 import time
+import asyncio
 import copy  # For deep copying world_bible
 
 def memory_update_node(state: NovelState) -> NovelState:
@@ -29,6 +37,168 @@ def memory_update_node(state: NovelState) -> NovelState:
         state=state  # Pass full state for mode detection
     )
 
+    return with_bible_digest(state, apply_memory_update(state, updated_state))
+
+
+async def amemory_update_node(state: NovelState) -> NovelState:
+    """Memory Update Node 的异步版本（--async 模式）"""
+    print("--- MEMORY UPDATE NODE (async) ---")
+
+    chapter_index = state.get("current_chapter_index", 1)
+    print(f"  📚 分析第 {chapter_index} 章内容...")
+
+    updated_state = await aupdate_world_state_with_ai(
+        draft=state.get("draft", ""),
+        world_bible=state.get("world_bible", {}),
+        chapter_index=chapter_index,
+        history=state.get("chapters", []),
+        state=state
+    )
+
+    # 卷记忆压缩是同步调用，放到线程中执行
+    return with_bible_digest(state, await asyncio.to_thread(apply_memory_update, state, updated_state))
+
+
+def pipelined_memory_node(state: NovelState) -> NovelState:
+    """
+    流水线模式的 Memory Node（generation.pipeline_memory）
+
+    第 N 章的 AI 记忆提取放到后台，与第 N+1 章的规划/写作并发：
+    1. 先对账：取回第 N-1 章的提取结果，写回 world_bible / 分层记忆，替换推测摘要
+    2. 再派发：以对账后的状态为快照，后台提取第 N 章
+    3. 推测输出：章节历史先记一条本地摘要，world_bible 保持快照，立即进入下一章
+
+    卷压缩边界和最后一章同步执行，保证卷审查和收尾拿到完整记忆。
+    """
+    print("--- MEMORY UPDATE NODE (pipelined) ---")
+
+    chapter_index = state.get("current_chapter_index", 1)
+    draft = state.get("draft", "")
+
+    # 1. 对账上一章（world_bible 有变化时同步更新 bible_digest）
+    state = {**state, **with_bible_digest(state, reconcile_pending_memory(state))}
+    reconciled = {
+        "world_bible": state.get("world_bible", {}),
+        "hot_memory": state.get("hot_memory"),
+        "chapters": state.get("chapters", []),
+    }
+
+    hot_memory = state.get("hot_memory")
+    target_chapters = state.get("config", {}).get("novel", {}).get("target_chapters", 1)
+    at_volume_boundary = bool(hot_memory) and (hot_memory["chapters_in_volume"] + 1) % 25 == 0
+
+    if at_volume_boundary or chapter_index >= target_chapters:
+        # 同步提取：卷压缩/收尾需要本章的完整记忆
+        print(f"  📚 分析第 {chapter_index} 章内容（同步）...")
+        updated_state = update_world_state_with_ai(
+            draft=draft,
+            world_bible=reconciled["world_bible"],
+            chapter_index=chapter_index,
+            history=reconciled["chapters"],
+            state=state
+        )
+        return with_bible_digest(state, {
+            **reconciled,
+            **apply_memory_update(state, updated_state),
+            "bible_digest": state.get("bible_digest"),
+            "pending_memory": None,
+        })
+
+    # 2. 后台提取本章
+    print(f"  📚 后台分析第 {chapter_index} 章内容...")
+    pipeline.submit(
+        pending_memory_key(state, chapter_index),
+        update_world_state_with_ai,
+        draft,
+        copy.deepcopy(reconciled["world_bible"]),
+        chapter_index,
+        list(reconciled["chapters"]),
+        {"hot_memory": hot_memory}  # 仅用于模式判断
+    )
+
+    # 3. 推测输出
+    speculative_summary = {
+        "index": chapter_index,
+        "summary": extract_simple_summary(draft, chapter_index),
+        "speculative": True
+    }
+    print(f"  ⚡ 第 {chapter_index} 章先记推测摘要，继续规划下一章")
+
+    return {
+        **reconciled,
+        "bible_digest": state.get("bible_digest"),
+        "chapters": reconciled["chapters"] + [speculative_summary],
+        "current_chapter_index": chapter_index + 1,
+        "current_beats": "",
+        "draft": "",
+        "iteration": 0,
+        "pending_memory": {"chapter_index": chapter_index, "draft": draft}
+    }
+
+
+def pending_memory_key(state, chapter_index):
+    """后台任务 key（按项目数据库区分，批量运行多个项目时不冲突）"""
+    db_file = state.get("project_paths", {}).get("db_file", "")
+    return f"memory:{db_file}:{chapter_index}"
+
+
+def reconcile_pending_memory(state):
+    """
+    取回后台记忆提取结果并合并进 state
+
+    断点续传时后台任务已丢失，根据 pending_memory 中保存的正文同步重新提取。
+
+    Returns:
+        dict: 对账后的 state（未对账项时原样返回）
+    """
+    pending = state.get("pending_memory")
+    if not pending:
+        return state
+
+    pending_index = pending["chapter_index"]
+    found, updated_state = pipeline.collect(pending_memory_key(state, pending_index))
+
+    # 去掉推测摘要，换成真实结果
+    chapters = [
+        ch for ch in state.get("chapters", [])
+        if not (isinstance(ch, dict) and ch.get("speculative") and ch.get("index") == pending_index)
+    ]
+    pending_state = {
+        **state,
+        "draft": pending["draft"],
+        "current_chapter_index": pending_index,
+        "chapters": chapters
+    }
+
+    if not found:
+        print(f"  🔄 第 {pending_index} 章后台记忆丢失（断点续传），重新提取...")
+        updated_state = update_world_state_with_ai(
+            draft=pending["draft"],
+            world_bible=state.get("world_bible", {}),
+            chapter_index=pending_index,
+            history=chapters,
+            state=state
+        )
+
+    print(f"  🔗 对账第 {pending_index} 章记忆")
+    result = apply_memory_update(pending_state, updated_state)
+
+    return {
+        **state,
+        "world_bible": result.get("world_bible", state.get("world_bible", {})),
+        "hot_memory": result.get("hot_memory", state.get("hot_memory")),
+        "chapters": result.get("chapters", chapters),
+        "pending_memory": None
+    }
+
+
+def apply_memory_update(state, updated_state):
+    """把 AI 分析结果写回状态（含分层记忆同步与卷压缩）"""
+    draft = state.get("draft", "")
+    world_bible = state.get("world_bible", {})
+    chapter_index = state.get("current_chapter_index", 1)
+    chapters_history = state.get("chapters", [])
+
     if updated_state:
         new_bible = updated_state.get("world_bible", world_bible)
         chapter_summary = updated_state.get("chapter_summary", {})
@@ -106,8 +276,24 @@ def memory_update_node(state: NovelState) -> NovelState:
         return fallback_update(state, draft, world_bible, chapter_index, chapters_history)
 
 
-def update_world_state_with_ai(draft, world_bible, chapter_index, history, state=None):
-    """使用 AI 智能更新世界状态"""
+def build_world_update_prompt(draft, world_bible, chapter_index, history, state=None):
+    """构建世界状态分析 prompt（世界设定使用 bible digest，按 token 预算装入）"""
+
+    config = (state or {}).get("config")
+    digest = get_bible_digest(state or {}, world_bible)
+    context, _ = pack_sections([
+        PromptSection("states", [f"- {name}: {text}" for name, text in digest["states"].items()],
+                      PRIORITY_CHARACTER_STATES, max_tokens=250, item_max=60),
+        PromptSection("threads", digest["threads"], PRIORITY_THREADS, max_tokens=200, item_max=50),
+        PromptSection("events", digest["events"], PRIORITY_RECENT, max_tokens=120, item_max=40, keep="tail"),
+        PromptSection("characters", [f"{name}｜{text}" if text else name for name, text in digest["characters"].items()],
+                      PRIORITY_BACKGROUND, max_tokens=250),
+        PromptSection("setting", digest["setting"], PRIORITY_BACKGROUND, max_tokens=150, item_max=80),
+    ], budget_for("memory", config))
+    bible_lines = []
+    for title, key in (("角色", "characters"), ("角色状态", "states"), ("伏笔", "threads"), ("世界事件", "events"), ("设定", "setting")):
+        if context[key]:
+            bible_lines.append(f"[{title}]\n{context[key]}")
 
     # 构建上下文
     recent_history = "\n".join([
@@ -120,7 +306,7 @@ def update_world_state_with_ai(draft, world_bible, chapter_index, history, state
         "你是专业小说编辑，负责追踪世界状态和角色发展。",
         "",
         "【当前世界设定】",
-        json.dumps(world_bible, ensure_ascii=False, indent=2)[:1000],
+        "\n".join(bible_lines) or "(暂无)",
         "",
         "【前几章回顾】",
         recent_history if recent_history else "(这是第一章)",
@@ -176,105 +362,139 @@ def update_world_state_with_ai(draft, world_bible, chapter_index, history, state
         "只输出 JSON，不要其他内容。"
     ]
 
-    prompt = '\n'.join(prompt_parts)
+    return '\n'.join(prompt_parts)
+
+
+def parse_world_update(content):
+    """
+    从 AI 响应中解析世界状态更新
+
+    Returns:
+        dict | None: 解析结果；找不到 JSON 时返回 None
+    Raises:
+        json.JSONDecodeError: 修复后仍不是合法 JSON
+    """
+    # 提取 JSON
+    json_content = extract_json_from_response(content)
+    if not json_content:
+        return None
+
+    # 尝试清理和修复常见的 JSON 错误
+    # 1. 移除注释
+    json_content_clean = re.sub(r'//.*', '', json_content)
+
+    # 2. 检查并修复未闭合的 JSON
+    # 计算引号数量，如果是奇数，说明有未闭合的字符串
+    quote_count = json_content_clean.count('"')
+    if quote_count % 2 != 0:
+        print(f"     ⚠️  检测到未闭合的字符串（引号数: {quote_count}）")
+        # 尝试闭合最后一个字符串
+        json_content_clean = json_content_clean.rstrip() + '"'
+
+    # 3. 修复缺失的逗号（在 } 或 ] 后面跟 "）
+    json_content_clean = re.sub(r'([}\]])(\s*\n\s*)(")', r'\1,\2\3', json_content_clean)
+
+    # 4. 修复缺失的逗号（在 " 后面跟 "）
+    json_content_clean = re.sub(r'(")\s*\n(\s*")', r'\1,\n\2', json_content_clean)
+
+    # 5. 修复缺失的逗号（数组/对象之间）
+    json_content_clean = re.sub(r'([}\]])(\s*\n\s*)([{\[])', r'\1,\2\3', json_content_clean)
+
+    # 6. 移除尾部逗号
+    json_content_clean = re.sub(r',(\s*[}\]])', r'\1', json_content_clean)
+
+    # 7. 确保 JSON 正确闭合
+    # 统计大括号和方括号
+    open_braces = json_content_clean.count('{') - json_content_clean.count('}')
+    open_brackets = json_content_clean.count('[') - json_content_clean.count(']')
+
+    if open_braces > 0 or open_brackets > 0:
+        print(f"     ⚠️  检测到未闭合的括号（{{: {open_braces}, [: {open_brackets}）")
+        # 尝试添加缺失的闭合括号
+        json_content_clean = json_content_clean.rstrip()
+        json_content_clean += '\n' + ('  ]' * open_brackets) + '\n' + ('}' * open_braces)
+
+    try:
+        return json.loads(json_content_clean)
+    except json.JSONDecodeError as json_err:
+        # 如果还是失败，打印详细信息方便调试
+        print(f"     ⚠️  JSON 格式错误: {str(json_err)[:80]}")
+        print(f"     修复后的JSON前200字符: {json_content_clean[:200]}")
+        raise
+
+
+def get_memory_llm():
+    return get_llm(
+        temperature=0.3,  # 较低温度，确保准确性
+        timeout=60.0,  # 60秒超时
+        max_retries=0,
+        max_tokens=2048  # 增加 max_tokens 防止截断
+    )
+
+
+def build_world_update_result(parsed, world_bible, chapter_index, state):
+    """根据解析结果生成更新后的 world_bible 与章节摘要"""
+    updated_bible = update_bible_with_parsed_data(
+        world_bible,
+        parsed,
+        chapter_index,  # 传递 chapter_index
+        state  # 传递 state for mode detection
+    )
+
+    return {
+        "world_bible": updated_bible,
+        "chapter_summary": parsed.get("chapter_summary", {}),
+        "important_changes": parsed.get("important_changes", [])
+    }
+
+
+def update_world_state_with_ai(draft, world_bible, chapter_index, history, state=None):
+    """使用 AI 智能更新世界状态"""
+    prompt = build_world_update_prompt(draft, world_bible, chapter_index, history, state)
 
     max_attempts = 3
     for attempt in range(max_attempts):
         try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.3,  # 较低温度，确保准确性
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=60.0,  # 60秒超时
-                max_retries=0,
-                max_tokens=2048  # 增加 max_tokens 防止截断
-            )
-
-            response = llm.invoke([HumanMessage(content=prompt)])
-            content = response.content.strip()
-
-            # 提取 JSON
-            json_content = extract_json_from_response(content)
-            if json_content:
-                # 尝试清理和修复常见的 JSON 错误
-                import re
-
-                # 1. 移除注释
-                json_content_clean = re.sub(r'//.*', '', json_content)
-
-                # 2. 检查并修复未闭合的 JSON
-                # 计算引号数量，如果是奇数，说明有未闭合的字符串
-                quote_count = json_content_clean.count('"')
-                if quote_count % 2 != 0:
-                    print(f"     ⚠️  检测到未闭合的字符串（引号数: {quote_count}）")
-                    # 尝试闭合最后一个字符串
-                    json_content_clean = json_content_clean.rstrip() + '"'
-
-                # 3. 修复缺失的逗号（在 } 或 ] 后面跟 "）
-                json_content_clean = re.sub(r'([}\]])(\s*\n\s*)(")', r'\1,\2\3', json_content_clean)
-
-                # 4. 修复缺失的逗号（在 " 后面跟 "）
-                json_content_clean = re.sub(r'(")\s*\n(\s*")', r'\1,\n\2', json_content_clean)
-
-                # 5. 修复缺失的逗号（数组/对象之间）
-                json_content_clean = re.sub(r'([}\]])(\s*\n\s*)([{\[])', r'\1,\2\3', json_content_clean)
-
-                # 6. 移除尾部逗号
-                json_content_clean = re.sub(r',(\s*[}\]])', r'\1', json_content_clean)
-
-                # 7. 确保 JSON 正确闭合
-                # 统计大括号和方括号
-                open_braces = json_content_clean.count('{') - json_content_clean.count('}')
-                open_brackets = json_content_clean.count('[') - json_content_clean.count(']')
-
-                if open_braces > 0 or open_brackets > 0:
-                    print(f"     ⚠️  检测到未闭合的括号（{{: {open_braces}, [: {open_brackets}）")
-                    # 尝试添加缺失的闭合括号
-                    json_content_clean = json_content_clean.rstrip()
-                    json_content_clean += '\n' + ('  ]' * open_brackets) + '\n' + ('}' * open_braces)
-
-                try:
-                    parsed = json.loads(json_content_clean)
-                except json.JSONDecodeError as json_err:
-                    # 如果还是失败，打印详细信息方便调试
-                    print(f"     ⚠️  JSON 格式错误: {str(json_err)[:80]}")
-                    print(f"     修复后的JSON前200字符: {json_content_clean[:200]}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(3)
-                        continue
-                    else:
-                        raise
-
-                # 更新 world_bible
-                updated_bible = update_bible_with_parsed_data(
-                    world_bible,
-                    parsed,
-                    chapter_index,  # 传递 chapter_index
-                    state  # 传递 state for mode detection
-                )
+            response = get_memory_llm().invoke([HumanMessage(content=prompt)])
+            parsed = parse_world_update(response.content.strip())
 
-                return {
-                    "world_bible": updated_bible,
-                    "chapter_summary": parsed.get("chapter_summary", {}),
-                    "important_changes": parsed.get("important_changes", [])
-                }
-            else:
-                print(f"     ⚠️  JSON 解析失败，重试 ({attempt + 1}/{max_attempts})")
-                if attempt < max_attempts - 1:
-                    time.sleep(3)
-                    continue
-
-        except json.JSONDecodeError as e:
-            print(f"     ⚠️  JSON 格式错误: {str(e)[:50]}")
+            if parsed is not None:
+                return build_world_update_result(parsed, world_bible, chapter_index, state)
+
+            # 解析失败直接重试（请求节奏由全局限流器控制）
+            print(f"     ⚠️  JSON 解析失败，重试 ({attempt + 1}/{max_attempts})")
+
+        except json.JSONDecodeError:
+            continue
+        except Exception as e:
+            print(f"     ⚠️  AI 调用失败: {str(e)[:50]}")
             if attempt < max_attempts - 1:
-                time.sleep(3)
-                continue
+                retry_wait(attempt)
+
+    return None
+
+
+async def aupdate_world_state_with_ai(draft, world_bible, chapter_index, history, state=None):
+    """update_world_state_with_ai 的异步版本"""
+    prompt = build_world_update_prompt(draft, world_bible, chapter_index, history, state)
+
+    max_attempts = 3
+    for attempt in range(max_attempts):
+        try:
+            response = await get_memory_llm().ainvoke([HumanMessage(content=prompt)])
+            parsed = parse_world_update(response.content.strip())
+
+            if parsed is not None:
+                return build_world_update_result(parsed, world_bible, chapter_index, state)
+
+            print(f"     ⚠️  JSON 解析失败，重试 ({attempt + 1}/{max_attempts})")
+
+        except json.JSONDecodeError:
+            continue
         except Exception as e:
             print(f"     ⚠️  AI 调用失败: {str(e)[:50]}")
             if attempt < max_attempts - 1:
-                time.sleep((attempt + 1) * 4)
-                continue
+                await aretry_wait(attempt)
 
     return None
 
@@ -5,9 +5,9 @@
 """
 
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
 from src.state import NovelState
-import os
+from src.utils.outline_index import get_outline_index
 import time
 
 
@@ -149,11 +149,8 @@ def check_outline_alignment(novel_outline, cold_memory, hot_memory, current_chap
 """
 
     try:
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.2,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=50.0,
             max_retries=1
         )
@@ -186,11 +183,8 @@ def check_plot_progress(novel_outline, current_chapter, cold_memory):
     if not milestones:
         return 80  # 没有里程碑，默认良好
 
-    # 检查应该到达的里程碑
-    expected_milestone = None
-    for milestone in milestones:
-        if milestone["chapter"] <= current_chapter - 1:
-            expected_milestone = milestone
+    # 检查应该到达的里程碑（按章节号索引）
+    expected_milestone = get_outline_index(novel_outline).last_milestone(current_chapter - 1)
 
     if not expected_milestone:
         return 85  # 还没到第一个里程碑
@@ -1,11 +1,16 @@
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
+from src.utils.rate_limiter import retry_wait, aretry_wait
 from src.state import NovelState
 from src.utils.plot_manager import analyze_plot_threads, format_plot_thread_guidance
-import os
+from src.utils.prompt_budget import (
+    PromptSection, pack_sections, budget_for, thread_lines,
+    PRIORITY_BEATS, PRIORITY_CHARACTER_STATES, PRIORITY_THREADS, PRIORITY_RECENT, PRIORITY_BACKGROUND,
+)
 import json
 import time
-import yaml
+from src.utils.yaml_cache import load_outline
+from src.utils.outline_index import get_outline_index
 
 
 def load_custom_outline(state):
@@ -22,20 +27,18 @@ def load_custom_outline(state):
     bible_dir = project_paths.get('bible_dir')
 
     if bible_dir:
-        outline_file = os.path.join(bible_dir, 'outline.yaml')
-        if os.path.exists(outline_file):
-            try:
-                with open(outline_file, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-
-                # 检查 data 是否为 None 或空
-                if data and isinstance(data, dict):
-                    print(f"  📖 加载独立大纲文件: outline.yaml")
-                    return data
-                else:
-                    print(f"  ⚠️  outline.yaml 为空或格式错误")
-            except Exception as e:
-                print(f"  ⚠️  读取 outline.yaml 失败: {e}")
+        try:
+            # 按文件状态缓存，每章规划不再重复解析（文件被编辑后自动重新读取）
+            data = load_outline(bible_dir)
+
+            # 检查 data 是否为 None 或空
+            if data:
+                print(f"  📖 加载独立大纲文件: outline.yaml")
+                return data
+            elif data is not None:
+                print(f"  ⚠️  outline.yaml 为空或格式错误")
+        except Exception as e:
+            print(f"  ⚠️  读取 outline.yaml 失败: {e}")
 
     # 🔧 回退到旧格式（配置文件中的字段）
     config = state.get('config', {})
@@ -54,7 +57,7 @@ def load_custom_outline(state):
 
 def find_current_phase(outline, chapter_index):
     """
-    根据章节号查找当前所在阶段
+    根据章节号查找当前所在阶段（区间索引，O(log n)）
 
     Returns:
         dict or None: 当前阶段信息
@@ -62,22 +65,12 @@ def find_current_phase(outline, chapter_index):
     if not outline or 'phases' not in outline:
         return None
 
-    for phase in outline['phases']:
-        chapters_range = phase.get('chapters', '')
-        if '-' in chapters_range:
-            try:
-                start, end = map(int, chapters_range.split('-'))
-                if start <= chapter_index <= end:
-                    return phase
-            except:
-                continue
-
-    return None
+    return get_outline_index(outline).find_phase(chapter_index)
 
 
 def find_current_volume(volumes, chapter_index):
     """
-    根据章节号查找当前所在卷
+    根据章节号查找当前所在卷（区间索引，O(log n)）
 
     Returns:
         dict or None: 当前卷信息
@@ -85,17 +78,7 @@ def find_current_volume(volumes, chapter_index):
     if not volumes:
         return None
 
-    for volume in volumes:
-        chapters_range = volume.get('chapters', '')
-        if '-' in chapters_range:
-            try:
-                start, end = map(int, chapters_range.split('-'))
-                if start <= chapter_index <= end:
-                    return volume
-            except:
-                continue
-
-    return None
+    return get_outline_index(None, volumes).find_volume(chapter_index)
 
 def planner_node(state: NovelState) -> NovelState:
     """
@@ -105,6 +88,25 @@ def planner_node(state: NovelState) -> NovelState:
     """
     print("--- PLANNER NODE ---")
 
+    beats = generate_intelligent_beats(**prepare_planner_inputs(state))
+    return finish_planner(beats)
+
+
+async def aplanner_node(state: NovelState) -> NovelState:
+    """Planner Node 的异步版本（使用 ainvoke，供 --async 模式使用）"""
+    print("--- PLANNER NODE (async) ---")
+
+    beats = await agenerate_intelligent_beats(**prepare_planner_inputs(state))
+    return finish_planner(beats)
+
+
+def prepare_planner_inputs(state):
+    """
+    整理规划所需的上下文（同步/异步节点共用）
+
+    Returns:
+        dict: generate_intelligent_beats 的参数
+    """
     world_bible = state.get("world_bible", {})
     synopsis = state.get("synopsis", "")
     chapter_history = state.get("chapters", [])
@@ -153,7 +155,7 @@ def planner_node(state: NovelState) -> NovelState:
         # 转换为标准格式
         characters = {
             f"角色{i+1}": {"notes": [char_state]}
-            for i, char_state in enumerate(characters_info[:3])
+            for i, char_state in enumerate(characters_info)
         }
 
         print(f"  📚 历史摘要: {len(chapter_history)} 条")
@@ -171,18 +173,22 @@ def planner_node(state: NovelState) -> NovelState:
     if plot_analysis['should_reveal']:
         print(f"  🎯 伏笔提醒: {len(plot_analysis['should_reveal'])} 个应揭示")
 
-    # 构建智能 prompt
-    beats = generate_intelligent_beats(
-        characters=characters,
-        plot_threads=plot_threads,
-        world_events=world_events,
-        chapter_history=chapter_history,
-        synopsis=synopsis,
-        chapter_index=current_chapter_index,
-        plot_analysis=plot_analysis,  # 传递伏笔分析
-        custom_outline=custom_outline  # 🔧 新增：传递自定义大纲
-    )
-
+    # 构建智能 prompt 的参数
+    return {
+        "characters": characters,
+        "plot_threads": plot_threads,
+        "world_events": world_events,
+        "chapter_history": chapter_history,
+        "synopsis": synopsis,
+        "chapter_index": current_chapter_index,
+        "plot_analysis": plot_analysis,  # 传递伏笔分析
+        "custom_outline": custom_outline,  # 🔧 新增：传递自定义大纲
+        "context_budget": budget_for("planner", config),
+    }
+
+
+def finish_planner(beats):
+    """根据生成结果构造节点输出（含降级方案）"""
     if beats:
         print(f"  ✅ 大纲生成成功 ({len(beats)} 字符)")
         return {"current_beats": beats}
@@ -192,26 +198,110 @@ def planner_node(state: NovelState) -> NovelState:
         return {"current_beats": "场景1: 角色出现\n场景2: 发生冲突\n场景3: 解决问题"}
 
 
-def generate_intelligent_beats(characters, plot_threads, world_events, chapter_history, synopsis, chapter_index, plot_analysis=None, custom_outline=None):
+def generate_intelligent_beats(characters, plot_threads, world_events, chapter_history, synopsis, chapter_index, plot_analysis=None, custom_outline=None, context_budget=None):
     """生成智能场景大纲（完整版：含伏笔管理 + 自定义大纲）"""
 
+    prompt = build_beats_prompt(
+        characters, plot_threads, world_events, chapter_history,
+        synopsis, chapter_index, plot_analysis, custom_outline, context_budget
+    )
+
+    max_attempts = 3
+    for attempt in range(max_attempts):
+        try:
+            llm = get_llm(
+                temperature=0.75,  # 稍高创造性，同时保持连贯
+                timeout=60.0,  # 增加到60秒，给予充足时间处理复杂上下文
+                max_retries=0
+            )
+
+            response = llm.invoke([HumanMessage(content=prompt)])
+            beats = response.content.strip()
+
+            # 验证场景数量
+            if not validate_beats(beats) and attempt < max_attempts - 1:
+                continue
+
+            return beats
+
+        except Exception as e:
+            print(f"     ⚠️  生成失败: {str(e)[:40]}")
+            if attempt < max_attempts - 1:
+                print(f"     ⏳ 重试 ({attempt+2}/{max_attempts})...")
+                retry_wait(attempt)
+            else:
+                return None
+
+    return None
+
+
+async def agenerate_intelligent_beats(characters, plot_threads, world_events, chapter_history, synopsis, chapter_index, plot_analysis=None, custom_outline=None, context_budget=None):
+    """generate_intelligent_beats 的异步版本"""
+
+    prompt = build_beats_prompt(
+        characters, plot_threads, world_events, chapter_history,
+        synopsis, chapter_index, plot_analysis, custom_outline, context_budget
+    )
+
+    max_attempts = 3
+    for attempt in range(max_attempts):
+        try:
+            llm = get_llm(
+                temperature=0.75,
+                timeout=60.0,
+                max_retries=0
+            )
+
+            response = await llm.ainvoke([HumanMessage(content=prompt)])
+            beats = response.content.strip()
+
+            if not validate_beats(beats) and attempt < max_attempts - 1:
+                continue
+
+            return beats
+
+        except Exception as e:
+            print(f"     ⚠️  生成失败: {str(e)[:40]}")
+            if attempt < max_attempts - 1:
+                print(f"     ⏳ 重试 ({attempt+2}/{max_attempts})...")
+                await aretry_wait(attempt)
+            else:
+                return None
+
+    return None
+
+
+def validate_beats(beats):
+    """检查场景数量是否足够"""
+    scene_count = beats.count("场景")
+    if scene_count < 2:
+        print(f"     ⚠️  场景太少({scene_count})，重试")
+        return False
+    return True
+
+
+def build_beats_prompt(characters, plot_threads, world_events, chapter_history, synopsis, chapter_index, plot_analysis=None, custom_outline=None, context_budget=None):
+    """构建场景规划 prompt（上下文区块受 context_budget 个 token 限制）"""
+
     # 🔧 新增：解析自定义大纲
     current_phase = None
     current_volume = None
     outline_guidance = ""
 
     if custom_outline:
-        outline_data = custom_outline.get('outline', {})
-        volumes_data = custom_outline.get('volumes', [])
+        outline_data = custom_outline.get('outline') or None
+        volumes_data = custom_outline.get('volumes') or None
+        # 同一份大纲只建一次索引（outline.yaml 未修改时 load_custom_outline 返回同一对象）
+        outline_index = get_outline_index(outline_data, volumes_data)
 
         # 查找当前阶段
-        current_phase = find_current_phase(outline_data, chapter_index)
+        current_phase = outline_index.find_phase(chapter_index)
         if current_phase:
             outline_guidance += f"\n【当前阶段】第{chapter_index}章位于：{current_phase.get('name')}\n"
             outline_guidance += f"阶段目标: {current_phase.get('goal')}\n"
 
         # 查找当前卷
-        current_volume = find_current_volume(volumes_data, chapter_index)
+        current_volume = outline_index.find_volume(chapter_index)
         if current_volume:
             outline_guidance += f"\n【当前卷】第{current_volume.get('volume')}卷：{current_volume.get('title')}\n"
             outline_guidance += f"卷核心目标: {current_volume.get('core_goal')}\n"
@@ -224,97 +314,76 @@ def generate_intelligent_beats(characters, plot_threads, world_events, chapter_h
             outline_guidance += f"主目标: {outline_data.get('main_goal', '（未设定）')}\n"
             outline_guidance += f"主线冲突: {outline_data.get('main_conflict', '（未设定）')}\n"
 
-    # 构建角色状态摘要
+    # 上下文区块按 token 预算装入（高优先级先分配，条目按相关度整条装入）
     character_states = []
-    for name, char_data in list(characters.items())[:3]:  # 最多3个主要角色
+    for name, char_data in characters.items():
         # 🔧 Bug #12修复: 兼容两种模式 (长篇: notes, 短篇: recent_notes)
         notes = char_data.get("notes", char_data.get("recent_notes", []))
         latest_note = notes[-1] if notes else "初始状态"
         character_states.append(f"{name}: {latest_note}")
 
-    character_summary = "\n".join(character_states) if character_states else "角色状态未知"
-
-    # 构建伏笔摘要（处理不同数据结构）
-    if isinstance(plot_threads, dict):
-        # 长篇模式：从 dict 中提取 active threads
-        active_plot_threads = plot_threads.get("active", [])[-5:]
-    elif plot_threads:
-        # 短篇模式：直接使用 list
-        active_plot_threads = plot_threads[-5:]
-    else:
-        active_plot_threads = []
-
-    # 🔧 Bug #9修复: 处理dict格式的thread对象
-    formatted_threads = []
-    for thread in active_plot_threads:
-        if isinstance(thread, dict):
-            # 长篇模式: thread是 {"text": "...", "created_at": ..., "importance": ...}
-            formatted_threads.append(thread.get("text", str(thread)))
-        else:
-            # 短篇模式: thread是字符串
-            formatted_threads.append(str(thread))
-
-    plot_summary = "\n".join([f"- {t}" for t in formatted_threads]) if formatted_threads else "暂无伏笔"
-
-    # 构建世界状态摘要
-    recent_events = world_events[-3:] if world_events else []  # 最近3个事件
-    world_summary = "\n".join([f"- {event}" for event in recent_events]) if recent_events else "世界初始状态"
-
-    # 构建章节历史
-    recent_chapters = chapter_history[-5:] if chapter_history else []
-
     # 🔧 Bug #19修复: chapter_history可能是字符串列表(长篇)或dict列表(短篇)
     history_lines = []
-    for ch in recent_chapters:
+    for ch in chapter_history or []:
         if isinstance(ch, dict):
             # 短篇模式: ch是dict
-            history_lines.append(f"第{ch.get('index')}章: {ch.get('summary', '')[:100]}")
+            history_lines.append(f"第{ch.get('index')}章: {ch.get('summary', '')}")
         else:
             # 长篇模式: ch已经是格式化的字符串
-            history_lines.append(str(ch)[:150])
-
-    history_summary = "\n".join(history_lines) if history_lines else "这是第一章"
+            history_lines.append(str(ch))
+
+    plot_guidance = format_plot_thread_guidance(plot_analysis) if plot_analysis else ""
+
+    context, used_tokens = pack_sections([
+        PromptSection("outline", outline_guidance.strip(), PRIORITY_BEATS, max_tokens=400),
+        PromptSection("plot_guidance", plot_guidance, PRIORITY_BEATS, max_tokens=200),
+        PromptSection("characters", character_states, PRIORITY_CHARACTER_STATES, max_tokens=240, item_max=60),
+        PromptSection("threads", thread_lines(plot_threads), PRIORITY_THREADS, max_tokens=200, item_max=50),
+        PromptSection("history", history_lines[-8:], PRIORITY_RECENT, max_tokens=400, item_max=90, keep="tail"),
+        PromptSection("synopsis", synopsis, PRIORITY_BACKGROUND, max_tokens=300),
+        PromptSection("world", [f"- {e}" for e in (world_events or [])][-5:], PRIORITY_BACKGROUND,
+                      max_tokens=120, item_max=40, keep="tail"),
+    ], context_budget or budget_for("planner"))
+    print(f"  🧮 上下文: {used_tokens} tokens")
 
     # 构建完整 prompt
     prompt_parts = [
         "你是资深小说规划师，负责创建深度连贯的章节场景。",
         "",
         "【故事梗概】",
-        synopsis[:500],
+        context["synopsis"],
         "",
     ]
 
     # 🔧 新增：添加自定义大纲指引
-    if outline_guidance:
+    if context["outline"]:
         prompt_parts.extend([
-            outline_guidance.strip(),
+            context["outline"],
             ""
         ])
 
     prompt_parts.extend([
         "【角色当前状态】",
-        character_summary,
+        context["characters"] or "角色状态未知",
         "",
         "【未解决的伏笔/谜团】",
-        plot_summary,
+        context["threads"] or "暂无伏笔",
         "",
         "【世界当前状态】",
-        world_summary,
+        context["world"] or "世界初始状态",
         "",
         "【前几章回顾】",
-        history_summary,
+        context["history"] or "这是第一章",
         "",
     ])
 
     # 添加伏笔管理指导（完整版功能）
-    if plot_analysis:
-        plot_guidance = format_plot_thread_guidance(plot_analysis)
-        if plot_guidance:
-            prompt_parts.extend([
-                "【伏笔管理】",
-                plot_guidance,
-                ""
-            ])
+    if context["plot_guidance"]:
+        prompt_parts.extend([
+            "【伏笔管理】",
+            context["plot_guidance"],
+            ""
+        ])
 
     prompt_parts.extend([
         f"【任务】为第 {chapter_index} 章创建 3-5 个场景大纲",
@@ -351,40 +420,4 @@ def generate_intelligent_beats(characters, plot_threads, world_events, chapter_h
         "直接输出场景列表，不要解释。"
     ])
 
-    prompt = '\n'.join(prompt_parts)
-
-    max_attempts = 3
-    for attempt in range(max_attempts):
-        try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.75,  # 稍高创造性，同时保持连贯
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=60.0,  # 增加到60秒，给予充足时间处理复杂上下文
-                max_retries=0
-            )
-
-            response = llm.invoke([HumanMessage(content=prompt)])
-            beats = response.content.strip()
-
-            # 验证场景数量
-            scene_count = beats.count("场景")
-            if scene_count < 2:
-                print(f"     ⚠️  场景太少({scene_count})，重试")
-                if attempt < max_attempts - 1:
-                    time.sleep(3)
-                    continue
-
-            return beats
-
-        except Exception as e:
-            print(f"     ⚠️  生成失败: {str(e)[:40]}")
-            if attempt < max_attempts - 1:
-                wait = (attempt + 1) * 4
-                print(f"     ⏳ 重试 ({attempt+2}/{max_attempts})，等待 {wait}s...")
-                time.sleep(wait)
-            else:
-                return None
-
-    return None
+    return '\n'.join(prompt_parts)
@@ -5,9 +5,10 @@
 """
 
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
+from src.utils.rate_limiter import retry_wait
 from src.state import NovelState
-import os
+from src.utils.outline_index import get_outline_index
 import time
 
 
@@ -32,6 +33,7 @@ def volume_planner_node(state: NovelState) -> NovelState:
     print("--- VOLUME PLANNER NODE ---")
 
     current_volume = state.get("current_volume_index", 1)
+    current_chapter = state.get("current_chapter_index", 1)
     volume_frameworks = state.get("volume_frameworks", [])
     novel_outline = state.get("novel_outline", {})
     cold_memory = state.get("cold_memory", {})
@@ -43,12 +45,13 @@ def volume_planner_node(state: NovelState) -> NovelState:
         print("  ⚠️  没有卷框架，跳过卷规划")
         return {"current_volume_outline": ""}
 
-    if current_volume > len(volume_frameworks):
-        print(f"  ⚠️  卷索引 {current_volume} 超出范围，共 {len(volume_frameworks)} 卷")
-        return {"current_volume_outline": ""}
-
-    # 获取当前卷的框架
-    framework = volume_frameworks[current_volume - 1]
+    # 获取当前卷的框架：优先按章节范围查找下一章所在卷，范围缺失时按卷序号
+    framework = get_outline_index(None, volume_frameworks).find_volume(current_chapter)
+    if framework is None:
+        if current_volume > len(volume_frameworks):
+            print(f"  ⚠️  卷索引 {current_volume} 超出范围，共 {len(volume_frameworks)} 卷")
+            return {"current_volume_outline": ""}
+        framework = volume_frameworks[current_volume - 1]
 
     # 生成卷纲
     volume_outline = generate_volume_outline(
@@ -156,11 +159,8 @@ def generate_volume_outline(framework, novel_outline, cold_memory, volume_index)
     max_attempts = 3
     for attempt in range(max_attempts):
         try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
+            llm = get_llm(
                 temperature=0.7,  # 稍高创造性
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
                 timeout=75.0,  # 给予充足时间
                 max_retries=0
             )
@@ -172,7 +172,6 @@ def generate_volume_outline(framework, novel_outline, cold_memory, volume_index)
             if len(volume_outline) < 200:
                 print(f"     ⚠️  大纲过短({len(volume_outline)}字)，重试")
                 if attempt < max_attempts - 1:
-                    time.sleep(3)
                     continue
 
             return volume_outline
@@ -180,9 +179,8 @@ def generate_volume_outline(framework, novel_outline, cold_memory, volume_index)
         except Exception as e:
             print(f"     ⚠️  生成失败: {str(e)[:40]}")
             if attempt < max_attempts - 1:
-                wait = (attempt + 1) * 5
-                print(f"     ⏳ 重试 ({attempt+2}/{max_attempts})，等待 {wait}s...")
-                time.sleep(wait)
+                print(f"     ⏳ 重试 ({attempt+2}/{max_attempts})...")
+                retry_wait(attempt)
             else:
                 return None
 
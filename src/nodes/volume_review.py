@@ -5,10 +5,9 @@
 """
 
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
 from src.state import NovelState
 from src.memory.layered_memory import compress_volume_memory
-import os
 import json
 import time
 
@@ -179,11 +178,8 @@ def check_goal_completion(volume_chapters, framework):
 """
 
     try:
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.2,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=45.0,
             max_retries=1
         )
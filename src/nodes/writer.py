@@ -1,32 +1,66 @@
 from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from src.utils.llm_client import get_llm
+from src.utils.rate_limiter import retry_wait, aretry_wait
 from src.state import NovelState
-import os
+from src.utils import pipeline
+from src.utils.manuscript_store import get_store
+from src.utils.bible_digest import get_bible_digest
+from src.utils import prompt_cache
+from src.utils.prompt_budget import (
+    PromptSection, pack_sections, budget_for, format_characters, rank_characters,
+    PRIORITY_BEATS, PRIORITY_FEEDBACK, PRIORITY_CHARACTER_STATES, PRIORITY_THREADS, PRIORITY_RECENT,
+    PRIORITY_BACKGROUND,
+)
+import re
+import asyncio
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
-def save_chapter_to_file(chapter_index, content, state):
-    """保存章节到文件"""
+def resolve_manuscript_dir(state):
+    """获取章节输出目录（从state中读取项目路径）"""
+    project_paths = state.get('project_paths', {})
+    manuscript_dir = project_paths.get('manuscript_dir')
+
+    if not manuscript_dir:
+        # 降级方案：使用旧路径
+        config = state.get('config', {})
+        novel_info = config.get('novel', {})
+        title = novel_info.get('title', '未命名小说')
+        manuscript_dir = f"/project/novel/manuscript/{title}"
+
+    return manuscript_dir
+
+
+def load_previous_chapter_tail(state, chapter_index, max_chars=600):
+    """读取已保存章节的结尾（并行模式下作为第一段的前文）"""
+    if chapter_index < 1:
+        return ""
+
     try:
-        # 获取项目路径（从state中读取）
-        project_paths = state.get('project_paths', {})
-        manuscript_dir = project_paths.get('manuscript_dir')
+        content = get_store(resolve_manuscript_dir(state)).read(chapter_index)
+    except Exception:
+        return ""
+
+    if not content:
+        return ""
 
-        if not manuscript_dir:
-            # 降级方案：使用旧路径
-            config = state.get('config', {})
-            novel_info = config.get('novel', {})
-            title = novel_info.get('title', '未命名小说')
-            manuscript_dir = f"/project/novel/manuscript/{title}"
+    return content[-max_chars:] if len(content) > max_chars else content
 
-        # 创建输出目录
-        output_dir = Path(manuscript_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
+
+def save_chapter_to_file(chapter_index, content, state, async_mode=False):
+    """保存章节到文件（流水线模式下标题在后台生成，这里只落盘正文）"""
+    try:
+        # 章节存储（目录不存在时自动创建）
+        store = get_store(resolve_manuscript_dir(state))
+
+        # 流水线模式：先用占位标题落盘，标题在后台生成后回填
+        defer_title = pipeline.memory_pipelining(state.get('config'), async_mode)
 
         # 生成章节标题（基于内容）
-        chapter_title = generate_chapter_title(content, chapter_index)
+        chapter_title = f"第{chapter_index}章" if defer_title else generate_chapter_title(content, chapter_index)
 
         # 清理Markdown格式，转换为纯文本
         clean_content = content
@@ -40,27 +74,38 @@ def save_chapter_to_file(chapter_index, content, state):
         # 添加章节标题到内容开头
         final_content = f"第 {chapter_index} 章：{chapter_title}\n\n" + clean_content.split('\n', 1)[-1] if '\n' in clean_content else clean_content
 
-        # 保存章节（txt格式）
-        filename = output_dir / f"chapter_{chapter_index:03d}.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(final_content)
+        # 保存章节（追加到章节存储，返回时已落盘）
+        store.write(chapter_index, final_content)
+
+        print(f"  💾 已保存: 第 {chapter_index} 章 → {store.segment_path}")
 
-        print(f"  💾 已保存: {filename}")
-        print(f"  📖 章节标题: {chapter_title}")
+        if defer_title:
+            pipeline.submit(f"title:{store.directory}:{chapter_index}", retitle_chapter_file, store, content, chapter_index, final_content)
+            print(f"  📖 章节标题: 后台生成中")
+        else:
+            print(f"  📖 章节标题: {chapter_title}")
 
     except Exception as e:
         print(f"  ⚠️  保存失败: {str(e)[:50]}")
 
 
+def retitle_chapter_file(store, content, chapter_index, saved_content):
+    """后台生成标题并回填到章节首行（该章已被修订版覆盖时跳过）"""
+    chapter_title = generate_chapter_title(content, chapter_index)
+
+    _, sep, body = saved_content.partition('\n')
+    if not store.write(chapter_index, f"第 {chapter_index} 章：{chapter_title}" + sep + body, expected=saved_content):
+        return None
+
+    return chapter_title
+
+
 def generate_chapter_title(content, chapter_index):
     """基于章节内容生成标题"""
     try:
         # 使用AI生成简洁的章节标题
-        llm = ChatAnthropic(
-            model="claude-sonnet-4-5-20250929",
+        llm = get_llm(
             temperature=0.3,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-            anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
             timeout=20.0,
             max_retries=1
         )
@@ -99,16 +144,14 @@ def generate_chapter_title(content, chapter_index):
         return f"第{chapter_index}章"
 
 
-def writer_node(state: NovelState) -> NovelState:
-    """
-    High quality Writer Node with segmented generation.
-    完整版：利用角色历史状态确保一致性
-    """
-    print("--- WRITER NODE ---")
-
+def prepare_writer_inputs(state):
+    """读取 writer 所需的上下文（同步/异步节点共用）"""
     current_beats = state.get("current_beats", "")
-    world_bible = state.get("world_bible", {})
-    characters = world_bible.get("characters", {})
+    # 角色设定与状态取自 bible digest（每章只在 memory 节点更新后重新生成），
+    # 按本章场景中出现的角色排序：各段落 prompt 的前缀保持一致，便于前缀缓存
+    digest = get_bible_digest(state)
+    ranked = rank_characters(digest["characters"], current_beats)
+    characters = {name: digest["characters"][name] for name in ranked}
     chapter_index = state.get('current_chapter_index', 1)
     config = state.get('config', {})
     iteration = state.get("iteration", 0)
@@ -119,8 +162,8 @@ def writer_node(state: NovelState) -> NovelState:
         print(f"  🔄 修订版本 (第 {iteration} 次)")
         print(f"  📝 Critic 反馈: {critic_feedback[:100]}...")
 
-    # 提取角色当前状态（完整版功能）
-    character_states = extract_character_states(characters)
+    # 角色当前状态（完整版功能）
+    character_states = {name: digest["states"][name] for name in ranked if name in digest["states"]}
     if character_states:
         print(f"  👥 角色状态追踪: {len(character_states)} 个主要角色")
 
@@ -132,31 +175,46 @@ def writer_node(state: NovelState) -> NovelState:
     print(f"  📝 章节 {chapter_index} - 高质量分段生成")
     print(f"     风格: {tone}")
 
-    # 拆分场景
-    beat_lines = [line.strip() for line in current_beats.split('\n') if line.strip()]
-
-    if len(beat_lines) <= 2:
-        print(f"  📌 场景较少，单段生成")
-        return generate_single_quality(current_beats, characters, chapter_index, state, tone, focus_elements)
-
-    print(f"  📌 分 {len(beat_lines)} 段生成")
-
-    segments = []
-    for i, beat in enumerate(beat_lines, 1):
-        print(f"\n  🔸 第 {i}/{len(beat_lines)} 段...")
+    # 世界设定区块只在开启前缀缓存时放进段落前缀（单独预算，各段落命中缓存时按 1/10 计费）
+    world_context = ""
+    if prompt_cache.caching_enabled():
+        world_context = build_world_context(digest, budget_for("writer_world", config))
+
+    return {
+        "current_beats": current_beats,
+        # 拆分场景
+        "beat_lines": [line.strip() for line in current_beats.split('\n') if line.strip()],
+        "characters": characters,
+        "chapter_index": chapter_index,
+        "generation": config.get('generation', {}),
+        "critic_feedback": critic_feedback,
+        "character_states": character_states,
+        "tone": tone,
+        "focus_elements": focus_elements,
+        "context_budget": budget_for("writer", config),
+        "world_context": world_context,
+    }
 
-        segment = generate_one_segment(
-            beat, i, len(beat_lines), characters,
-            "\n\n".join(segments), tone, focus_elements, critic_feedback, character_states
-        )
-
-        if segment:
-            segments.append(segment)
-            print(f"     ✅ 完成 ({len(segment)} 字符)")
-        else:
-            print(f"     ⚠️  失败")
-            segments.append(f"\n[场景 {i}: {beat}]\n")
 
+def build_world_context(digest, budget):
+    """段落前缀中的世界设定（伏笔 > 世界事件 > 基础设定），限制在 budget 个 token 内"""
+    packed, _ = pack_sections([
+        PromptSection("threads", digest.get("threads", []), PRIORITY_THREADS),
+        PromptSection("events", digest.get("events", []), PRIORITY_RECENT, keep="tail"),
+        PromptSection("setting", digest.get("setting", []), PRIORITY_BACKGROUND),
+    ], budget)
+    parts = []
+    if packed["setting"]:
+        parts.append(f"【世界设定】\n{packed['setting']}")
+    if packed["events"]:
+        parts.append(f"【近期世界事件】\n{packed['events']}")
+    if packed["threads"]:
+        parts.append(f"【未回收伏笔】\n{packed['threads']}")
+    return "\n\n".join(parts)
+
+
+def finish_chapter(chapter_index, segments):
+    """拼接段落并做质量检查，返回完整章节草稿"""
     full_draft = f"第 {chapter_index} 章\n\n" + "\n\n".join(segments)
 
     # 质量检查
@@ -167,6 +225,57 @@ def writer_node(state: NovelState) -> NovelState:
             print(f"     - {issue}")
 
     print(f"\n  ✅ 章节完成！{len(full_draft)} 字符")
+    return full_draft
+
+
+def append_segment(segments, num, beat, segment):
+    """记录顺序生成的段落（失败时保留场景占位）"""
+    if segment:
+        segments.append(segment)
+        print(f"     ✅ 完成 ({len(segment)} 字符)")
+    else:
+        print(f"     ⚠️  失败")
+        segments.append(f"\n[场景 {num}: {beat}]\n")
+
+
+def writer_node(state: NovelState) -> NovelState:
+    """
+    High quality Writer Node with segmented generation.
+    完整版：利用角色历史状态确保一致性
+    """
+    print("--- WRITER NODE ---")
+
+    w = prepare_writer_inputs(state)
+    beat_lines = w["beat_lines"]
+    chapter_index = w["chapter_index"]
+
+    if len(beat_lines) <= 2:
+        print(f"  📌 场景较少，单段生成")
+        return generate_single_quality(w["current_beats"], w["characters"], chapter_index, state, w["tone"], w["focus_elements"])
+
+    if w["generation"].get('parallel_segments', False):
+        # 🔧 并行模式：所有场景同时起草，再统一做衔接润色
+        print(f"  📌 分 {len(beat_lines)} 段并行生成")
+        segments = generate_segments_parallel(
+            beat_lines, w["characters"], state, w["tone"], w["focus_elements"],
+            w["critic_feedback"], w["character_states"],
+            max_workers=w["generation"].get('segment_workers', 4), world_context=w["world_context"]
+        )
+    else:
+        print(f"  📌 分 {len(beat_lines)} 段生成")
+
+        segments = []
+        for i, beat in enumerate(beat_lines, 1):
+            print(f"\n  🔸 第 {i}/{len(beat_lines)} 段...")
+
+            segment = generate_one_segment(
+                beat, i, len(beat_lines), w["characters"],
+                "\n\n".join(segments), w["tone"], w["focus_elements"], w["critic_feedback"], w["character_states"],
+                context_budget=w["context_budget"], world_context=w["world_context"]
+            )
+            append_segment(segments, i, beat, segment)
+
+    full_draft = finish_chapter(chapter_index, segments)
 
     # 💾 立即保存章节到文件
     save_chapter_to_file(chapter_index, full_draft, state)
@@ -174,13 +283,282 @@ def writer_node(state: NovelState) -> NovelState:
     return {"draft": full_draft, "iteration": state.get("iteration", 0) + 1}
 
 
-def generate_one_segment(beat, num, total, characters, prev_content, tone, focus, critic_feedback="", character_states=None):
-    """生成单个段落（完整版：考虑角色状态）"""
+async def awriter_node(state: NovelState) -> NovelState:
+    """
+    Writer Node 的异步版本（--async 模式）
+    LLM 调用走 ainvoke，文件保存放到线程中，不阻塞事件循环
+    """
+    print("--- WRITER NODE (async) ---")
+
+    w = prepare_writer_inputs(state)
+    beat_lines = w["beat_lines"]
+    chapter_index = w["chapter_index"]
+
+    if len(beat_lines) <= 2:
+        print(f"  📌 场景较少，单段生成")
+        return await agenerate_single_quality(w["current_beats"], w["characters"], chapter_index, state, w["tone"], w["focus_elements"])
+
+    if w["generation"].get('parallel_segments', False):
+        print(f"  📌 分 {len(beat_lines)} 段并行生成")
+        segments = await agenerate_segments_parallel(
+            beat_lines, w["characters"], state, w["tone"], w["focus_elements"],
+            w["critic_feedback"], w["character_states"],
+            max_workers=w["generation"].get('segment_workers', 4), world_context=w["world_context"]
+        )
+    else:
+        print(f"  📌 分 {len(beat_lines)} 段生成")
+
+        segments = []
+        for i, beat in enumerate(beat_lines, 1):
+            print(f"\n  🔸 第 {i}/{len(beat_lines)} 段...")
+
+            segment = await agenerate_one_segment(
+                beat, i, len(beat_lines), w["characters"],
+                "\n\n".join(segments), w["tone"], w["focus_elements"], w["critic_feedback"], w["character_states"],
+                context_budget=w["context_budget"], world_context=w["world_context"]
+            )
+            append_segment(segments, i, beat, segment)
+
+    full_draft = finish_chapter(chapter_index, segments)
+
+    # 💾 立即保存章节到文件（标题生成是同步调用，放到线程中执行）
+    await asyncio.to_thread(save_chapter_to_file, chapter_index, full_draft, state, True)
+
+    return {"draft": full_draft, "iteration": state.get("iteration", 0) + 1}
+
+
+def parallel_segment_args(beat_lines, num, prev_tail):
+    """并行模式下单段的前文参数：第一段衔接上一章结尾，其余段落只看到前序场景大纲"""
+    prev_content = prev_tail if num == 1 else ""
+    beat_context = "\n".join(beat_lines[:num - 1])
+    return prev_content, beat_context
+
+
+def collect_parallel_segments(beat_lines, results):
+    """整理并行起草结果，返回 (segments, drafted)"""
+    total = len(beat_lines)
+    segments = []
+    drafted = []
+    for i, (beat, segment) in enumerate(zip(beat_lines, results), 1):
+        if segment:
+            segments.append(segment)
+            drafted.append(True)
+            print(f"     ✅ 第 {i}/{total} 段完成 ({len(segment)} 字符)")
+        else:
+            segments.append(f"\n[场景 {i}: {beat}]\n")
+            drafted.append(False)
+            print(f"     ⚠️  第 {i}/{total} 段失败")
+    return segments, drafted
+
+
+def generate_segments_parallel(beat_lines, characters, state, tone, focus, critic_feedback="", character_states=None, max_workers=4,
+                               world_context=""):
+    """
+    并行生成所有场景段落
+
+    每段只依赖场景大纲和上一章结尾，不再等待前一段完成；
+    起草结束后用一次轻量调用生成段落间的过渡句。
+
+    Returns:
+        list: 按场景顺序排列的段落（含过渡句）
+    """
+    chapter_index = state.get('current_chapter_index', 1)
+    total = len(beat_lines)
+    context_budget = budget_for("writer", state.get('config'))
+
+    prev_tail = load_previous_chapter_tail(state, chapter_index - 1)
+    if prev_tail:
+        print(f"  🔗 上一章结尾: {len(prev_tail)} 字符")
+
+    def draft(num, beat):
+        prev_content, beat_context = parallel_segment_args(beat_lines, num, prev_tail)
+        return generate_one_segment(
+            beat, num, total, characters, prev_content, tone, focus,
+            critic_feedback, character_states, beat_context=beat_context, context_budget=context_budget,
+                world_context=world_context
+        )
+
+    start_time = time.time()
+    workers = max(1, min(max_workers, total))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(draft, i, beat) for i, beat in enumerate(beat_lines, 1)]
+        results = [future.result() for future in futures]
+
+    segments, drafted = collect_parallel_segments(beat_lines, results)
+
+    print(f"  ⏱️  并行起草耗时 {time.time() - start_time:.1f}s ({workers} 路并发)")
+
+    return smooth_transitions(segments, drafted)
+
+
+async def agenerate_segments_parallel(beat_lines, characters, state, tone, focus, critic_feedback="", character_states=None, max_workers=4,
+                                      world_context=""):
+    """generate_segments_parallel 的异步版本（信号量限制并发数）"""
+    chapter_index = state.get('current_chapter_index', 1)
+    total = len(beat_lines)
+    context_budget = budget_for("writer", state.get('config'))
+
+    prev_tail = await asyncio.to_thread(load_previous_chapter_tail, state, chapter_index - 1)
+    if prev_tail:
+        print(f"  🔗 上一章结尾: {len(prev_tail)} 字符")
+
+    workers = max(1, min(max_workers, total))
+    semaphore = asyncio.Semaphore(workers)
+
+    async def draft(num, beat):
+        prev_content, beat_context = parallel_segment_args(beat_lines, num, prev_tail)
+        async with semaphore:
+            return await agenerate_one_segment(
+                beat, num, total, characters, prev_content, tone, focus,
+                critic_feedback, character_states, beat_context=beat_context, context_budget=context_budget,
+                world_context=world_context
+            )
+
+    start_time = time.time()
+    results = await asyncio.gather(*[draft(i, beat) for i, beat in enumerate(beat_lines, 1)])
+
+    segments, drafted = collect_parallel_segments(beat_lines, results)
+
+    print(f"  ⏱️  并行起草耗时 {time.time() - start_time:.1f}s ({workers} 路并发)")
+
+    return await asmooth_transitions(segments, drafted)
+
+
+def find_junctions(segments, drafted=None):
+    """找出前后两段都起草成功的衔接处"""
+    if drafted is None:
+        drafted = [True] * len(segments)
+
+    return [
+        i for i in range(len(segments) - 1)
+        if drafted[i] and drafted[i + 1]
+    ]
+
+
+def build_transition_prompt(segments, junctions):
+    """构建衔接润色 prompt"""
+    junction_text = "\n\n".join([
+        f"【衔接{n}】\n上段结尾：{segments[i][-150:]}\n下段开头：{segments[i + 1][:150]}"
+        for n, i in enumerate(junctions, 1)
+    ])
+
+    return f"""你是小说编辑。以下段落由不同作者并行写成，需要在衔接处补充过渡。
+
+{junction_text}
+
+【任务】
+为每个衔接处写一句过渡（15-40字），让上段结尾自然过渡到下段开头。
+- 不要重复上下段已有的内容
+- 如果已经衔接自然，输出"无"
+
+【输出格式】
+衔接1: 过渡句
+衔接2: 过渡句
+
+直接输出，不要解释。"""
+
+
+def apply_transitions(segments, junctions, response_text):
+    """解析过渡句并插入到对应衔接处"""
+    bridges = {}
+    for line in response_text.strip().split('\n'):
+        match = re.match(r'\s*衔接\s*(\d+)\s*[:：]\s*(.+)', line)
+        if match:
+            bridges[int(match.group(1))] = match.group(2).strip()
+
+    stitched = []
+    added = 0
+    junction_bridges = {i: bridges.get(n, "") for n, i in enumerate(junctions, 1)}
+    for i, segment in enumerate(segments):
+        stitched.append(segment)
+        bridge = junction_bridges.get(i, "")
+        if bridge and bridge not in ('无', '"无"'):
+            stitched.append(bridge)
+            added += 1
+
+    print(f"  🧵 衔接润色: 插入 {added} 处过渡")
+    return stitched
+
+
+def get_transition_llm():
+    return get_llm(
+        temperature=0.5,
+        timeout=45.0,
+        max_retries=1,
+        max_tokens=800
+    )
+
+
+def smooth_transitions(segments, drafted=None):
+    """
+    衔接润色：一次调用为相邻段落生成过渡句
+
+    只发送每个衔接处的上段结尾和下段开头，输出也只有过渡句，
+    因此成本远低于重写全文。失败时原样返回。
+    """
+    junctions = find_junctions(segments, drafted)
+    if not junctions:
+        return segments
+
+    try:
+        response = get_transition_llm().invoke([HumanMessage(content=build_transition_prompt(segments, junctions))])
+    except Exception as e:
+        print(f"  ⚠️  衔接润色失败: {str(e)[:40]}")
+        return segments
+
+    return apply_transitions(segments, junctions, response.content)
+
+
+async def asmooth_transitions(segments, drafted=None):
+    """smooth_transitions 的异步版本"""
+    junctions = find_junctions(segments, drafted)
+    if not junctions:
+        return segments
+
+    try:
+        response = await get_transition_llm().ainvoke([HumanMessage(content=build_transition_prompt(segments, junctions))])
+    except Exception as e:
+        print(f"  ⚠️  衔接润色失败: {str(e)[:40]}")
+        return segments
+
+    return apply_transitions(segments, junctions, response.content)
+
+
+# 段落 prompt 中前文/前序场景（可变后缀）占用的预算，其余预算留给同一章内不变的前缀
+SEGMENT_SUFFIX_BUDGET = 400
+
+
+def build_segment_prompt(beat, num, total, characters, prev_content, tone, focus, critic_feedback="", character_states=None, beat_context="", context_budget=None,
+                         world_context=""):
+    """
+    构建单个段落的 prompt（完整版：考虑角色状态；上下文区块受 context_budget 个 token 限制）
+
+    同一章各段落共用的部分（世界设定、角色、状态、风格、编辑反馈、写作要求）放在前面作为稳定前缀，
+    前文和当前场景放在后面；开启 LLM_PROMPT_CACHING 时前缀打缓存标记，各段落复用。
+    world_context（build_world_context）不占 context_budget，未开启缓存时为空。
+
+    Returns:
+        str | list: HumanMessage 的内容
+    """
 
     if character_states is None:
         character_states = {}
-
-    context = prev_content[-600:] if len(prev_content) > 600 else prev_content
+    budget = context_budget or budget_for("writer")
+
+    # 前缀只依赖章节级输入（角色顺序已在 prepare_writer_inputs 按本章场景排好），各段落完全一致
+    stable, _ = pack_sections([
+        PromptSection("feedback", critic_feedback, PRIORITY_FEEDBACK, max_tokens=120),
+        PromptSection("states", [f"- {name}: {text}" for name, text in character_states.items()],
+                      PRIORITY_CHARACTER_STATES, max_tokens=180, item_max=50),
+        PromptSection("characters", format_characters(characters), PRIORITY_BACKGROUND, max_tokens=220),
+    ], max(0, budget - SEGMENT_SUFFIX_BUDGET))
+
+    # 后缀：前文衔接（并行模式下非首段只有前序场景大纲）
+    variable, _ = pack_sections([
+        PromptSection("prev", prev_content, PRIORITY_BEATS, keep="tail"),
+        PromptSection("beat_context", beat_context.split("\n") if beat_context else [], PRIORITY_RECENT, keep="tail"),
+    ], SEGMENT_SUFFIX_BUDGET)
 
     # 风格指导
     tones = {
@@ -210,27 +588,29 @@ def generate_one_segment(beat, num, total, characters, prev_content, tone, focus
     # 连贯提示
     connect_hint = '自然衔接前文' if num > 1 else '开头引人入胜'
 
+    if variable["prev"]:
+        context_block = '【前文】' + variable["prev"]
+    elif variable["beat_context"]:
+        context_block = f"【前序场景】（已由其他段落写出，本段紧接其后）\n{variable['beat_context']}"
+    else:
+        context_block = '【章节开头】'
+
     # Critic 反馈提示
     critic_hint = ""
-    if critic_feedback:
-        critic_hint = f"\n\n【⚠️ 编辑反馈（需要改进）】\n{critic_feedback[:200]}\n请在本次写作中避免上述问题。"
+    if stable["feedback"]:
+        critic_hint = f"\n\n【⚠️ 编辑反馈（需要改进）】\n{stable['feedback']}\n请在本次写作中避免上述问题。"
 
     # 角色状态提示（完整版功能）
     character_state_hint = ""
-    if character_states:
-        state_lines = [f"- {name}: {state}" for name, state in character_states.items()]
-        character_state_hint = f"\n\n【角色当前状态】\n" + "\n".join(state_lines) + "\n请确保角色行为符合当前状态。"
-
-    # 构建 prompt
-    prompt = f"""你是专业小说作家。
+    if stable["states"]:
+        character_state_hint = f"\n\n【角色当前状态】\n{stable['states']}\n请确保角色行为符合当前状态。"
 
-【角色基本信息】
-{json.dumps(characters, indent=2, ensure_ascii=False)[:400]}{character_state_hint}
+    world_block = f"{world_context}\n\n" if world_context else ""
 
-{'【前文】' + context if context else '【章节开头】'}
+    prefix = f"""你是专业小说作家。
 
-【当前场景要求】（第{num}/{total}段）
-{beat}
+{world_block}【角色基本信息】
+{stable["characters"]}{character_state_hint}
 
 【风格】{style_hint}
 【重点】{focus_text}{critic_hint}
@@ -241,7 +621,6 @@ def generate_one_segment(beat, num, total, characters, prev_content, tone, focus
 3. 细节: 感官描写丰富
 4. 对话: 符合角色性格
 5. 语言: 简体中文，避免陈词滥调
-6. 连贯: {connect_hint}
 
 【关键原则】
 ⚠️ 重要: 本段只写【当前场景要求】中描述的内容
@@ -256,20 +635,62 @@ def generate_one_segment(beat, num, total, characters, prev_content, tone, focus
 - 性格: 通过行动展现，不要说明
 - 严禁: 偏离当前场景大纲
 
+"""
+
+    suffix = f"""{context_block}
+
+【当前场景要求】（第{num}/{total}段）
+{beat}
+
+【连贯】{connect_hint}
+
 直接输出段落正文。"""
 
+    return prompt_cache.message_content(prefix, suffix)
+
+
+def get_writer_llm():
+    return get_llm(
+        temperature=0.85,
+        timeout=75.0,
+        max_retries=0
+    )
+
+
+def generate_one_segment(beat, num, total, characters, prev_content, tone, focus, critic_feedback="", character_states=None, beat_context="", context_budget=None,
+                         world_context=""):
+    """生成单个段落（完整版：考虑角色状态）"""
+    prompt = build_segment_prompt(beat, num, total, characters, prev_content, tone, focus, critic_feedback, character_states, beat_context, context_budget,
+                                  world_context)
+
     for attempt in range(3):
         try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.85,
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=75.0,
-                max_retries=0
-            )
+            response = get_writer_llm().invoke([HumanMessage(content=prompt)])
+            text = response.content.strip()
+
+            if len(text) < 200:
+                if attempt < 2:
+                    continue
+
+            return text
+
+        except Exception as e:
+            if attempt < 2:
+                print(f"       ⏳ 重试 ({attempt+2}/3)...")
+                retry_wait(attempt)
+
+    return None
+
 
-            response = llm.invoke([HumanMessage(content=prompt)])
+async def agenerate_one_segment(beat, num, total, characters, prev_content, tone, focus, critic_feedback="", character_states=None, beat_context="", context_budget=None,
+                                world_context=""):
+    """generate_one_segment 的异步版本"""
+    prompt = build_segment_prompt(beat, num, total, characters, prev_content, tone, focus, critic_feedback, character_states, beat_context, context_budget,
+                                  world_context)
+
+    for attempt in range(3):
+        try:
+            response = await get_writer_llm().ainvoke([HumanMessage(content=prompt)])
             text = response.content.strip()
 
             if len(text) < 200:
@@ -280,15 +701,14 @@ def generate_one_segment(beat, num, total, characters, prev_content, tone, focus
 
         except Exception as e:
             if attempt < 2:
-                wait = (attempt + 1) * 4
                 print(f"       ⏳ 重试 ({attempt+2}/3)...")
-                time.sleep(wait)
+                await aretry_wait(attempt)
 
     return None
 
 
-def generate_single_quality(beats, characters, idx, state, tone, focus):
-    """单段高质量生成"""
+def build_single_prompt(beats, characters, tone, focus, context_budget=None):
+    """构建单段高质量生成的 prompt（角色设定受 context_budget 个 token 限制）"""
 
     tones = {
         'serious': '严肃正式',
@@ -301,10 +721,14 @@ def generate_single_quality(beats, characters, idx, state, tone, focus):
 
     focus_text = '、'.join(focus) if focus else '场景细节'
 
-    prompt = f"""你是专业小说作家。
+    context, _ = pack_sections([
+        PromptSection("characters", format_characters(characters, beats), PRIORITY_BACKGROUND, max_tokens=300),
+    ], context_budget or budget_for("writer"))
+
+    return f"""你是专业小说作家。
 
 【角色】
-{json.dumps(characters, indent=2, ensure_ascii=False)[:500]}
+{context["characters"]}
 
 【大纲】
 {beats}
@@ -324,18 +748,14 @@ def generate_single_quality(beats, characters, idx, state, tone, focus):
 
 直接输出正文。"""
 
+
+def generate_single_quality(beats, characters, idx, state, tone, focus):
+    """单段高质量生成"""
+    prompt = build_single_prompt(beats, characters, tone, focus, budget_for("writer", state.get('config')))
+
     for attempt in range(3):
         try:
-            llm = ChatAnthropic(
-                model="claude-sonnet-4-5-20250929",
-                temperature=0.85,
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-                anthropic_api_url=os.getenv("ANTHROPIC_BASE_URL"),
-                timeout=75.0,
-                max_retries=0
-            )
-
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = get_writer_llm().invoke([HumanMessage(content=prompt)])
             draft = f"第 {idx} 章\n\n" + response.content.strip()
 
             if len(response.content) < 500:
@@ -352,7 +772,36 @@ def generate_single_quality(beats, characters, idx, state, tone, focus):
         except:
             if attempt < 2:
                 print(f"     ⏳ 重试...")
-                time.sleep((attempt + 1) * 5)
+                retry_wait(attempt)
+
+    fallback = f"第 {idx} 章\n\n{beats}\n\n（生成失败）"
+    return {"draft": fallback, "iteration": state.get("iteration", 0) + 1}
+
+
+async def agenerate_single_quality(beats, characters, idx, state, tone, focus):
+    """generate_single_quality 的异步版本"""
+    prompt = build_single_prompt(beats, characters, tone, focus, budget_for("writer", state.get('config')))
+
+    for attempt in range(3):
+        try:
+            response = await get_writer_llm().ainvoke([HumanMessage(content=prompt)])
+            draft = f"第 {idx} 章\n\n" + response.content.strip()
+
+            if len(response.content) < 500:
+                if attempt < 2:
+                    continue
+
+            print(f"     ✅ 完成 ({len(draft)} 字符)")
+
+            # 💾 立即保存章节到文件
+            await asyncio.to_thread(save_chapter_to_file, idx, draft, state, True)
+
+            return {"draft": draft, "iteration": state.get("iteration", 0) + 1}
+
+        except:
+            if attempt < 2:
+                print(f"     ⏳ 重试...")
+                await aretry_wait(attempt)
 
     fallback = f"第 {idx} 章\n\n{beats}\n\n（生成失败）"
     return {"draft": fallback, "iteration": state.get("iteration", 0) + 1}
@@ -375,20 +824,3 @@ def check_quality(text):
         issues.append("缺少对话")
 
     return issues
-
-def extract_character_states(characters):
-    """提取角色当前状态（完整版功能）"""
-    states = {}
-    for name, char_data in list(characters.items())[:3]:  # 最多3个主要角色
-        # 🔧 Bug #12修复: 应该使用recent_notes而不是notes
-        notes = char_data.get("recent_notes", char_data.get("notes", []))
-        if notes:
-            # 获取最新状态
-            latest_state = notes[-1] if isinstance(notes[-1], str) else str(notes[-1])
-            states[name] = latest_state[:100]  # 限制长度
-        else:
-            # 使用基本信息
-            personality = char_data.get("personality", [])
-            if personality:
-                states[name] = f"性格: {', '.join(personality[:3])}"
-    return states
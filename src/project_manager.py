@@ -3,14 +3,40 @@
 - 为每个小说创建独立的工作空间
 - 管理配置文件、数据库、章节文件
 - 支持切换项目和断点续传
+
+项目索引保存在 projects/projects.db（SQLite），进度更新是单条 UPDATE，
+多个进程/线程并发生成时互不覆盖。旧版 projects_index.json 首次打开时自动迁移，
+迁移后原文件重命名为 projects_index.json.bak。
+
+每个项目的汇总数据（已写章节数、总字数、最近吞吐量）在写入章节时增量维护，
+状态查询（query_projects / print_projects_table）只读注册表，不扫描项目目录。
 """
 
 import os
 import json
 import yaml
+import sqlite3
+from contextlib import closing
 from pathlib import Path
 from datetime import datetime
 
+from src.utils.manuscript_store import get_store, has_store
+
+PROJECT_COLUMNS = (
+    "project_id", "title", "created_at", "updated_at",
+    "config_file", "db_file", "manuscript_dir", "bible_dir",
+    "target_chapters", "current_chapter", "status",
+)
+
+# 增量维护的汇总列（旧注册表打开时自动补列并回填）
+AGGREGATE_COLUMNS = {
+    "chapters_written": "INTEGER NOT NULL DEFAULT 0",
+    "total_characters": "INTEGER NOT NULL DEFAULT 0",
+    "last_throughput": "REAL",
+}
+
+QUERY_ORDERS = ("updated_at", "created_at", "current_chapter", "total_characters", "title")
+
 
 class ProjectManager:
     """小说项目管理器"""
@@ -20,27 +46,248 @@ class ProjectManager:
         self.projects_dir = self.base_dir / "projects"
         self.projects_dir.mkdir(exist_ok=True)
 
-        self.index_file = self.projects_dir / "projects_index.json"
+        self.registry_file = self.projects_dir / "projects.db"
+        self.index_file = self.projects_dir / "projects_index.json"  # 旧版索引，仅用于迁移
         self.current_project_file = self.projects_dir / "current_project.txt"
 
-    def list_projects(self):
-        """列出所有项目"""
-        if not self.index_file.exists():
-            return {}
+        self._init_registry()
+
+    # ---------- 注册表 ----------
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.registry_file), timeout=10.0)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_registry(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS projects (
+                    project_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    config_file TEXT NOT NULL,
+                    db_file TEXT NOT NULL,
+                    manuscript_dir TEXT NOT NULL,
+                    bible_dir TEXT NOT NULL,
+                    target_chapters INTEGER NOT NULL DEFAULT 1,
+                    current_chapter INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'created'
+                )
+            """)
+            # 按状态过滤 + 按更新时间排序分页走同一个索引
+            conn.execute("DROP INDEX IF EXISTS idx_projects_status")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_status_updated ON projects(status, updated_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS project_throughput (
+                    project_id TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    chapters_per_hour REAL NOT NULL,
+                    PRIMARY KEY (project_id, mode)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS project_chapters (
+                    project_id TEXT NOT NULL,
+                    chapter_index INTEGER NOT NULL,
+                    characters INTEGER NOT NULL,
+                    PRIMARY KEY (project_id, chapter_index)
+                )
+            """)
+
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(projects)")}
+            missing = [column for column in AGGREGATE_COLUMNS if column not in existing]
+            for column in missing:
+                conn.execute(f"ALTER TABLE projects ADD COLUMN {column} {AGGREGATE_COLUMNS[column]}")
+
+        if missing:
+            self._backfill_aggregates()
+
+        if self.index_file.exists():
+            self._migrate_json_index()
+
+    def _migrate_json_index(self):
+        """把旧版 projects_index.json 导入注册表（已存在的项目不覆盖）"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                projects = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  旧项目索引读取失败，跳过迁移: {e}")
+            return
 
-        with open(self.index_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with closing(self._connect()) as conn, conn:
+            for project_id, info in projects.items():
+                row = {column: info.get(column) for column in PROJECT_COLUMNS}
+                row["project_id"] = project_id
+                row["title"] = row["title"] or project_id
+                row["created_at"] = row["created_at"] or datetime.now().isoformat()
+                row["updated_at"] = row["updated_at"] or row["created_at"]
+                row["target_chapters"] = row["target_chapters"] or 1
+                row["current_chapter"] = row["current_chapter"] or 0
+                row["status"] = row["status"] or "created"
+
+                conn.execute(
+                    f"INSERT OR IGNORE INTO projects ({', '.join(PROJECT_COLUMNS)}) "
+                    f"VALUES ({', '.join(':' + c for c in PROJECT_COLUMNS)})",
+                    row
+                )
+                for mode, cph in (info.get("throughput") or {}).items():
+                    conn.execute(
+                        "INSERT OR IGNORE INTO project_throughput (project_id, mode, chapters_per_hour) VALUES (?, ?, ?)",
+                        (project_id, mode, cph)
+                    )
+
+        self._backfill_aggregates(list(projects.keys()))
+
+        # 多个进程同时迁移时只有一个能改名成功，其余进程的 INSERT OR IGNORE 也不会重复导入
+        try:
+            os.replace(self.index_file, self.index_file.with_suffix('.json.bak'))
+            print(f"📦 项目索引已迁移到 {self.registry_file.name}（{len(projects)} 个项目）")
+        except FileNotFoundError:
+            pass
+
+    def _backfill_aggregates(self, project_ids=None):
+        """一次性从稿件目录统计汇总数据（仅在补列/迁移时执行，之后由写入时增量维护）"""
+        with closing(self._connect()) as conn, conn:
+            if project_ids is None:
+                rows = conn.execute("SELECT project_id, manuscript_dir FROM projects").fetchall()
+            else:
+                placeholders = ", ".join("?" for _ in project_ids)
+                rows = conn.execute(
+                    f"SELECT project_id, manuscript_dir FROM projects WHERE project_id IN ({placeholders})",
+                    list(project_ids)
+                ).fetchall()
+
+            for project_id, manuscript_dir in rows:
+                manuscript = Path(manuscript_dir)
+                chapters = []
+                if has_store(manuscript):
+                    for index, chunk in get_store(manuscript).iter_chapter_bytes():
+                        chapters.append((project_id, index, len(str(chunk, 'utf-8'))))
+                elif manuscript.is_dir():
+                    for chapter_file in manuscript.glob("chapter_*.txt"):
+                        try:
+                            index = int(chapter_file.stem.split("_")[1])
+                            chapters.append((project_id, index, len(chapter_file.read_text(encoding='utf-8'))))
+                        except (ValueError, IndexError, OSError):
+                            continue
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO project_chapters (project_id, chapter_index, characters) VALUES (?, ?, ?)",
+                    chapters
+                )
+                conn.execute(
+                    """
+                    UPDATE projects SET
+                        chapters_written = (SELECT COUNT(*) FROM project_chapters WHERE project_id = :id),
+                        total_characters = (SELECT COALESCE(SUM(characters), 0) FROM project_chapters WHERE project_id = :id),
+                        last_throughput = (SELECT chapters_per_hour FROM project_throughput WHERE project_id = :id
+                                           ORDER BY mode LIMIT 1)
+                    WHERE project_id = :id
+                    """,
+                    {"id": project_id}
+                )
+
+    def _row_to_info(self, row, throughput=None):
+        info = dict(row)
+        if throughput:
+            info["throughput"] = throughput
+        return info
+
+    def _load_throughput(self, conn, project_ids=None):
+        if project_ids is None:
+            rows = conn.execute("SELECT project_id, mode, chapters_per_hour FROM project_throughput")
+        else:
+            placeholders = ", ".join("?" for _ in project_ids)
+            rows = conn.execute(
+                f"SELECT project_id, mode, chapters_per_hour FROM project_throughput WHERE project_id IN ({placeholders})",
+                list(project_ids)
+            )
+
+        throughput = {}
+        for project_id, mode, cph in rows:
+            throughput.setdefault(project_id, {})[mode] = cph
+        return throughput
+
+    # ---------- 查询 ----------
+
+    def list_projects(self):
+        """列出所有项目（按创建时间排序）"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM projects ORDER BY created_at, project_id").fetchall()
+            throughput = self._load_throughput(conn)
+
+        return {row["project_id"]: self._row_to_info(row, throughput.get(row["project_id"])) for row in rows}
+
+    def get_project(self, project_id):
+        """获取单个项目信息，不存在时返回 None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+            if row is None:
+                return None
+            throughput = self._load_throughput(conn, [project_id])
+
+        return self._row_to_info(row, throughput.get(project_id))
+
+    def query_projects(self, status=None, order_by="updated_at", descending=True, limit=20, offset=0):
+        """
+        按条件分页查询项目（走 status / updated_at 索引，不加载全部项目）
+
+        Args:
+            status: 状态过滤（created / in_progress / completed），可传列表；None 表示全部
+            order_by: 排序字段，见 QUERY_ORDERS
+            descending: 是否倒序
+            limit: 每页数量（None 表示不分页）
+            offset: 跳过的数量
+
+        Returns:
+            tuple: (项目信息列表, 符合条件的总数)
+        """
+        if order_by not in QUERY_ORDERS:
+            raise ValueError(f"不支持的排序字段: {order_by}（可选: {', '.join(QUERY_ORDERS)}）")
+
+        where, params = "", []
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            where = f"WHERE status IN ({', '.join('?' for _ in statuses)})"
+            params = statuses
+
+        direction = "DESC" if descending else "ASC"
+        page = ""
+        if limit is not None:
+            page = " LIMIT ? OFFSET ?"
+
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM projects {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM projects {where} ORDER BY {order_by} {direction}, project_id{page}",
+                params + ([limit, offset] if limit is not None else [])
+            ).fetchall()
+            throughput = self._load_throughput(conn, [row["project_id"] for row in rows]) if rows else {}
+
+        return [self._row_to_info(row, throughput.get(row["project_id"])) for row in rows], total
+
+    def count_projects(self):
+        """
+        按状态统计项目数
+
+        Returns:
+            dict: {"created": 3, "in_progress": 2, "completed": 1}
+        """
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM projects GROUP BY status").fetchall())
 
     def get_current_project(self):
         """获取当前激活的项目"""
-        if not self.current_project_file.exists():
+        project_id = self.get_current_project_id()
+        if not project_id:
             return None
 
-        with open(self.current_project_file, 'r', encoding='utf-8') as f:
-            project_id = f.read().strip()
-
-        projects = self.list_projects()
-        return projects.get(project_id)
+        return self.get_project(project_id)
 
     def get_current_project_id(self):
         """仅获取当前项目ID（不含详细信息）"""
@@ -50,6 +297,8 @@ class ProjectManager:
         with open(self.current_project_file, 'r', encoding='utf-8') as f:
             return f.read().strip()
 
+    # ---------- 修改 ----------
+
     def create_project(self, config):
         """创建新项目"""
         novel_title = config['novel']['title']
@@ -58,12 +307,9 @@ class ProjectManager:
         safe_title = "".join(c for c in novel_title if c.isalnum() or c in (' ', '-', '_')).strip()
         safe_title = safe_title.replace(' ', '_')
 
-        # 检查是否已存在
-        projects = self.list_projects()
-
         # 生成唯一ID（如果重名，添加时间戳）
         project_id = safe_title
-        if project_id in projects:
+        if self.get_project(project_id) is not None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             project_id = f"{safe_title}_{timestamp}"
 
@@ -83,7 +329,7 @@ class ProjectManager:
         db_file = project_dir / "state.db"
 
         # 添加到项目索引
-        projects[project_id] = {
+        project = {
             "title": novel_title,
             "project_id": project_id,
             "created_at": datetime.now().isoformat(),
@@ -97,7 +343,12 @@ class ProjectManager:
             "status": "created"
         }
 
-        self._save_index(projects)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT INTO projects ({', '.join(PROJECT_COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in PROJECT_COLUMNS)})",
+                project
+            )
 
         # 设置为当前项目
         self.set_current_project(project_id)
@@ -108,46 +359,90 @@ class ProjectManager:
         print(f"   数据库: {db_file}")
         print(f"   稿件目录: {project_dir / 'manuscript'}")
 
-        return project_id, projects[project_id]
+        return project_id, project
 
     def set_current_project(self, project_id):
         """切换到指定项目"""
-        projects = self.list_projects()
+        project = self.get_project(project_id)
 
-        if project_id not in projects:
+        if project is None:
             raise ValueError(f"项目不存在: {project_id}")
 
         with open(self.current_project_file, 'w', encoding='utf-8') as f:
             f.write(project_id)
 
-        return projects[project_id]
-
-    def update_project_progress(self, project_id, current_chapter):
-        """更新项目进度"""
-        projects = self.list_projects()
-
-        if project_id in projects:
-            projects[project_id]["current_chapter"] = current_chapter
-            projects[project_id]["updated_at"] = datetime.now().isoformat()
-
-            # 更新状态
-            target = projects[project_id]["target_chapters"]
-            if current_chapter >= target:
-                projects[project_id]["status"] = "completed"
-            elif current_chapter > 0:
-                projects[project_id]["status"] = "in_progress"
-
-            self._save_index(projects)
+        return project
+
+    def update_project_progress(self, project_id, current_chapter, chapter_characters=None):
+        """
+        更新项目进度（单个事务，状态随进度一起更新）
+
+        Args:
+            chapter_characters: 本章字数；提供时同步更新汇总数据（同一章重写按差值修正）
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                UPDATE projects SET
+                    current_chapter = :chapter,
+                    updated_at = :now,
+                    status = CASE
+                        WHEN :chapter >= target_chapters THEN 'completed'
+                        WHEN :chapter > 0 THEN 'in_progress'
+                        ELSE status
+                    END
+                WHERE project_id = :project_id
+                """,
+                {"chapter": current_chapter, "now": datetime.now().isoformat(), "project_id": project_id}
+            )
+
+            if chapter_characters is not None:
+                previous = conn.execute(
+                    "SELECT characters FROM project_chapters WHERE project_id = ? AND chapter_index = ?",
+                    (project_id, current_chapter)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO project_chapters (project_id, chapter_index, characters) VALUES (?, ?, ?)",
+                    (project_id, current_chapter, chapter_characters)
+                )
+                conn.execute(
+                    "UPDATE projects SET chapters_written = chapters_written + ?, "
+                    "total_characters = total_characters + ? WHERE project_id = ?",
+                    (
+                        0 if previous else 1,
+                        chapter_characters - (previous["characters"] if previous else 0),
+                        project_id,
+                    )
+                )
+
+    def record_throughput(self, project_id, mode, chapters_per_hour):
+        """
+        记录最近一次运行的吞吐量（章/小时），按运行模式分别保存
+
+        Returns:
+            dict: 该项目各模式的吞吐量，如 {"sync": 8.2, "async": 11.5}
+        """
+        with closing(self._connect()) as conn, conn:
+            updated = conn.execute(
+                "UPDATE projects SET updated_at = ?, last_throughput = ? WHERE project_id = ?",
+                (datetime.now().isoformat(), round(chapters_per_hour, 2), project_id)
+            ).rowcount
+            if not updated:
+                return {}
+
+            conn.execute(
+                "INSERT OR REPLACE INTO project_throughput (project_id, mode, chapters_per_hour) VALUES (?, ?, ?)",
+                (project_id, mode, round(chapters_per_hour, 2))
+            )
+            return self._load_throughput(conn, [project_id]).get(project_id, {})
 
     def get_project_paths(self, project_id):
         """获取项目的所有路径"""
-        projects = self.list_projects()
+        project = self.get_project(project_id)
 
-        if project_id not in projects:
+        if project is None:
             raise ValueError(f"项目不存在: {project_id}")
 
-        project = projects[project_id]
-
         return {
             "config_file": project["config_file"],
             "db_file": project["db_file"],
@@ -157,9 +452,7 @@ class ProjectManager:
 
     def delete_project(self, project_id):
         """删除项目"""
-        projects = self.list_projects()
-
-        if project_id not in projects:
+        if self.get_project(project_id) is None:
             raise ValueError(f"项目不存在: {project_id}")
 
         # 删除项目目录
@@ -169,86 +462,91 @@ class ProjectManager:
             shutil.rmtree(project_dir)
 
         # 从索引中移除
-        del projects[project_id]
-        self._save_index(projects)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+            conn.execute("DELETE FROM project_throughput WHERE project_id = ?", (project_id,))
+            conn.execute("DELETE FROM project_chapters WHERE project_id = ?", (project_id,))
 
         # 如果是当前项目，清空当前项目标记
-        current = self.get_current_project()
-        if current and current["project_id"] == project_id:
+        if self.get_current_project_id() == project_id:
             if self.current_project_file.exists():
                 self.current_project_file.unlink()
 
         print(f"✅ 已删除项目: {project_id}")
 
-    def _save_index(self, projects):
-        """保存项目索引"""
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(projects, f, ensure_ascii=False, indent=2)
+    def print_projects_table(self, show_current_header=True, status=None, page=1, page_size=20):
+        """
+        打印项目列表（表格形式，按最近更新排序分页显示）
 
-    def print_projects_table(self, show_current_header=True):
-        """打印项目列表（表格形式）"""
-        projects = self.list_projects()
-
-        if not projects:
-            print("\n暂无项目")
-            return
+        Args:
+            status: 只显示该状态的项目（None 表示全部）
+            page: 页码（从 1 开始）
+            page_size: 每页项目数
+        """
+        page = max(1, page)
+        projects, total = self.query_projects(
+            status=status, order_by="updated_at", limit=page_size, offset=(page - 1) * page_size
+        )
 
         current = self.get_current_project()
         current_id = current["project_id"] if current else None
 
+        if not total and not current:
+            print("\n暂无项目")
+            return
+
         # 显示当前项目（独立区域）
         if show_current_header and current:
             print("\n" + "="*80)
             print("🎯 当前项目")
             print("="*80)
 
-            status_icon = {
-                "created": "📝",
-                "in_progress": "⏳",
-                "completed": "✅"
-            }.get(current["status"], "❓")
-
             progress = f"{current['current_chapter']}/{current['target_chapters']}"
             progress_pct = int((current['current_chapter'] / current['target_chapters']) * 100) if current['target_chapters'] > 0 else 0
 
-            # 格式化时间显示
-            updated_time = current['updated_at']
-            if 'T' in updated_time:
-                updated_time = updated_time.replace('T', ' ').split('.')[0]
-            if len(updated_time) > 19:
-                updated_time = updated_time[:19]
-
-            print(f"{status_icon} {current['title']}")
+            print(f"{self._status_icon(current['status'])} {current['title']}")
             print(f"   项目ID: {current_id}")
             print(f"   进度: {progress} 章 ({progress_pct}%)")
+            print(f"   字数: {current.get('total_characters', 0):,}（{current.get('chapters_written', 0)} 章已保存）")
+            if current.get('last_throughput'):
+                print(f"   最近吞吐量: {current['last_throughput']} 章/小时")
             print(f"   状态: {current['status']}")
-            print(f"   更新时间: {updated_time}")
+            print(f"   更新时间: {self._format_time(current['updated_at'])}")
             print()
 
-        # 显示所有项目列表
+        # 显示项目列表
         print("="*80)
-        print("📚 所有项目列表")
+        title = "📚 所有项目列表" if status is None else f"📚 项目列表（{status}）"
+        print(title)
         print("="*80)
 
-        for project_id, info in projects.items():
+        for info in projects:
+            project_id = info["project_id"]
             marker = "👉 " if project_id == current_id else "   "
-            status_icon = {
-                "created": "📝",
-                "in_progress": "⏳",
-                "completed": "✅"
-            }.get(info["status"], "❓")
 
             progress = f"{info['current_chapter']}/{info['target_chapters']}"
 
-            # 格式化时间显示（只显示日期和时间，不显示毫秒）
-            updated_time = info['updated_at']
-            if 'T' in updated_time:
-                updated_time = updated_time.replace('T', ' ').split('.')[0]
-            if len(updated_time) > 19:
-                updated_time = updated_time[:19]
-
-            print(f"{marker}{status_icon} {info['title']}")
+            print(f"{marker}{self._status_icon(info['status'])} {info['title']}")
             print(f"     ID: {project_id}")
-            print(f"     进度: {progress} 章")
-            print(f"     更新: {updated_time}")
+            print(f"     进度: {progress} 章  字数: {info.get('total_characters', 0):,}")
+            print(f"     更新: {self._format_time(info['updated_at'])}")
             print()
+
+        pages = max(1, (total + page_size - 1) // page_size)
+        if pages > 1:
+            print(f"第 {page}/{pages} 页，共 {total} 个项目")
+
+    @staticmethod
+    def _status_icon(status):
+        return {
+            "created": "📝",
+            "in_progress": "⏳",
+            "completed": "✅"
+        }.get(status, "❓")
+
+    @staticmethod
+    def _format_time(updated_time):
+        """只显示日期和时间，不显示毫秒"""
+        if 'T' in updated_time:
+            updated_time = updated_time.replace('T', ' ').split('.')[0]
+        return updated_time[:19]
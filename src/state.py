@@ -28,6 +28,7 @@ class NovelState(TypedDict):
 
     # === 章节生成字段（保持兼容） ===
     world_bible: Dict[str, Any]    # Global world settings (Characters, Worldbuilding, Plot Tracks)
+    bible_digest: Optional[Dict[str, Any]]  # world_bible 的逐行摘要（memory 节点更新 world_bible 时同步生成）
     chapters: List[Dict[str, Any]] # List of chapter summaries
     current_beats: str             # Current chapter beats/outline
     draft: str                     # Current chapter draft text
@@ -35,6 +36,9 @@ class NovelState(TypedDict):
     current_chapter_index: int     # Index of the chapter currently being written
     feedback: Optional[str]        # Feedback from the critic
 
+    # === 流水线模式 ===
+    pending_memory: Optional[Dict[str, Any]]       # 后台记忆提取中的章节 {chapter_index, draft}
+
     # === 质量检查报告 ===
     volume_review_reports: Optional[List[Dict]]    # 卷级审查报告
     milestone_reports: Optional[List[Dict]]        # 里程碑审查报告
@@ -0,0 +1,99 @@
+"""
+世界设定摘要 - Compact World Bible Digest
+
+writer / critic / memory 每次调用都把角色表或整个 world_bible json.dumps(indent=2) 再截断塞进 prompt：
+缩进、引号和键名占掉大半 token，截断后往往只剩第一个角色的一半。
+
+digest 把 world_bible 转成稳定的逐行格式，各节点按需取区块：
+    characters  {姓名: "年龄: 25｜职业: 剑客｜性格: 冷静,果断"}
+    states      {姓名: 最新状态}
+    threads     ["- 伏笔", ...]（按重要度排序）
+    events      ["- 世界事件", ...]（最近的在最后）
+    setting     ["setting: ...", "rules: ...；..."]
+
+digest 随 world_bible 一起保存在 state["bible_digest"] 中：只在 memory 节点修改 world_bible 后
+重新生成，同一章内 writer 各段落、critic（含修订轮次）和 memory 的多次调用直接复用。
+"""
+
+from src.utils.prompt_budget import character_profile, compact_json, thread_lines
+
+def _note_text(note):
+    if isinstance(note, dict):
+        return str(note.get("text", compact_json(note)))
+    if isinstance(note, list):
+        return "；".join(str(n) for n in note)
+    return str(note)
+
+
+def _setting_lines(worldbuilding):
+    if not isinstance(worldbuilding, dict):
+        return [str(worldbuilding)] if worldbuilding else []
+
+    lines = []
+    for key, value in worldbuilding.items():
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = "；".join(_note_text(v) for v in value)
+        elif isinstance(value, dict):
+            value = compact_json(value)
+        lines.append(f"{key}: {value}")
+    return lines
+
+
+def build_digest(world_bible):
+    """
+    把 world_bible 转成逐行摘要
+
+    Returns:
+        dict: 各区块（见模块说明），键顺序与 world_bible 一致，相同输入得到相同输出
+    """
+    world_bible = world_bible or {}
+    characters = world_bible.get("characters") or {}
+
+    states = {}
+    for name, data in characters.items():
+        if not isinstance(data, dict):
+            continue
+        # 🔧 兼容两种模式 (长篇: recent_notes, 短篇: notes)
+        notes = data.get("recent_notes") or data.get("notes") or []
+        if notes:
+            states[name] = _note_text(notes[-1])
+
+    return {
+        "characters": {name: character_profile(data) for name, data in characters.items()},
+        "states": states,
+        "threads": thread_lines(world_bible.get("plot_threads")),
+        "events": [f"- {_note_text(e)}" for e in world_bible.get("world_events") or []],
+        "setting": _setting_lines(world_bible.get("worldbuilding")),
+    }
+
+
+def get_bible_digest(state, world_bible=None):
+    """
+    获取当前 world_bible 的摘要
+
+    state 中已有 bible_digest 时直接返回（由 memory 节点与 world_bible 一同更新）；
+    显式传入其他 world_bible（如流水线模式的后台快照）或旧存档没有 digest 时现场生成。
+    """
+    if world_bible is None or world_bible is state.get("world_bible"):
+        digest = state.get("bible_digest")
+        if digest:
+            return digest
+        world_bible = state.get("world_bible", {})
+    return build_digest(world_bible)
+
+
+def with_bible_digest(state, update):
+    """
+    memory 节点的输出如果替换了 world_bible，附带重新生成的 bible_digest
+
+    world_bible 未变（同一对象）且已有 digest 时不重复生成。
+    """
+    new_bible = update.get("world_bible")
+    if new_bible is None:
+        return update
+    if new_bible is state.get("world_bible") and state.get("bible_digest"):
+        return update
+    return {**update, "bible_digest": build_digest(new_bible)}
+
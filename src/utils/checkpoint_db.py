@@ -0,0 +1,158 @@
+"""
+Checkpoint 数据库连接层 - WAL + Single Writer + Concurrent Readers
+
+每个节点结束都要写 checkpoint，默认配置下每次提交都会完整 fsync。本模块统一管理项目数据库连接：
+- WAL 模式 + synchronous=NORMAL：进程崩溃不丢数据，只有掉电可能丢最后几次提交
+- 单个写线程：所有写入排队执行，队列中积压的写入合并为一个事务提交（group commit）
+- 读连接按线程创建，读写互不阻塞，生成过程中 get_state / 状态工具可以随时读取进度
+
+写入默认异步执行（调用方不等待提交），读取前调用 flush() 保证读到自己的写入。
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+
+class CheckpointDB:
+    """
+    项目数据库的连接管理
+
+    Args:
+        path: 数据库文件路径
+        synchronous: 写连接的 PRAGMA synchronous（WAL 下 NORMAL 已足够安全）
+        max_batch: 单个事务最多合并的写入任务数
+    """
+
+    def __init__(self, path, synchronous="NORMAL", max_batch=256, busy_timeout_ms=5000):
+        self.path = str(path)
+        self.synchronous = synchronous
+        self.max_batch = max(1, max_batch)
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+
+        self.stats = {"jobs": 0, "commits": 0, "errors": 0}
+
+        # 写连接在写线程内创建；先同步完成一次初始化，确保数据库已切换到 WAL
+        self._writer = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._writer.start()
+        self.call(lambda conn: None)
+
+        # 写线程是 daemon 线程，退出前必须把队列里的写入提交完
+        atexit.register(self.close)
+
+    # ---------- 写入 ----------
+
+    def _connect_writer(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _run(self):
+        conn = self._connect_writer()
+        stopping = False
+
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                stopping = True
+                batch = [job for job in batch if job is not None]
+            if not batch:
+                continue
+
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for fn, future in batch:
+                    # 每个任务一个 savepoint，单个任务失败不影响同批其他写入
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        results.append((future, fn(conn), None))
+                        conn.execute("RELEASE job")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                        results.append((future, None, e))
+                conn.execute("COMMIT")
+                self.stats["commits"] += 1
+            except Exception as e:
+                # 提交本身失败（磁盘满等），整批都算失败
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                results = [(future, None, e) for _, future in batch]
+
+            self.stats["jobs"] += len(batch)
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    self.stats["errors"] += 1
+                    print(f"  ⚠️  checkpoint 写入失败: {str(error)[:60]}")
+                    future.set_exception(error)
+
+        conn.close()
+
+    def submit(self, fn):
+        """
+        提交写入任务 fn(conn)，在写线程的事务内执行
+
+        Returns:
+            Future: 提交完成后得到 fn 的返回值
+        """
+        if self._closed:
+            raise RuntimeError(f"数据库已关闭: {self.path}")
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def call(self, fn):
+        """提交写入任务并等待提交完成"""
+        return self.submit(fn).result()
+
+    def flush(self):
+        """等待此前提交的写入全部落库"""
+        if not self._closed:
+            self.call(lambda conn: None)
+
+    # ---------- 读取 ----------
+
+    def reader(self):
+        """当前线程的只读连接（首次调用时创建，只在本线程使用）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self):
+        """提交剩余写入并关闭所有连接（可重复调用）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,467 @@
+"""
+紧凑 Checkpoint 存储 - Compact Incremental Checkpointer
+
+SqliteSaver 每个节点结束都把完整 NovelState 序列化一遍（config、world_bible、
+不断增长的 chapters 列表、draft、cold_memory ...），长篇小说的数据库按章节数平方增长。
+CompactSqliteSaver 与 SqliteSaver 共用同一张 checkpoints 表，但：
+- 通道值单独存入 checkpoint_blobs，按 (通道, 版本) 去重：config/总纲/卷纲只存一次
+- 同一通道的新版本相对上一版本存增量：列表只存追加的尾部，字典只存变化的键
+- 每隔 KEYFRAME_INTERVAL 个版本存一次完整值，限制还原时的增量链长度
+- blob 用 zstd 压缩（未安装 zstandard 时退回 zlib）
+- 只保留每个线程最近 keep_last 个 checkpoint，旧 checkpoint 及其 writes/blob 定期清理
+
+旧数据库（完整快照格式）可直接读取，续写后逐步转为紧凑格式。
+连接管理（WAL、单写线程批量提交、按线程的读连接）见 checkpoint_db.py。
+"""
+
+import copy
+import json
+import zlib
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from langgraph.checkpoint.base import WRITES_IDX_MAP, BaseCheckpointSaver, get_checkpoint_metadata
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from src.utils.checkpoint_db import CheckpointDB
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+KEYFRAME_INTERVAL = 16  # 每个通道连续增量的最大层数
+COMPRESS_MIN_BYTES = 256  # 小于该大小的 blob 不压缩
+
+_COMPACT_MARKER = "__compact__"
+
+
+class CompressedSerializer:
+    """给内层 serde 加一层压缩，type 前缀标记压缩算法（未压缩的旧数据原样读取）"""
+
+    def __init__(self, serde, level=3):
+        self.serde = serde
+        self.level = level
+
+    def dumps_typed(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < COMPRESS_MIN_BYTES:
+            return type_, data
+        if zstandard is not None:
+            return f"zstd+{type_}", zstandard.ZstdCompressor(level=self.level).compress(data)
+        return f"zlib+{type_}", zlib.compress(data, self.level)
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.startswith("zstd+"):
+            if zstandard is None:
+                raise RuntimeError("checkpoint 使用 zstd 压缩，请先安装 zstandard")
+            return self.serde.loads_typed((type_[5:], zstandard.ZstdDecompressor().decompress(payload)))
+        if type_.startswith("zlib+"):
+            return self.serde.loads_typed((type_[5:], zlib.decompress(payload)))
+        return self.serde.loads_typed(data)
+
+
+def make_delta(old, new):
+    """
+    计算 old → new 的结构化增量
+
+    编码（均为列表，便于 msgpack 序列化）：
+        ["s"]                      未变化
+        ["f", value]               完整值
+        ["a", tail]                列表追加（old 是 new 的前缀）
+        ["d", [[k, sub], ...], [removed_keys]]  字典逐键增量
+    """
+    if old == new:
+        return ["s"]
+
+    if isinstance(old, list) and isinstance(new, list):
+        if len(new) >= len(old) and new[:len(old)] == old:
+            return ["a", new[len(old):]]
+        return ["f", new]
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = []
+        for key, value in new.items():
+            if key not in old:
+                changed.append([key, ["f", value]])
+            elif old[key] != value:
+                changed.append([key, make_delta(old[key], value)])
+        removed = [key for key in old if key not in new]
+        return ["d", changed, removed]
+
+    return ["f", new]
+
+
+def apply_delta(base, delta):
+    """按 make_delta 的编码还原新值（会复用 base 中的对象，base 不应再被使用）"""
+    op = delta[0]
+    if op == "s":
+        return base
+    if op == "f":
+        return delta[1]
+    if op == "a":
+        return base + delta[1]
+    if op == "d":
+        removed = set(delta[2])
+        result = {key: value for key, value in base.items() if key not in removed}
+        for key, sub in delta[1]:
+            result[key] = apply_delta(base.get(key), sub)
+        return result
+    raise ValueError(f"未知的增量类型: {op}")
+
+
+class CompactSqliteSaver(SqliteSaver):
+    """
+    增量 + 压缩的 SQLite checkpointer（接口与 SqliteSaver 相同）
+
+    写入在调用线程里完成序列化后交给 CheckpointDB 的写线程批量提交，
+    读取使用每个线程自己的只读连接。
+
+    Args:
+        db: 数据库路径或 CheckpointDB
+        keep_last: 每个线程保留的 checkpoint 数
+        prune_every: 每写入多少个 checkpoint 清理一次
+    """
+
+    def __init__(self, db, *, serde=None, keep_last=8, prune_every=20):
+        # 不调用 SqliteSaver.__init__：连接由 CheckpointDB 管理，conn 是按线程分配的只读连接
+        BaseCheckpointSaver.__init__(self, serde=serde)
+        self.serde = CompressedSerializer(self.serde)
+        self.jsonplus_serde = JsonPlusSerializer()
+        self.db = db if isinstance(db, CheckpointDB) else CheckpointDB(db)
+        self.lock = threading.Lock()
+        self.is_setup = False
+        self.keep_last = max(1, keep_last)
+        self.prune_every = max(1, prune_every)
+
+        # (thread_id, ns, channel) -> (version, value, depth)：上一次写入的通道值，用于计算增量
+        self._latest = {}
+        self._puts_since_prune = {}
+
+    @property
+    def conn(self):
+        return self.db.reader()
+
+    def setup(self):
+        if self.is_setup:
+            return
+        with self.lock:
+            if not self.is_setup:
+                self.db.call(self._create_tables)
+                self.is_setup = True
+
+    def _create_tables(self, conn):
+        # checkpoints / writes 与 SqliteSaver 的表结构一致，旧数据库可直接续写
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                base_version TEXT,
+                type TEXT,
+                blob BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            )
+        """)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(writes)")]
+        if "task_path" not in columns:
+            conn.execute("ALTER TABLE writes ADD COLUMN task_path TEXT NOT NULL DEFAULT ''")
+
+    @contextmanager
+    def cursor(self, transaction=True):
+        """只读游标（写入一律走 CheckpointDB 的写线程）"""
+        self.setup()
+        cur = self.conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    # ---------- 写入 ----------
+
+    def _encode_channel(self, key, version, value):
+        """返回 (base_version, 序列化后的增量或完整值)"""
+        previous = self._latest.get(key)
+        snapshot = copy.deepcopy(value)
+
+        if previous is not None and previous[0] != version and previous[2] < KEYFRAME_INTERVAL:
+            base_version, base_value, depth = previous
+            delta = make_delta(base_value, value)
+            if delta[0] != "f":
+                self._latest[key] = (version, snapshot, depth + 1)
+                return base_version, self.serde.dumps_typed(delta)
+
+        self._latest[key] = (version, snapshot, 0)
+        return None, self.serde.dumps_typed(["f", value])
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        versions = checkpoint["channel_versions"]
+
+        # 序列化在调用线程完成（之后节点修改状态对象不影响已排队的写入）
+        blob_rows = []
+        for channel, value in checkpoint["channel_values"].items():
+            version = str(versions[channel])
+            key = (thread_id, checkpoint_ns, channel)
+
+            # 未更新的通道已经存过（同一版本），跳过；续写后首次遇到时按完整值补写一次
+            cached = self._latest.get(key)
+            if channel not in new_versions and cached is not None and cached[0] == version:
+                continue
+
+            base_version, (type_, blob) = self._encode_channel(key, version, value)
+            blob_rows.append((thread_id, checkpoint_ns, channel, version, base_version, type_, blob))
+
+        compact = {
+            **checkpoint,
+            "channel_values": {},
+            _COMPACT_MARKER: list(checkpoint["channel_values"].keys()),
+        }
+        type_, serialized_checkpoint = self.serde.dumps_typed(compact)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        checkpoint_row = (
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            type_, serialized_checkpoint, serialized_metadata,
+        )
+
+        puts = self._puts_since_prune.get((thread_id, checkpoint_ns), 0) + 1
+        prune_keep = None
+        if puts >= self.prune_every:
+            # 下一次增量的基底也要保留
+            prune_keep = [
+                (channel, version) for (t, ns, channel), (version, _, _) in self._latest.items()
+                if t == thread_id and ns == checkpoint_ns
+            ]
+            puts = 0
+        self._puts_since_prune[(thread_id, checkpoint_ns)] = puts
+
+        def write(conn):
+            conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_blobs "
+                "(thread_id, checkpoint_ns, channel, version, base_version, type, blob) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                blob_rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                checkpoint_row
+            )
+            if prune_keep is not None:
+                self._prune(conn, thread_id, checkpoint_ns, prune_keep)
+
+        self.db.submit(write)
+        return {
+            "configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self.setup()
+        query = (
+            "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            if all(w[0] in WRITES_IDX_MAP for w in writes)
+            else "INSERT OR IGNORE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        rows = [
+            (
+                str(config["configurable"]["thread_id"]),
+                str(config["configurable"]["checkpoint_ns"]),
+                str(config["configurable"]["checkpoint_id"]),
+                task_id,
+                task_path,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        self.db.submit(lambda conn: conn.executemany(query, rows))
+
+    # ---------- 读取 ----------
+
+    def _load_channel(self, cur, thread_id, checkpoint_ns, channel, version):
+        """沿增量链回溯到最近的完整值，再依次应用增量"""
+        chain = []
+        current = version
+        while current is not None:
+            cur.execute(
+                "SELECT base_version, type, blob FROM checkpoint_blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, current)
+            )
+            row = cur.fetchone()
+            if row is None:
+                raise KeyError(f"checkpoint blob 缺失: {channel}@{current}")
+            base_version, type_, blob = row
+            chain.append(self.serde.loads_typed((type_, blob)))
+            current = base_version
+
+        value = None
+        for delta in reversed(chain):
+            value = apply_delta(value, delta)
+        return value
+
+    def _hydrate(self, checkpoint_tuple):
+        """把紧凑格式的 checkpoint 还原为完整的 channel_values（旧格式原样返回）"""
+        if checkpoint_tuple is None:
+            return None
+
+        checkpoint = checkpoint_tuple.checkpoint
+        channels = checkpoint.pop(_COMPACT_MARKER, None)
+        if channels is None:
+            return checkpoint_tuple
+
+        configurable = checkpoint_tuple.config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        versions = checkpoint["channel_versions"]
+
+        with self.cursor(transaction=False) as cur:
+            checkpoint["channel_values"] = {
+                channel: self._load_channel(cur, thread_id, checkpoint_ns, channel, str(versions[channel]))
+                for channel in channels
+            }
+        return checkpoint_tuple
+
+    def get_tuple(self, config):
+        # 先等排队中的写入落库，保证读到自己刚写的 checkpoint
+        self.db.flush()
+        return self._hydrate(super().get_tuple(config))
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        self.db.flush()
+        for checkpoint_tuple in super().list(config, filter=filter, before=before, limit=limit):
+            yield self._hydrate(checkpoint_tuple)
+
+    def get_delta_channel_history(self, *, config, channels):
+        # SqliteSaver 的快速实现直接读取 checkpoints 表里的 channel_values，紧凑格式下不可用
+        return BaseCheckpointSaver.get_delta_channel_history(self, config=config, channels=channels)
+
+    # ---------- 清理 ----------
+
+    def _prune(self, conn, thread_id, checkpoint_ns, extra_keep):
+        """删除最近 keep_last 个之外的 checkpoint、对应 writes 及不再被引用的 blob（在写线程执行）"""
+        stale = [
+            (thread_id, checkpoint_ns, row[0]) for row in conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep_last)
+            )
+        ]
+        if not stale:
+            return
+
+        conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale
+        )
+        conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale
+        )
+
+        # 仍被保留的 checkpoint 引用的 (通道, 版本)，以及它们的增量基底
+        referenced = set(extra_keep)
+        for type_, blob in conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns)
+        ).fetchall():
+            kept = self.serde.loads_typed((type_, blob))
+            for channel in kept.get(_COMPACT_MARKER, ()):
+                referenced.add((channel, str(kept["channel_versions"][channel])))
+
+        bases = {
+            (channel, version): base for channel, version, base in conn.execute(
+                "SELECT channel, version, base_version FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns)
+            )
+        }
+
+        keep = set()
+        for channel, version in referenced:
+            current = version
+            while current is not None and (channel, current) not in keep:
+                keep.add((channel, current))
+                current = bases.get((channel, current))
+
+        conn.executemany(
+            "DELETE FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in bases if (channel, version) not in keep]
+        )
+
+    def delete_thread(self, thread_id):
+        self.setup()
+        thread_id = str(thread_id)
+
+        def delete(conn):
+            for table in ("checkpoints", "writes", "checkpoint_blobs"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+        self.db.call(delete)
+        self._latest = {k: v for k, v in self._latest.items() if k[0] != thread_id}
+
+    def close(self):
+        """提交排队中的写入，停止写线程并关闭所有连接（之后不能再使用该 saver）"""
+        self.db.close()
+        self._latest.clear()
+
+    # ---------- 异步接口（在线程中执行同步方法） ----------
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        return await asyncio.to_thread(self.get_delta_channel_history, config=config, channels=channels)
@@ -0,0 +1,138 @@
+"""
+LLM 响应缓存 - Content-Addressed Response Cache
+
+崩溃重跑或微调配置后，总纲/卷纲/卷摘要/分析阶段会发出完全相同的 prompt。
+按 (模型 + 温度 + prompt) 的哈希缓存响应，重放时直接返回：
+- SQLite 单文件存储，多线程共享
+- 按总大小做 LRU 淘汰（last_access 最早的先删）
+- 逐个调用点开启：get_llm(cache=True) / ai_client.generate(cache=True)
+
+配置（环境变量，均可选）：
+    LLM_CACHE_PATH     缓存文件路径（默认 <repo>/cache/llm_responses.db）
+    LLM_CACHE_MAX_MB   缓存大小上限（默认 256）
+
+本模块只依赖标准库，short_novel 可直接导入。
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / "cache" / "llm_responses.db"
+
+
+def make_key(model, temperature, prompt, **extra):
+    """
+    生成内容寻址的缓存 key
+
+    Args:
+        model: 模型名称（或包含模型参数的描述串）
+        temperature: 采样温度
+        prompt: 完整 prompt（多段消息请先拼接/序列化）
+        **extra: 其他影响输出的参数（如 max_tokens、system）
+    """
+    parts = [str(model), repr(temperature), prompt]
+    parts.extend(f"{k}={extra[k]!r}" for k in sorted(extra))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite 响应缓存（按总大小 LRU 淘汰）"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=256 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self._conn.commit()
+
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def get(self, key):
+        """读取缓存（命中时刷新访问时间），未命中返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, response):
+        """写入缓存，超出大小上限时淘汰最久未访问的条目"""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # 淘汰到上限的 90%，避免每次写入都触发
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.stats["evicted"] += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """获取进程内共享的响应缓存（首次调用时按环境变量创建）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_mb = os.environ.get("LLM_CACHE_MAX_MB", "").strip()
+                _cache = ResponseCache(
+                    path=os.environ.get("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH,
+                    max_bytes=(int(max_mb) if max_mb.isdigit() else 256) * 1024 * 1024,
+                )
+    return _cache
@@ -0,0 +1,194 @@
+"""
+共享 LLM 客户端注册表 - Pooled LLM Client Registry
+
+所有节点通过 get_llm() 获取 ChatAnthropic 实例：
+- 按 (model, temperature, timeout, max_retries, max_tokens, cache) 缓存实例
+- 同一实例复用底层 httpx 连接池（keep-alive），避免每次调用重新建立 TLS 连接
+- 线程安全，可在并发生成时共享
+- 每次调用经过全局限流器（src/utils/rate_limiter.py），批量运行多个项目时共享同一份配额
+- cache=True 的实例使用磁盘响应缓存（src/utils/llm_cache.py），命中时不发请求；
+  被截断的响应不缓存，cache 也可以是校验函数，只缓存调用方能解析的响应
+- 消息内容可以是带 cache_control 的内容块（src/utils/prompt_cache.py），响应中的缓存用量计入统计
+"""
+
+import os
+import re
+import json
+import threading
+from functools import lru_cache
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from src.utils.rate_limiter import get_limiter, estimate_tokens
+from src.utils.llm_cache import get_cache, make_key
+from src.utils import prompt_cache
+
+DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _prompt_texts(messages):
+    return [prompt_cache.content_text(m.content) for m in messages]
+
+
+def _usage_tokens(result):
+    """从 ChatResult 中读取实际 token 用量（输入+输出），同时累计前缀缓存统计"""
+    try:
+        usage = result.generations[0].message.usage_metadata
+        prompt_cache.record_usage(usage)
+        return usage["input_tokens"] + usage["output_tokens"]
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+
+def _load_json(text):
+    """按调用方的解析方式读取 JSON 响应（去掉代码块、修复尾逗号），失败时抛出异常"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    text = text.strip().replace('\ufeff', '').replace('\u200b', '')
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(re.sub(r',(\s*[}\]])', r'\1', text))
+
+
+def is_json_object(text):
+    """缓存校验：响应是 JSON 对象"""
+    try:
+        return isinstance(_load_json(text), dict)
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def json_array_of(min_items):
+    """
+    缓存校验：响应是至少 min_items 项的 JSON 数组
+
+    按数量缓存校验函数，同一数量返回同一个函数对象，get_llm 注册表的 key 保持稳定
+    """
+    def validate(text):
+        try:
+            items = _load_json(text)
+        except ValueError:
+            return False
+        return isinstance(items, list) and len(items) >= min_items
+
+    validate.__name__ = f"json_array_of_{min_items}"
+    return validate
+
+
+class ResponseCacheAdapter(BaseCache):
+    """
+    把 ResponseCache 接到 LangChain 的缓存接口上
+
+    llm_string 包含模型名、温度等调用参数，prompt 是序列化后的消息列表，
+    两者一起哈希作为 key；只缓存纯文本响应。
+
+    因 max_tokens 截断的响应和未通过 validate(text) 的响应不写入缓存，
+    否则重跑时会一直拿到同一个坏响应，无法重新生成。
+    """
+
+    def __init__(self, validate=None):
+        self.validate = validate
+
+    def lookup(self, prompt, llm_string):
+        text = get_cache().get(make_key(llm_string, None, prompt))
+        if text is None:
+            return None
+        return [ChatGeneration(message=AIMessage(content=text))]
+
+    def update(self, prompt, llm_string, return_val):
+        if not return_val:
+            return
+        message = getattr(return_val[0], "message", None)
+        content = message.content if message is not None else return_val[0].text
+        if not isinstance(content, str) or not content:
+            return
+        if getattr(message, "response_metadata", {}).get("stop_reason") == "max_tokens":
+            return
+        if self.validate is not None and not self.validate(content):
+            return
+        get_cache().put(make_key(llm_string, None, prompt), content)
+
+    def clear(self, **kwargs):
+        get_cache().clear()
+
+
+class PooledChatAnthropic(ChatAnthropic):
+    """每次模型调用都经过全局限流器（令牌桶 + AIMD 并发窗口）"""
+
+    def _generate(self, messages, *args, **kwargs):
+        estimated = estimate_tokens(*_prompt_texts(messages), max_tokens=self.max_tokens)
+        with get_limiter().slot(estimated) as call:
+            result = super()._generate(messages, *args, **kwargs)
+            call.record_usage(_usage_tokens(result))
+            return result
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        estimated = estimate_tokens(*_prompt_texts(messages), max_tokens=self.max_tokens)
+        async with get_limiter().aslot(estimated) as call:
+            result = await super()._agenerate(messages, *args, **kwargs)
+            call.record_usage(_usage_tokens(result))
+            return result
+
+
+def get_llm(temperature, timeout, max_retries=0, max_tokens=None, model=DEFAULT_MODEL, cache=False):
+    """
+    获取共享的 ChatAnthropic 客户端
+
+    Args:
+        temperature: 采样温度
+        timeout: 请求超时（秒）
+        max_retries: SDK 内部重试次数
+        max_tokens: 最大输出 token（None 使用默认值）
+        model: 模型名称
+        cache: 是否使用磁盘响应缓存（相同模型+参数+prompt 直接返回上次结果）；
+            传入校验函数 validate(text) -> bool 时只缓存通过校验的响应（如 is_json_object），
+            请传模块级函数，注册表按函数对象区分实例
+
+    Returns:
+        PooledChatAnthropic: 进程内共享的客户端实例
+    """
+    key = (model, float(temperature), float(timeout), max_retries, max_tokens, cache)
+
+    llm = _registry.get(key)
+    if llm is not None:
+        return llm
+
+    with _registry_lock:
+        llm = _registry.get(key)
+        if llm is None:
+            params = {
+                "model": model,
+                "temperature": temperature,
+                "anthropic_api_key": os.getenv("ANTHROPIC_API_KEY"),
+                "anthropic_api_url": os.getenv("ANTHROPIC_BASE_URL"),
+                "timeout": timeout,
+                "max_retries": max_retries,
+            }
+            if max_tokens is not None:
+                params["max_tokens"] = max_tokens
+            # 未开启时显式关闭，避免误用 LangChain 全局缓存
+            if callable(cache):
+                params["cache"] = ResponseCacheAdapter(validate=cache)
+            else:
+                params["cache"] = ResponseCacheAdapter() if cache else False
+
+            llm = PooledChatAnthropic(**params)
+            _registry[key] = llm
+
+    return llm
+
+
+def clear_llm_registry():
+    """清空客户端注册表（环境变量变化后使用）"""
+    with _registry_lock:
+        _registry.clear()
@@ -0,0 +1,319 @@
+"""
+章节存储 - Append-Only Manuscript Store
+
+原先每章一个 chapter_{i:03d}.txt：超过 999 章后文件名排序错乱，导出长篇时要打开上千个小文件。
+现在每个项目的稿件目录只有两个文件：
+- chapters.seg  追加写入的章节记录（记录头 + UTF-8 正文），修订/回填标题时追加新记录
+- chapters.idx  定长索引（章节号, 偏移, 长度, crc），同一章以最后一条为准
+
+写入顺序：记录 fsync → 索引 fsync。崩溃后重新打开时，未建索引的完整记录补建索引，
+不完整的尾部记录截断丢弃，因此任何时刻读到的都是某一次完整写入的内容。
+
+读取单章是一次字典查找 + 一次定位读取；整书导出直接从 mmap 切片写出。
+旧版逐章 txt 目录首次打开时自动导入；export_chapter_files() 可导出回逐章文件布局。
+"""
+
+import os
+import mmap
+import zlib
+import struct
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有进程内锁
+    fcntl = None
+
+SEGMENT_FILE = "chapters.seg"
+INDEX_FILE = "chapters.idx"
+
+RECORD_MAGIC = b"NCH1"
+RECORD_HEADER = struct.Struct("<4sIII")  # magic, chapter_index, length, crc32
+INDEX_ENTRY = struct.Struct("<IQII")     # chapter_index, offset, length, crc32
+
+
+class ManuscriptStore:
+    """单个项目的章节存储（同一目录请通过 get_store() 共享实例）"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_path = self.directory / SEGMENT_FILE
+        self.index_path = self.directory / INDEX_FILE
+
+        self._lock = threading.RLock()
+        self._entries = {}  # chapter_index -> (offset, length, crc)
+        self._index_pos = 0
+
+        is_new = not self.segment_path.exists()
+        with self._lock, self._file_lock():
+            self.segment_path.touch()
+            self.index_path.touch()
+            self._recover()
+
+        if is_new:
+            self._import_legacy_files()
+
+    # ---------- 内部 ----------
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程写锁（同一项目同时只有一个进程追加）"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.directory / ".chapters.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        """读取索引文件中新增的条目"""
+        size = self.index_path.stat().st_size
+        if size <= self._index_pos:
+            return
+
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_pos)
+            data = f.read(size - self._index_pos)
+
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for pos in range(0, usable, INDEX_ENTRY.size):
+            chapter_index, offset, length, crc = INDEX_ENTRY.unpack_from(data, pos)
+            self._entries[chapter_index] = (offset, length, crc)
+        self._index_pos += usable
+
+    def _recover(self):
+        """打开时修复崩溃留下的不一致（调用方持有文件锁）"""
+        # 截掉不完整的索引条目
+        index_size = self.index_path.stat().st_size
+        if index_size % INDEX_ENTRY.size:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(index_size - index_size % INDEX_ENTRY.size)
+
+        self._load_index()
+
+        segment_size = self.segment_path.stat().st_size
+        indexed_end = max((offset + RECORD_HEADER.size + length for offset, length, _ in self._entries.values()), default=0)
+        if indexed_end > segment_size:
+            raise RuntimeError(f"章节索引与数据文件不一致: {self.index_path}")
+
+        # 已写入但未建索引的完整记录补建索引，残缺记录截断
+        recovered = []
+        position = indexed_end
+        with open(self.segment_path, "rb") as f:
+            while position + RECORD_HEADER.size <= segment_size:
+                f.seek(position)
+                magic, chapter_index, length, crc = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                if magic != RECORD_MAGIC or position + RECORD_HEADER.size + length > segment_size:
+                    break
+                if zlib.crc32(f.read(length)) != crc:
+                    break
+                recovered.append((chapter_index, position, length, crc))
+                position += RECORD_HEADER.size + length
+
+        if position < segment_size:
+            with open(self.segment_path, "r+b") as f:
+                f.truncate(position)
+                os.fsync(f.fileno())
+
+        if recovered:
+            with open(self.index_path, "ab") as f:
+                for entry in recovered:
+                    f.write(INDEX_ENTRY.pack(*entry))
+                f.flush()
+                os.fsync(f.fileno())
+            self._load_index()
+
+    def _read_locked(self, chapter_index):
+        entry = self._entries.get(chapter_index)
+        if entry is None:
+            return None
+
+        offset, length, crc = entry
+        with open(self.segment_path, "rb") as f:
+            f.seek(offset + RECORD_HEADER.size)
+            data = f.read(length)
+        if zlib.crc32(data) != crc:
+            raise RuntimeError(f"第 {chapter_index} 章数据校验失败: {self.segment_path}")
+        return data.decode("utf-8")
+
+    def _import_legacy_files(self):
+        """导入旧版逐章 txt 文件（原文件保留）"""
+        legacy = []
+        for path in self.directory.glob("chapter_*.txt"):
+            try:
+                legacy.append((int(path.stem.split("_", 1)[1]), path))
+            except ValueError:
+                continue
+
+        if not legacy:
+            return
+
+        for chapter_index, path in sorted(legacy):
+            self.write(chapter_index, path.read_text(encoding="utf-8"))
+        print(f"  📦 已导入 {len(legacy)} 个旧版章节文件到 {SEGMENT_FILE}")
+
+    # ---------- 公共接口 ----------
+
+    def write(self, chapter_index, text, expected=None):
+        """
+        写入（或覆盖）一章，返回后数据已落盘
+
+        Args:
+            expected: 提供时，仅当该章当前内容等于 expected 才写入（用于后台回填标题）
+
+        Returns:
+            bool: 是否写入
+        """
+        data = text.encode("utf-8")
+        crc = zlib.crc32(data)
+
+        with self._lock, self._file_lock():
+            self._load_index()
+            if expected is not None and self._read_locked(chapter_index) != expected:
+                return False
+
+            with open(self.segment_path, "ab") as f:
+                offset = f.tell()
+                f.write(RECORD_HEADER.pack(RECORD_MAGIC, chapter_index, len(data), crc))
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self.index_path, "ab") as f:
+                f.write(INDEX_ENTRY.pack(chapter_index, offset, len(data), crc))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._entries[chapter_index] = (offset, len(data), crc)
+            self._index_pos += INDEX_ENTRY.size
+            return True
+
+    def read(self, chapter_index):
+        """读取一章，不存在时返回 None"""
+        with self._lock:
+            self._load_index()
+            return self._read_locked(chapter_index)
+
+    def __contains__(self, chapter_index):
+        with self._lock:
+            self._load_index()
+            return chapter_index in self._entries
+
+    def chapter_indices(self):
+        """已保存的章节号（升序）"""
+        with self._lock:
+            self._load_index()
+            return sorted(self._entries)
+
+    def chapter_lengths(self):
+        """各章正文字节数 {chapter_index: bytes}（不读取正文）"""
+        with self._lock:
+            self._load_index()
+            return {chapter_index: length for chapter_index, (_, length, _) in self._entries.items()}
+
+    @contextmanager
+    def _mapped(self):
+        with open(self.segment_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                yield view
+
+    def iter_chapter_bytes(self):
+        """
+        按章节顺序产出 (chapter_index, memoryview)，直接切自 mmap，不复制正文
+
+        memoryview 只在迭代期间有效，需要保留时请自行 bytes() 复制。
+        """
+        with self._lock:
+            self._load_index()
+            entries = sorted(self._entries.items())
+
+        with self._mapped() as view:
+            for chapter_index, (offset, length, _) in entries:
+                start = offset + RECORD_HEADER.size
+                chunk = view[start:start + length]
+                try:
+                    yield chapter_index, chunk
+                finally:
+                    chunk.release()
+
+    def export_text(self, out_path, separator="\n\n", header=""):
+        """
+        把全书按章节顺序拼接导出到一个 txt 文件（mmap 切片直接写出）
+
+        Args:
+            header: 写在最前面的文本（如书名）
+
+        Returns:
+            int: 导出的章节数
+        """
+        sep = separator.encode("utf-8")
+        count = 0
+        tmp_path = f"{out_path}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(header.encode("utf-8"))
+            for _, chunk in self.iter_chapter_bytes():
+                if count:
+                    out.write(sep)
+                out.write(chunk)
+                count += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, out_path)
+        return count
+
+    def export_chapter_files(self, dest_dir=None, width=None):
+        """
+        兼容导出：按旧版布局每章一个 chapter_XXX.txt
+
+        Args:
+            dest_dir: 输出目录（默认稿件目录本身）
+            width: 章节号位数（默认 max(3, 最大章节号位数)，保证文件名排序正确）
+
+        Returns:
+            int: 导出的章节数
+        """
+        dest = Path(dest_dir) if dest_dir else self.directory
+        dest.mkdir(parents=True, exist_ok=True)
+
+        indices = self.chapter_indices()
+        if width is None:
+            width = max(3, len(str(indices[-1]))) if indices else 3
+
+        count = 0
+        for chapter_index, chunk in self.iter_chapter_bytes():
+            path = dest / f"chapter_{chapter_index:0{width}d}.txt"
+            tmp_path = path.with_suffix(".txt.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(chunk)
+            os.replace(tmp_path, path)
+            count += 1
+        return count
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(directory):
+    """获取目录对应的共享 ManuscriptStore（writer 节点与后台任务共用，保证进程内串行写入）"""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ManuscriptStore(key)
+            _stores[key] = store
+        return store
+
+
+def has_store(directory):
+    """目录中是否已有章节存储（不创建）"""
+    return (Path(directory) / SEGMENT_FILE).exists()
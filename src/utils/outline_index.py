@@ -0,0 +1,157 @@
+"""
+大纲区间索引 - Chapter → Volume / Phase / Milestone Lookup
+
+大纲中的阶段和卷用 "start-end" 字符串标注章节范围，原先每次查找都顺序扫描并重新解析这些字符串。
+这里在大纲加载后一次性建立索引：
+- 章节范围解析为整数区间，切分成互不重叠的基本区间，每段记录覆盖它的第一个条目（与顺序扫描的结果一致）
+- 查找为 bisect，O(log n)
+- 里程碑按章节号排序，查找"已到达的最近里程碑"同样为 bisect
+
+get_outline_index() 按大纲对象缓存索引：yaml_cache 在文件未修改时返回同一个对象，
+state 中的 novel_outline / volume_frameworks 在一次运行中也保持不变，因此每份大纲只建一次索引。
+"""
+
+import re
+import heapq
+import bisect
+import threading
+
+_RANGE_PATTERN = re.compile(r"^\s*(\d+)\s*[-~～—–]\s*(\d+)\s*$")
+
+# 缓存最近使用的几份大纲的索引（保留大纲对象引用，保证 id 不被复用）
+MAX_CACHED_INDEXES = 16
+
+
+def parse_chapter_range(value):
+    """
+    解析章节范围
+
+    支持 "1-25"（也接受 ~ ～ — – 分隔）、单个章节号和 [start, end]。
+
+    Returns:
+        tuple | None: (start, end)，无法解析或 start > end 时为 None
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value, value
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        try:
+            start, end = int(value[0]), int(value[1])
+        except (TypeError, ValueError):
+            return None
+    else:
+        match = _RANGE_PATTERN.match(str(value or ""))
+        if not match:
+            return None
+        start, end = int(match.group(1)), int(match.group(2))
+    return (start, end) if start <= end else None
+
+
+class IntervalIndex:
+    """一组带章节范围的条目（阶段或卷）的区间索引"""
+
+    def __init__(self, items, field="chapters"):
+        intervals = []
+        for order, item in enumerate(items or []):
+            if not isinstance(item, dict):
+                continue
+            parsed = parse_chapter_range(item.get(field))
+            if parsed:
+                intervals.append((parsed[0], parsed[1], order, item))
+        self.size = len(intervals)
+
+        # 扫描线：在每个边界处取覆盖该位置、列表顺序最靠前的条目
+        boundaries = sorted({start for start, _, _, _ in intervals} | {end + 1 for _, end, _, _ in intervals})
+        by_start = sorted(intervals)
+        active = []  # (order, end, item)
+        position = 0
+        self._starts = []
+        self._items = []
+        for boundary in boundaries:
+            while position < len(by_start) and by_start[position][0] <= boundary:
+                start, end, order, item = by_start[position]
+                heapq.heappush(active, (order, end, item))
+                position += 1
+            while active and active[0][1] < boundary:
+                heapq.heappop(active)
+            item = active[0][2] if active else None
+            # 相邻基本区间属于同一条目时合并
+            if self._items and self._items[-1] is item:
+                continue
+            self._starts.append(boundary)
+            self._items.append(item)
+
+    def find(self, chapter):
+        """覆盖该章节的条目（多个条目重叠时取列表中靠前的），没有时返回 None"""
+        slot = bisect.bisect_right(self._starts, chapter) - 1
+        return self._items[slot] if slot >= 0 else None
+
+
+class OutlineIndex:
+    """
+    一份大纲的章节索引
+
+    Args:
+        outline: 总纲（含 phases、key_milestones）
+        volumes: 卷框架列表（每卷含 chapters 范围）
+    """
+
+    def __init__(self, outline=None, volumes=None):
+        outline = outline if isinstance(outline, dict) else {}
+        self.phases = IntervalIndex(outline.get("phases"))
+        self.volumes = IntervalIndex(volumes)
+
+        milestones = []
+        for milestone in outline.get("key_milestones") or []:
+            try:
+                milestones.append((int(milestone["chapter"]), milestone))
+            except (TypeError, KeyError, ValueError):
+                continue
+        milestones.sort(key=lambda m: m[0])  # 稳定排序：同一章的里程碑保持原顺序
+        self._milestone_chapters = [chapter for chapter, _ in milestones]
+        self._milestones = [milestone for _, milestone in milestones]
+
+    def find_phase(self, chapter):
+        return self.phases.find(chapter)
+
+    def find_volume(self, chapter):
+        return self.volumes.find(chapter)
+
+    def last_milestone(self, chapter):
+        """章节号不超过 chapter 的最后一个里程碑（同一章有多个时取最后一个），没有时返回 None"""
+        slot = bisect.bisect_right(self._milestone_chapters, chapter) - 1
+        return self._milestones[slot] if slot >= 0 else None
+
+    def next_milestone(self, chapter):
+        """章节号大于 chapter 的第一个里程碑"""
+        slot = bisect.bisect_right(self._milestone_chapters, chapter)
+        return self._milestones[slot] if slot < len(self._milestones) else None
+
+
+_indexes = []  # [(outline, volumes, OutlineIndex)]，最近使用的在最后
+_lock = threading.Lock()
+
+
+def get_outline_index(outline=None, volumes=None):
+    """
+    获取大纲的索引（同一对象只建一次）
+
+    大纲对象被原地修改后请传入新对象（或调用 clear_outline_indexes()）。
+    """
+    with _lock:
+        for position, (cached_outline, cached_volumes, index) in enumerate(_indexes):
+            if cached_outline is outline and cached_volumes is volumes:
+                _indexes.append(_indexes.pop(position))
+                return index
+
+    index = OutlineIndex(outline, volumes)
+    with _lock:
+        _indexes.append((outline, volumes, index))
+        del _indexes[:-MAX_CACHED_INDEXES]
+    return index
+
+
+def clear_outline_indexes():
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,78 @@
+"""
+后台流水线任务 - Background Pipeline Tasks
+
+流水线模式下，部分不在关键路径上的 AI 调用放到后台线程执行：
+- 第 N 章的记忆提取与第 N+1 章的规划/写作并发
+- 章节标题生成不阻塞 writer 节点
+
+任务按 key 登记，由后续节点 collect() 取回结果；进程结束前调用 drain() 等待全部完成。
+future 只存在于当前进程，断点续传时由调用方根据 state 中的记录重新执行。
+
+是否启用由 generation.pipeline_memory 决定；未配置时异步模式（--async / 批量运行）默认启用，
+否则 astream 仍是 memory → planner 串行，异步模式只比同步模式多了进度写入的并发。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="novel-pipeline")
+        return _executor
+
+
+def memory_pipelining(config, async_mode=False):
+    """generation.pipeline_memory 的取值（未配置或为 null 时跟随 async_mode）"""
+    value = (config or {}).get('generation', {}).get('pipeline_memory')
+    return async_mode if value is None else bool(value)
+
+
+def submit(key, fn, *args, **kwargs):
+    """提交后台任务（同一 key 的旧任务会被覆盖）"""
+    future = _get_executor().submit(fn, *args, **kwargs)
+    with _lock:
+        _pending[key] = future
+    return future
+
+
+def is_pending(key):
+    with _lock:
+        return key in _pending
+
+
+def collect(key, timeout=None):
+    """
+    等待并取回后台任务结果
+
+    Returns:
+        tuple: (found, result) - 没有登记的任务时 found=False；任务异常时 result=None
+    """
+    with _lock:
+        future = _pending.pop(key, None)
+
+    if future is None:
+        return False, None
+
+    try:
+        return True, future.result(timeout=timeout)
+    except Exception as e:
+        print(f"  ⚠️  后台任务失败 ({key}): {str(e)[:50]}")
+        return True, None
+
+
+def drain(timeout=None):
+    """等待所有后台任务完成（运行结束/中断时调用）"""
+    with _lock:
+        futures = list(_pending.values())
+        _pending.clear()
+
+    if futures:
+        print(f"  ⏳ 等待 {len(futures)} 个后台任务完成...")
+        wait(futures, timeout=timeout)
@@ -0,0 +1,249 @@
+"""
+Prompt 上下文预算 - Token-Budgeted Prompt Assembly
+
+planner / writer / critic 的 prompt 原先按字符硬截断（json.dumps(characters)[:400]、
+prev_content[-600:] 等）：JSON 被截在半个字段里，缩进和引号占掉大半额度，
+而且中英文混排时字符数和 token 数差得很远。本模块统一负责：
+- count_tokens(): 本地近似计数（CJK 1 字 1 token，英文/数字约 4 字符 1 token）
+- 紧凑序列化：角色一行一条，去掉缩进和空字段
+- pack_sections(): 按优先级给各区块分配预算，区块内按相关度整条装入，
+  装不下的条目在句子边界截断或整条丢弃，不会截出半个字段
+
+优先级（数字越小越先分配）：场景大纲 / 编辑反馈 > 角色状态 > 伏笔 > 近期章节 > 检索结果 > 背景（角色设定、梗概、世界状态）
+各节点的总预算可在配置 generation.context_budget 中覆盖，例如 {writer: 900}。
+"""
+
+import re
+import json
+
+# 各节点上下文区块的默认总预算（不含固定的写作要求/输出格式说明）
+DEFAULT_BUDGETS = {
+    "planner": 1400,
+    "writer": 900,
+    # writer 段落前缀中的世界设定区块：不占 writer 预算，只在开启前缀缓存时发送，
+    # 让同一章各段落共用的前缀达到可缓存的最短长度（prompt_cache.MIN_CACHEABLE_TOKENS）
+    "writer_world": 700,
+    "critic": 900,
+    "memory": 800,
+}
+
+PRIORITY_BEATS = 0
+PRIORITY_FEEDBACK = 0
+PRIORITY_CHARACTER_STATES = 1
+PRIORITY_THREADS = 2
+PRIORITY_RECENT = 3
+PRIORITY_RAG = 4
+PRIORITY_BACKGROUND = 5
+
+# 条目剩余额度低于此值时不再截断装入（太短的残句没有意义）
+MIN_CLIP_TOKENS = 12
+
+_CJK = "\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef"
+_TOKEN_PATTERN = re.compile(rf"(?P<cjk>[{_CJK}])|(?P<word>[A-Za-z0-9_]+)|[^\s{_CJK}A-Za-z0-9_]")
+_SENTENCE_END = "。！？!?；;…\n"
+
+# 角色设定中写进 prompt 的字段（顺序即输出顺序）；notes 等运行时字段由角色状态区块负责
+CHARACTER_FIELDS = (
+    ("age", "年龄"),
+    ("occupation", "职业"),
+    ("role", "定位"),
+    ("goal", "目标"),
+    ("traits", "性格"),
+    ("personality", "性格"),
+    ("status", "状态"),
+)
+
+
+def count_tokens(text):
+    """近似 token 数（CJK 每字 1 个，英文单词/数字串每 4 字符约 1 个，标点各 1 个）"""
+    if not text:
+        return 0
+    total = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        word = match.group("word")
+        total += (len(word) + 3) // 4 if word else 1
+    return total
+
+
+def clip_tokens(text, budget, keep="head"):
+    """
+    把文本裁剪到 budget 个 token 以内，尽量停在句子边界
+
+    Args:
+        keep: "head" 保留开头（大纲、设定），"tail" 保留结尾（前文衔接）
+    """
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+
+    # 二分找到满足预算的最长前缀/后缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        piece = text[:mid] if keep == "head" else text[-mid:]
+        if count_tokens(piece) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+
+    if keep == "head":
+        piece = text[:low]
+        cut = max(piece.rfind(c) for c in _SENTENCE_END)
+        # 边界离得太远（超过一半）时宁可硬截
+        return piece[:cut + 1] if cut >= len(piece) // 2 else piece
+
+    piece = text[len(text) - low:]
+    cuts = [piece.find(c) for c in _SENTENCE_END]
+    cut = min((c for c in cuts if c >= 0), default=-1)
+    return piece[cut + 1:].lstrip() if 0 <= cut < len(piece) // 2 else piece
+
+
+def compact_json(value):
+    """无缩进、无多余空格的 JSON（中文不转义）"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def character_profile(data):
+    """角色设定的紧凑描述（不含姓名）：年龄: 25｜职业: 剑客｜性格: 冷静,果断"""
+    if not isinstance(data, dict):
+        return str(data or "")
+
+    parts = []
+    seen = set()
+    for key, label in CHARACTER_FIELDS:
+        value = data.get(key)
+        if not value or label in seen or value in ("未知", "Alive"):
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        elif isinstance(value, dict):
+            value = compact_json(value)
+        parts.append(f"{label}: {value}")
+        seen.add(label)
+
+    relationships = data.get("relationships")
+    if isinstance(relationships, dict) and relationships:
+        parts.append("关系: " + ",".join(f"{k}-{v}" for k, v in relationships.items()))
+    return "｜".join(parts)
+
+
+def format_character(name, data):
+    """一个角色一行：姓名｜年龄: 25｜职业: 剑客（data 可以是设定 dict，也可以是已生成的 character_profile）"""
+    profile = character_profile(data)
+    return f"{name}｜{profile}" if profile else name
+
+
+def rank_characters(characters, *texts):
+    """
+    按相关度排序角色名：在给定文本（场景大纲、前文）中出现的排前面，其余保持原顺序
+    """
+    names = list(characters)
+    joined = "\n".join(t for t in texts if t)
+    mentioned = [n for n in names if n and n in joined]
+    return mentioned + [n for n in names if n not in mentioned]
+
+
+def format_characters(characters, *context_texts):
+    """角色设定区块的条目列表（按相关度排序，每个角色一条）"""
+    if not characters:
+        return []
+    if isinstance(characters, list):
+        characters = {c.get("name", f"角色{i + 1}"): c for i, c in enumerate(characters) if isinstance(c, dict)}
+    return [format_character(name, characters[name]) for name in rank_characters(characters, *context_texts)]
+
+
+def thread_lines(plot_threads, limit=None):
+    """
+    伏笔区块条目：兼容 list（短篇）和 {"active": [...]}（长篇）两种结构
+
+    有 importance 的按重要度降序、同级新的在前；纯字符串按新的在前。
+    """
+    if isinstance(plot_threads, dict):
+        plot_threads = plot_threads.get("active", [])
+    threads = list(plot_threads or [])
+
+    ordered = sorted(
+        enumerate(threads),
+        key=lambda item: (
+            -(item[1].get("importance", 5) if isinstance(item[1], dict) else 5),
+            -item[0],
+        ),
+    )
+    lines = []
+    for _, thread in ordered[:limit]:
+        text = thread.get("text", str(thread)) if isinstance(thread, dict) else str(thread)
+        if text:
+            lines.append(f"- {text}")
+    return lines
+
+
+class PromptSection:
+    """
+    prompt 中的一个上下文区块
+
+    Args:
+        name: 区块名（pack_sections 返回值的 key）
+        items: 条目列表，按相关度从高到低排列（keep="tail" 时从低到高，即最近的在最后）
+        priority: 分配顺序，数字越小越先分配
+        max_tokens: 本区块上限（None 表示只受总预算限制）
+        item_max: 单条上限，防止一条长摘要吃掉整个区块
+        keep: "head" / "tail"，决定裁剪单条和取舍条目时保留哪一端
+    """
+
+    def __init__(self, name, items, priority, max_tokens=None, item_max=None, keep="head"):
+        if isinstance(items, str):
+            items = [items]
+        self.name = name
+        self.items = [str(i) for i in items or [] if i]
+        self.priority = priority
+        self.max_tokens = max_tokens
+        self.item_max = item_max
+        self.keep = keep
+
+
+def pack_sections(sections, budget):
+    """
+    按优先级把各区块装入总预算
+
+    Returns:
+        tuple: ({区块名: 文本（条目以换行连接，放不下时为空串）}, 实际使用 token 数)
+    """
+    remaining = budget
+    packed = {}
+
+    for section in sorted(sections, key=lambda s: s.priority):
+        allowance = remaining if section.max_tokens is None else min(remaining, section.max_tokens)
+        items = section.items if section.keep == "head" else list(reversed(section.items))
+
+        chosen = []
+        used = 0
+        for item in items:
+            if section.item_max is not None:
+                item = clip_tokens(item, section.item_max, section.keep)
+            cost = count_tokens(item) + 1  # 换行
+            if used + cost <= allowance:
+                chosen.append(item)
+                used += cost
+                continue
+            # 装不下整条：剩余额度足够时截断装入，然后停止（后面的条目相关度更低）
+            left = allowance - used - 1
+            if left >= MIN_CLIP_TOKENS:
+                clipped = clip_tokens(item, left, section.keep)
+                if clipped:
+                    chosen.append(clipped)
+                    used += count_tokens(clipped) + 1
+            break
+
+        if section.keep != "head":
+            chosen.reverse()
+        packed[section.name] = "\n".join(chosen)
+        remaining -= used
+
+    return packed, budget - remaining
+
+
+def budget_for(role, config=None):
+    """节点的上下文总预算（配置 generation.context_budget 优先）"""
+    overrides = (config or {}).get("generation", {}).get("context_budget") or {}
+    return int(overrides.get(role, DEFAULT_BUDGETS[role]))
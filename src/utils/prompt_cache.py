@@ -0,0 +1,183 @@
+"""
+Prompt 前缀缓存 - Provider Prompt Caching
+
+同一章的各段落调用重复发送相同的风格/角色/设定区块，short_novel 每章重复发送完整设定和大纲。
+把 prompt 拆成"稳定前缀 + 可变后缀"后，可以在前缀末尾打上 Anthropic 的 cache_control 标记：
+前缀命中缓存时按约 1/10 价格计费且不占首 token 延迟，写入缓存时按 1.25 倍计费。
+
+- message_content(): 构造消息内容（开启时为带 cache_control 的内容块列表，否则为普通字符串）
+- record_usage(): 从响应 usage 中累计命中/未命中/读写 token
+- snapshot() / format_stats(): 调用方按章取差值输出
+
+ChatAnthropic（src/utils/llm_client.py）和 short_novel 的 ai_client.generate 共用本模块。
+
+配置（环境变量，可选）：
+    LLM_PROMPT_CACHING   设为 1 开启缓存标记（默认关闭；代理服务不支持时保持关闭）
+
+本模块只依赖标准库，short_novel 可直接导入。
+"""
+
+import os
+import threading
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# 服务端可缓存的最短前缀（Sonnet / Opus 为 1024 token），更短的前缀不打标记
+MIN_CACHEABLE_TOKENS = 1024
+
+# 缓存读取按输入价格的 10% 计费，写入按 125% 计费
+READ_COST = 0.1
+WRITE_COST = 1.25
+
+
+def caching_enabled():
+    return os.environ.get("LLM_PROMPT_CACHING", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _approx_tokens(text):
+    # 只用于判断是否达到最短缓存长度，不需要精确（CJK 约 1 字 1 token，英文约 4 字符 1 token）
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return len(text) - ascii_chars + ascii_chars // 4
+
+
+def message_content(prefix_blocks, suffix):
+    """
+    构造"稳定前缀 + 可变后缀"的用户消息内容
+
+    Args:
+        prefix_blocks: 稳定前缀（字符串或字符串列表，按顺序拼接）。
+            列表形式时每块单独成为内容块，最后一块打缓存断点；
+            只追加不修改的内容（如前文各章）逐块传入，下一次调用可以命中上一次写入的较短前缀。
+        suffix: 每次调用都不同的部分
+
+    Returns:
+        str | list: 未开启缓存或前缀过短时返回拼接后的字符串，否则返回内容块列表
+    """
+    if isinstance(prefix_blocks, str):
+        prefix_blocks = [prefix_blocks]
+    blocks = [b for b in prefix_blocks if b]
+
+    if not caching_enabled():
+        get_stats().record_skip(bool(blocks))
+        return "".join(blocks) + suffix
+    if _approx_tokens("".join(blocks)) < MIN_CACHEABLE_TOKENS:
+        get_stats().record_skip(bool(blocks), too_short=True)
+        return "".join(blocks) + suffix
+
+    content = [{"type": "text", "text": block} for block in blocks]
+    # 断点：最后一个前缀块；块数较多时第一个块（整本书不变的设定）也单独打一个
+    content[-1]["cache_control"] = CACHE_CONTROL
+    if len(content) > 2:
+        content[0]["cache_control"] = CACHE_CONTROL
+    content.append({"type": "text", "text": suffix})
+    return content
+
+
+def content_text(content):
+    """消息内容（字符串或内容块列表）的纯文本，用于估算 token 和生成响应缓存 key"""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+class PromptCacheStats:
+    """进程内的前缀缓存统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("calls", "hits", "misses", "skipped", "too_short", "read_tokens", "write_tokens", "uncached_tokens"), 0
+        )
+
+    def record_skip(self, had_prefix, too_short=False):
+        """前缀未打标记（未开启或过短；too_short 表示已开启但前缀不到 MIN_CACHEABLE_TOKENS）"""
+        if had_prefix:
+            with self._lock:
+                self._counters["skipped"] += 1
+                if too_short:
+                    self._counters["too_short"] += 1
+
+    def record(self, input_tokens, cache_read, cache_creation):
+        """
+        记录一次响应的输入用量
+
+        Args:
+            input_tokens: 未命中缓存部分的输入 token（Anthropic usage.input_tokens）
+            cache_read: 从缓存读取的 token
+            cache_creation: 写入缓存的 token
+        """
+        cache_read = cache_read or 0
+        cache_creation = cache_creation or 0
+        with self._lock:
+            c = self._counters
+            c["calls"] += 1
+            c["uncached_tokens"] += input_tokens or 0
+            c["read_tokens"] += cache_read
+            c["write_tokens"] += cache_creation
+            if cache_read:
+                c["hits"] += 1
+            else:
+                c["misses"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+_stats = PromptCacheStats()
+
+
+def get_stats():
+    return _stats
+
+
+def record_usage(usage):
+    """
+    从 Anthropic SDK 的 usage 对象或 LangChain 的 usage_metadata 中累计缓存用量
+
+    LangChain 的 input_tokens 已包含缓存读写部分，这里换算回未命中部分。
+    """
+    if usage is None:
+        return
+    if isinstance(usage, dict):
+        details = usage.get("input_token_details") or {}
+        cache_read = details.get("cache_read") or 0
+        cache_creation = details.get("cache_creation") or 0
+        cache_creation += (details.get("ephemeral_5m_input_tokens") or 0) + (details.get("ephemeral_1h_input_tokens") or 0)
+        input_tokens = (usage.get("input_tokens") or 0) - cache_read - cache_creation
+    else:
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_creation = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+    if cache_read or cache_creation or caching_enabled():
+        _stats.record(max(0, input_tokens), cache_read, cache_creation)
+
+
+def snapshot():
+    """当前累计值（传给 stats_since 计算区间用量）"""
+    return _stats.snapshot()
+
+
+def stats_since(before):
+    now = _stats.snapshot()
+    return {key: now[key] - before.get(key, 0) for key in now}
+
+
+def saved_tokens(stats):
+    """按计费折算节省的输入 token（读取省 90%，写入多付 25%）"""
+    return int(stats["read_tokens"] * (1 - READ_COST) - stats["write_tokens"] * (WRITE_COST - 1))
+
+
+def format_stats(stats):
+    """一行统计，如 "前缀缓存: 命中 4/5 次, 读取 5200 / 写入 1300 tokens, 折算节省约 4355 tokens" """
+    if not stats["calls"]:
+        return ""
+    line = (f"前缀缓存: 命中 {stats['hits']}/{stats['calls']} 次, "
+            f"读取 {stats['read_tokens']} / 写入 {stats['write_tokens']} tokens, "
+            f"折算节省约 {saved_tokens(stats)} tokens")
+    if stats["too_short"]:
+        # 已开启但前缀太短：服务端不会缓存，需要调大前缀（如 generation.context_budget.writer_world）
+        line += f"（{stats['too_short']} 次前缀不足 {MIN_CACHEABLE_TOKENS} token，未缓存，可调大前缀预算）"
+    elif stats["skipped"]:
+        line += f"（{stats['skipped']} 次前缀未打标记）"
+    return line
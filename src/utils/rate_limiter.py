@@ -0,0 +1,298 @@
+"""
+全局 API 限流器 - Token Bucket + AIMD Adaptive Concurrency
+
+src 和 short_novel 的所有 LLM 调用共用一个进程内限流器：
+- 请求数/分钟、token 数/分钟两个令牌桶（配额充足时不等待）
+- 并发窗口按 AIMD 调整：成功 +1/窗口，429/5xx 减半并全局暂停一小段时间
+- 替代原先散落在各节点里的固定 sleep
+
+配置（环境变量，均可选）：
+    LLM_REQUESTS_PER_MINUTE   每分钟请求数上限
+    LLM_TOKENS_PER_MINUTE     每分钟 token 上限（输入+输出）
+    LLM_MAX_CONCURRENCY       并发窗口上限（默认 8）
+
+本模块只依赖标准库，short_novel 可直接导入。
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+# 这些状态码/响应体视为"服务端过载"，触发并发减半
+# 客户端本地超时、连接错误不在此列，按普通失败退避，不影响其他调用方
+OVERLOAD_STATUS_CODES = {429, 500, 502, 503, 504, 524, 529}
+OVERLOAD_BODY_MARKERS = ("overloaded_error", "<!doctype", "<html")
+
+SUCCESS, FAILURE, OVERLOAD = "success", "failure", "overload"
+
+
+class TokenBucket:
+    """按分钟配额匀速补充的令牌桶（调用方持锁）"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """取出 amount 需要等待的秒数（单次需求超过桶容量时按满桶计算）"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """按实际用量修正（delta>0 补扣，delta<0 退还）"""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class CallRecord:
+    """单次调用的用量记录（在 slot 内由调用方填写）"""
+
+    def __init__(self, estimated_tokens):
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens = None
+
+    def record_usage(self, tokens):
+        self.actual_tokens = tokens
+
+
+class RateLimiter:
+    """令牌桶 + AIMD 并发窗口"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_concurrency=8, min_concurrency=1):
+        self._lock = threading.Lock()
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.consecutive_overloads = 0
+
+        self.stats = {"calls": 0, "overloads": 0, "wait_seconds": 0.0}
+
+    def _try_acquire(self, estimated_tokens):
+        """尝试占用一个调用名额，成功返回 0，否则返回建议等待秒数"""
+        with self._lock:
+            now = time.monotonic()
+
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            if self.in_flight >= int(self.limit):
+                return 0.05
+
+            wait = 0.0
+            if self.requests:
+                wait = max(wait, self.requests.wait_time(1, now))
+            if self.tokens and estimated_tokens:
+                wait = max(wait, self.tokens.wait_time(estimated_tokens, now))
+            if wait > 0:
+                return wait
+
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens and estimated_tokens:
+                self.tokens.take(estimated_tokens)
+            self.in_flight += 1
+            self.stats["calls"] += 1
+            return 0.0
+
+    def acquire(self, estimated_tokens=0):
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait == 0:
+                return
+            wait = min(wait, 1.0)
+            self.stats["wait_seconds"] += wait
+            time.sleep(wait)
+
+    async def aacquire(self, estimated_tokens=0):
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait == 0:
+                return
+            wait = min(wait, 1.0)
+            self.stats["wait_seconds"] += wait
+            await asyncio.sleep(wait)
+
+    def release(self, outcome, record=None, pause=None):
+        """
+        归还名额并按结果调整窗口
+
+        Args:
+            outcome: SUCCESS / FAILURE / OVERLOAD
+            record: CallRecord（用于按实际 token 修正令牌桶）
+            pause: 过载后的全局暂停秒数（None 使用指数退避）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if outcome == OVERLOAD:
+                self.stats["overloads"] += 1
+                self.consecutive_overloads += 1
+
+                # 同一波过载只减半一次
+                if now - self.last_decrease > 1.0:
+                    old_limit = self.limit
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self.last_decrease = now
+                    if int(old_limit) != int(self.limit):
+                        print(f"  🚦 API 过载，并发窗口 {int(old_limit)} → {int(self.limit)}")
+
+                if pause is None:
+                    pause = min(60.0, 2.0 * 2 ** (self.consecutive_overloads - 1))
+                self.paused_until = max(self.paused_until, now + pause)
+
+            elif outcome == SUCCESS:
+                self.consecutive_overloads = 0
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+
+            if self.tokens and record and record.actual_tokens is not None:
+                self.tokens.adjust(record.actual_tokens - record.estimated_tokens)
+
+    @contextmanager
+    def slot(self, estimated_tokens=0, overload_pause=None):
+        """
+        占用一个调用名额
+
+        用法:
+            with limiter.slot(estimate_tokens(prompt, max_tokens=1024)) as call:
+                response = client.create(...)
+                call.record_usage(response_tokens)
+        """
+        self.acquire(estimated_tokens)
+        record = CallRecord(estimated_tokens)
+        try:
+            yield record
+        except BaseException as e:
+            # 包括取消（CancelledError/KeyboardInterrupt），保证名额归还
+            overloaded = is_overload_error(e)
+            self.release(OVERLOAD if overloaded else FAILURE, record, retry_after_seconds(e) or overload_pause)
+            raise
+        else:
+            self.release(SUCCESS, record)
+
+    @asynccontextmanager
+    async def aslot(self, estimated_tokens=0, overload_pause=None):
+        """slot 的异步版本"""
+        await self.aacquire(estimated_tokens)
+        record = CallRecord(estimated_tokens)
+        try:
+            yield record
+        except BaseException as e:
+            # 包括取消（CancelledError/KeyboardInterrupt），保证名额归还
+            overloaded = is_overload_error(e)
+            self.release(OVERLOAD if overloaded else FAILURE, record, retry_after_seconds(e) or overload_pause)
+            raise
+        else:
+            self.release(SUCCESS, record)
+
+
+def _status_code(exc):
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def is_overload_error(exc):
+    """
+    判断异常是否为服务端限流/过载
+
+    只认带状态码的响应（Anthropic APIStatusError / httpx HTTPStatusError 的 429/5xx），
+    以及没有状态码时的 overloaded_error 响应体和代理返回的 HTML 错误页。
+    本地读超时、连接失败等客户端错误返回 False。
+    """
+    code = _status_code(exc)
+    if code is not None:
+        return code in OVERLOAD_STATUS_CODES
+
+    # 代理返回的错误可能只有响应体（HTML 错误页等）
+    error_str = str(exc).lower()
+    return any(marker in error_str for marker in OVERLOAD_BODY_MARKERS)
+
+
+def retry_after_seconds(exc):
+    """读取响应头中的 Retry-After（秒），没有时返回 None"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(*texts, max_tokens=0):
+    """
+    粗略估算一次调用的 token 数（输入按字符数计，中文约 1 字 1 token）
+
+    输出部分按 max_tokens 预留，上限 4096，调用结束后按实际用量修正。
+    """
+    prompt_tokens = sum(len(t) for t in texts if t)
+    return prompt_tokens + min(max_tokens or 1024, 4096)
+
+
+def retry_wait(attempt):
+    """
+    非过载失败后的短暂退避（过载等待由限流器的全局暂停负责）
+    """
+    time.sleep(min(4.0, 0.5 * 2 ** attempt) + random.uniform(0, 0.5))
+
+
+async def aretry_wait(attempt):
+    await asyncio.sleep(min(4.0, 0.5 * 2 ** attempt) + random.uniform(0, 0.5))
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def _env_int(name):
+    value = os.environ.get(name, "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def get_limiter():
+    """获取进程内共享的限流器（首次调用时按环境变量创建）"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    requests_per_minute=_env_int("LLM_REQUESTS_PER_MINUTE"),
+                    tokens_per_minute=_env_int("LLM_TOKENS_PER_MINUTE"),
+                    max_concurrency=_env_int("LLM_MAX_CONCURRENCY") or 8,
+                )
+    return _limiter
+
+
+def configure_limiter(requests_per_minute=None, tokens_per_minute=None, max_concurrency=8):
+    """替换共享限流器（批量运行等需要显式配额的场景）"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency,
+        )
+    return _limiter
@@ -0,0 +1,88 @@
+"""
+YAML 加载缓存 - Stat-Validated YAML Cache
+
+planner 每章都重新打开并 yaml.safe_load 一次 bible/outline.yaml，config_to_initial_state 也会再读一遍；
+纯 Python 的 SafeLoader 解析多卷大纲要几十毫秒。本模块：
+- 按绝对路径缓存解析结果，用 (mtime_ns, size, inode) 校验，文件被编辑或替换后自动重新解析
+- 有 libyaml 时使用 CSafeLoader（同样只构造基本类型，安全性与 safe_load 相同）
+- 同一进程内各节点共享同一份解析结果
+
+load_yaml() 默认返回共享对象，调用方只读；需要修改时传 copy=True。
+"""
+
+import os
+import copy as _copy
+import threading
+
+import yaml
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+OUTLINE_FILE = "outline.yaml"
+
+_cache = {}  # abspath -> ((mtime_ns, size, inode), data)
+_lock = threading.Lock()
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def safe_load(stream):
+    """与 yaml.safe_load 相同，有 libyaml 时使用 C 实现"""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_yaml(path, copy=False):
+    """
+    读取 YAML 文件（按文件状态缓存）
+
+    Args:
+        copy: 返回深拷贝（调用方需要修改结果时使用）
+
+    Raises:
+        OSError / yaml.YAMLError: 与直接读取相同
+    """
+    path = os.path.abspath(path)
+    signature = _signature(path)
+
+    with _lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == signature:
+        data = cached[1]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = safe_load(f)
+        with _lock:
+            _cache[path] = (signature, data)
+
+    return _copy.deepcopy(data) if copy else data
+
+
+def load_outline(bible_dir):
+    """
+    读取项目的 bible/outline.yaml
+
+    Returns:
+        dict | None: 文件不存在时为 None；内容为空或不是字典时为 {}（由调用方提示格式错误）
+
+    Raises:
+        OSError / yaml.YAMLError: 文件存在但读取或解析失败
+    """
+    if not bible_dir:
+        return None
+    outline_file = os.path.join(bible_dir, OUTLINE_FILE)
+    if not os.path.exists(outline_file):
+        return None
+    data = load_yaml(outline_file)
+    return data if isinstance(data, dict) else {}
+
+
+def invalidate(path=None):
+    """清除缓存（path 为 None 时全部清除）；写入后文件状态会变化，通常不需要手动调用"""
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(path), None)